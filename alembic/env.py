@@ -5,11 +5,15 @@ from sqlalchemy import pool
 
 from alembic import context
 from app.database.models import Base
+from app.database.db import get_sync_database_url
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
+# URL базы берется из настроек приложения (DATABASE_URL), а не из alembic.ini
+config.set_main_option("sqlalchemy.url", get_sync_database_url())
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
@@ -0,0 +1,66 @@
+"""add order events and status enum
+
+Revision ID: a7c9e1f3b5d8
+Revises: f1b3d5e7a9c2
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c9e1f3b5d8'
+down_revision: Union[str, Sequence[str], None] = 'f1b3d5e7a9c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ORDER_STATUSES = ('pending', 'confirmed', 'in_progress', 'paused', 'pending_review', 'completed', 'cancelled')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('order_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.String(), nullable=False),
+    sa.Column('from_status', sa.String(length=20), nullable=True),
+    sa.Column('to_status', sa.String(length=20), nullable=False),
+    sa.Column('actor_tg_id', sa.BigInteger(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.order_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_order_events_order_created', 'order_events', ['order_id', 'created_at'], unique=False)
+    op.create_index('ix_order_events_status_created', 'order_events', ['to_status', 'created_at'], unique=False)
+
+    # Текущий статус каждого заказа становится первой записью журнала
+    op.execute(
+        "INSERT INTO order_events (order_id, from_status, to_status, created_at) "
+        "SELECT order_id, NULL, COALESCE(status, 'pending'), COALESCE(updated_at, created_at) FROM orders"
+    )
+
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.alter_column(
+            'status',
+            existing_type=sa.String(),
+            type_=sa.Enum(*ORDER_STATUSES, name='order_status', native_enum=False,
+                          create_constraint=True, length=20),
+            existing_nullable=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.alter_column(
+            'status',
+            existing_type=sa.Enum(*ORDER_STATUSES, name='order_status', native_enum=False,
+                                  create_constraint=True, length=20),
+            type_=sa.String(),
+            existing_nullable=True,
+        )
+    op.drop_index('ix_order_events_status_created', table_name='order_events')
+    op.drop_index('ix_order_events_order_created', table_name='order_events')
+    op.drop_table('order_events')
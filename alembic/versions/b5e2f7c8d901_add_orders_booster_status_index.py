@@ -0,0 +1,28 @@
+"""add orders booster status index
+
+Revision ID: b5e2f7c8d901
+Revises: a1337e52b310
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e2f7c8d901'
+down_revision: Union[str, Sequence[str], None] = 'a1337e52b310'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_orders_booster_status_created', 'orders', ['assigned_booster_id', 'status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_booster_status_created', table_name='orders')
@@ -0,0 +1,46 @@
+"""add composite indexes for hot queries
+
+Revision ID: c7d3e9f1a2b4
+Revises: b5e2f7c8d901
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d3e9f1a2b4'
+down_revision: Union[str, Sequence[str], None] = 'b5e2f7c8d901'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_users_referrer_id'), 'users', ['referrer_id'], unique=False)
+    op.create_index('ix_orders_user_created', 'orders', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_orders_status_created', 'orders', ['status', 'created_at'], unique=False)
+    op.create_index('ix_orders_created_at', 'orders', ['created_at'], unique=False)
+    op.create_index('ix_payment_requests_user_region_created', 'payment_requests', ['user_id', 'region', 'created_at'], unique=False)
+    op.create_index('ix_payment_requests_status_created', 'payment_requests', ['status', 'created_at'], unique=False)
+    op.create_index('ix_payout_requests_status_created', 'booster_payout_requests', ['status', 'created_at'], unique=False)
+    op.create_index('ix_payout_requests_account_created', 'booster_payout_requests', ['booster_account_id', 'created_at'], unique=False)
+    op.create_index('ix_bonus_history_user_source_created', 'bonus_history', ['user_id', 'source', 'created_at'], unique=False)
+    op.create_index('ix_promo_activations_user_code', 'promo_activations', ['user_id', 'promo_code'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_promo_activations_user_code', table_name='promo_activations')
+    op.drop_index('ix_bonus_history_user_source_created', table_name='bonus_history')
+    op.drop_index('ix_payout_requests_account_created', table_name='booster_payout_requests')
+    op.drop_index('ix_payout_requests_status_created', table_name='booster_payout_requests')
+    op.drop_index('ix_payment_requests_status_created', table_name='payment_requests')
+    op.drop_index('ix_payment_requests_user_region_created', table_name='payment_requests')
+    op.drop_index('ix_orders_created_at', table_name='orders')
+    op.drop_index('ix_orders_status_created', table_name='orders')
+    op.drop_index('ix_orders_user_created', table_name='orders')
+    op.drop_index(op.f('ix_users_referrer_id'), table_name='users')
@@ -0,0 +1,31 @@
+"""users tg_id biginteger
+
+Revision ID: d2a8b4c6e0f3
+Revises: c7d3e9f1a2b4
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a8b4c6e0f3'
+down_revision: Union[str, Sequence[str], None] = 'c7d3e9f1a2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # В SQLite INTEGER уже 64-битный, менять тип нужно только на серверных СУБД
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('users', 'tg_id', existing_type=sa.Integer(), type_=sa.BigInteger(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('users', 'tg_id', existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False)
@@ -0,0 +1,30 @@
+"""add orders checkout token
+
+Revision ID: e4f6a8b0c2d5
+Revises: d2a8b4c6e0f3
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4f6a8b0c2d5'
+down_revision: Union[str, Sequence[str], None] = 'd2a8b4c6e0f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('orders', sa.Column('checkout_token', sa.String(), nullable=True))
+    op.create_index('ix_orders_checkout_token', 'orders', ['checkout_token'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_checkout_token', table_name='orders')
+    op.drop_column('orders', 'checkout_token')
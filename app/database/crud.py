@@ -4,13 +4,19 @@ from .models import Base
 from .db import engine
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func, or_
-from datetime import datetime, timezone
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from datetime import datetime, timedelta, timezone
+import time
 import uuid
 from aiogram import Bot
-from app.config import BOT_TOKEN
+from app.config import BOT_TOKEN, ADMIN_CACHE_TTL
 from app.database.db import AsyncSessionLocal
-from sqlalchemy import delete
-from app.database.models import User, BonusHistory, PromoCode, PromoActivation, Order, BotSettings, BoosterAccount
+from sqlalchemy import delete, true, update
+from app.database.models import User, BonusHistory, PromoCode, PromoActivation, Order, BotSettings, BoosterAccount, ProcessedAction, OrderEvent, Broadcast, OutboxMessage, FsmState
+from app.database.order_status import PENDING, CONFIRMED, PENDING_REVIEW, COMPLETED, CANCELLED, source_statuses
+from app.database.user_cache import user_cache
+from app.database.pagination import fetch_keyset_page
+from app.utils.shared_state import on_invalidation, publish_invalidation
 import logging
 
 logger = logging.getLogger(__name__)
@@ -40,6 +46,7 @@ async def add_user(tg_id, username, region=None, role="user", referrer_id=None):
             )
             session.add(user)
             await session.commit()
+            user_cache.invalidate(tg_id=tg_id)
 
 async def update_user_region(tg_id: int, new_region: str):
     async with AsyncSessionLocal() as session:
@@ -48,19 +55,43 @@ async def update_user_region(tg_id: int, new_region: str):
         if user:
             user.region = new_region
             await session.commit()
+            user_cache.invalidate(user_id=user.id)
 
 async def get_user_by_tg_id(tg_id):
+    user = user_cache.get_by_tg_id(tg_id)
+    if user is not None:
+        return user
+    generation = user_cache.generation
     async with AsyncSessionLocal() as session:
         result = await session.execute(select(User).where(User.tg_id == tg_id))
-        return result.scalar_one_or_none()
+        user = result.scalar_one_or_none()
+    user_cache.put(user, generation)
+    return user
 
 async def update_user_username(tg_id, username):
+    """Обновляет username одним UPDATE, только если он изменился"""
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).where(User.tg_id == tg_id))
-        user = result.scalar_one_or_none()
-        if user and user.username != username:
-            user.username = username
-            await session.commit()
+        await session.execute(
+            update(User)
+            .where(User.tg_id == tg_id, or_(User.username.is_(None), User.username != username))
+            .values(username=username)
+        )
+        await session.commit()
+    user_cache.invalidate(tg_id=tg_id)
+
+async def set_users_bot_blocked(tg_ids, blocked: bool = True):
+    """Отмечает пользователей, заблокировавших бота (или разблокировавших его снова)"""
+    tg_ids = list(tg_ids)
+    if not tg_ids:
+        return
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(User).where(User.tg_id.in_(tg_ids)).values(bot_blocked=blocked)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    for tg_id in tg_ids:
+        user_cache.invalidate(tg_id=tg_id)
 
 async def get_booster_account(tg_id):
     async with AsyncSessionLocal() as session:
@@ -84,26 +115,39 @@ async def create_booster_account(user_id, username, session):
     except IntegrityError:
         await session.rollback()
 
+def _change_booster_column_stmt(condition, field: str, amount: float):
+    """UPDATE booster_accounts SET field = field + amount с проверкой остатка при списании"""
+    column = getattr(BoosterAccount, field)
+    stmt = update(BoosterAccount).where(condition)
+    if amount < 0:
+        stmt = stmt.where(func.coalesce(column, 0) >= -amount)
+    return stmt.values({field: func.coalesce(column, 0) + amount}).execution_options(synchronize_session=False)
+
 async def update_booster_balance(user_id, amount, currency="руб."):
-    """Обновляет баланс бустера в соответствующей валюте"""
+    """Атомарно изменяет баланс бустера в соответствующей валюте.
+    
+    Возвращает новый баланс или None, если аккаунт не найден
+    (или при списании на балансе недостаточно средств).
+    """
+    if currency == "USD":
+        balance_field = "balance_usd"
+    else:
+        # legacy: allow updating local currency if needed
+        currency_fields = {
+            "сом": "balance_kg",
+            "тенге": "balance_kz", 
+            "руб.": "balance_ru"
+        }
+        balance_field = currency_fields.get(currency, "balance_ru")
+    
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(BoosterAccount).where(BoosterAccount.user_id == user_id))
-        account = result.scalar_one_or_none()
-        if account:
-            if currency == "USD":
-                current_balance = getattr(account, "balance_usd", 0)
-                setattr(account, "balance_usd", current_balance + amount)
-            else:
-                # legacy: allow updating local currency if needed
-                currency_fields = {
-                    "сом": "balance_kg",
-                    "тенге": "balance_kz", 
-                    "руб.": "balance_ru"
-                }
-                balance_field = currency_fields.get(currency, "balance_ru")
-                current_balance = getattr(account, balance_field, 0)
-                setattr(account, balance_field, current_balance + amount)
-            await session.commit()
+        result = await session.execute(
+            _change_booster_column_stmt(BoosterAccount.user_id == user_id, balance_field, amount)
+            .returning(getattr(BoosterAccount, balance_field))
+        )
+        new_balance = result.scalar_one_or_none()
+        await session.commit()
+        return new_balance
 
 async def update_booster_balance_conversion(user_id, usd_amount, converted_amount, target_region):
     """Конвертирует USD баланс в локальную валюту"""
@@ -225,78 +269,87 @@ async def create_payout_request(tg_user_id: int, amount: float, currency: str, p
             logger.error(f"[PAYOUT REQUEST] Полная ошибка: {traceback.format_exc()}")
             return None
 
-async def get_payout_requests(status: str = None, limit: int = 20, offset: int = 0):
-    """Получает список запросов на выплату"""
+async def get_payout_requests(status: str = None, limit: int = 20, exclude_status: str = None,
+                              after_id: int = None, before_id: int = None):
+    """Получает страницу запросов на выплату вместе с аккаунтами бустеров и их пользователями"""
     async with AsyncSessionLocal() as session:
         try:
-            query = select(BoosterPayoutRequest).join(BoosterAccount).join(User, BoosterAccount.user_id == User.id)
+            query = (
+                select(BoosterPayoutRequest)
+                .join(BoosterAccount)
+                .join(User, BoosterAccount.user_id == User.id)
+                # Аккаунты и пользователи подгружаются пачкой, без запроса на каждую строку
+                .options(selectinload(BoosterPayoutRequest.booster_account).selectinload(BoosterAccount.user))
+            )
             
             if status:
                 query = query.where(BoosterPayoutRequest.status == status)
+            if exclude_status:
+                query = query.where(BoosterPayoutRequest.status != exclude_status)
                 
-            query = query.order_by(BoosterPayoutRequest.created_at.desc()).limit(limit).offset(offset)
-            
-            result = await session.execute(query)
-            return result.scalars().all()
+            return await fetch_keyset_page(
+                session, query, BoosterPayoutRequest, limit, after_id=after_id, before_id=before_id
+            )
             
         except Exception as e:
             logger.error(f"[PAYOUT REQUEST] Ошибка при получении списка запросов: {e}")
             return []
 
+async def count_payout_requests(status: str = None, exclude_status: str = None) -> int:
+    """Количество запросов на выплату через COUNT"""
+    async with AsyncSessionLocal() as session:
+        query = select(func.count(BoosterPayoutRequest.id))
+        if status:
+            query = query.where(BoosterPayoutRequest.status == status)
+        if exclude_status:
+            query = query.where(BoosterPayoutRequest.status != exclude_status)
+        result = await session.execute(query)
+        return result.scalar() or 0
+
 async def get_payout_request_by_id(request_id: int):
     """Получает запрос на выплату по ID"""
     async with AsyncSessionLocal() as session:
         try:
-            result = await session.execute(select(BoosterPayoutRequest).where(BoosterPayoutRequest.id == request_id))
+            result = await session.execute(
+                select(BoosterPayoutRequest)
+                .options(selectinload(BoosterPayoutRequest.booster_account).selectinload(BoosterAccount.user))
+                .where(BoosterPayoutRequest.id == request_id)
+            )
             return result.scalar_one_or_none()
         except Exception as e:
             logger.error(f"[PAYOUT REQUEST] Ошибка при получении запроса {request_id}: {e}")
             return None
 
+PAYOUT_BALANCE_FIELDS = {"kg": "balance_kg", "kz": "balance_kz", "ru": "balance_ru"}
+
 async def update_payout_status(request_id: int, status: str, admin_tg_id: int, admin_comment: str = None):
-    """Обновляет статус запроса на выплату"""
+    """Переводит запрос на выплату из pending в status одним UPDATE с условием на статус.
+    
+    Баланс бустера не меняет, поэтому подходит для отклонения; одобрение со
+    списанием средств — approve_payout_request. False — админ или запрос
+    не найдены или запрос уже обработан.
+    """
     logger.info(f"[PAYOUT REQUEST] Обновление статуса запроса {request_id}: {status}")
     
     async with AsyncSessionLocal() as session:
         try:
-            # Находим админа
-            admin_result = await session.execute(select(User).where(User.tg_id == admin_tg_id))
-            admin = admin_result.scalar_one_or_none()
+            admin_result = await session.execute(select(User.id).where(User.tg_id == admin_tg_id))
+            admin_id = admin_result.scalar_one_or_none()
             
-            if not admin:
+            if admin_id is None:
                 logger.error(f"[PAYOUT REQUEST] Админ не найден для tg_id {admin_tg_id}")
                 return False
-                
-            # Находим запрос
-            request_result = await session.execute(select(BoosterPayoutRequest).where(BoosterPayoutRequest.id == request_id))
-            payout_request = request_result.scalar_one_or_none()
-            
-            if not payout_request:
-                logger.error(f"[PAYOUT REQUEST] Запрос {request_id} не найден")
-                return False
-                
-            # Обновляем статус
-            payout_request.status = status
-            payout_request.admin_id = admin.id
-            payout_request.admin_comment = admin_comment
-            payout_request.processed_at = func.now()
             
-            # Если запрос одобрен, списываем средства с баланса
-            if status == "approved":
-                account_result = await session.execute(
-                    select(BoosterAccount).where(BoosterAccount.id == payout_request.booster_account_id)
+            result = await session.execute(
+                _transition_status_stmt(
+                    BoosterPayoutRequest, BoosterPayoutRequest.id, request_id, "pending", status,
+                    admin_id=admin_id, admin_comment=admin_comment, processed_at=func.now()
                 )
-                account = account_result.scalar_one_or_none()
-                
-                if account:
-                    if payout_request.currency == "kg":
-                        account.balance_kg -= payout_request.amount
-                    elif payout_request.currency == "kz":
-                        account.balance_kz -= payout_request.amount
-                    elif payout_request.currency == "ru":
-                        account.balance_ru -= payout_request.amount
-                        
-                    logger.info(f"[PAYOUT REQUEST] Списано {payout_request.amount} {payout_request.currency} с аккаунта {account.id}")
+            )
+            if result.rowcount != 1:
+                await session.rollback()
+                logger.warning(f"[PAYOUT REQUEST] Запрос {request_id} не найден или уже обработан")
+                return False
             
             await session.commit()
             logger.info(f"[PAYOUT REQUEST] Статус запроса {request_id} обновлен на {status}")
@@ -309,36 +362,34 @@ async def update_payout_status(request_id: int, status: str, admin_tg_id: int, a
             logger.error(f"[PAYOUT REQUEST] Полная ошибка: {traceback.format_exc()}")
             return False
 
-async def get_user_payout_requests(tg_user_id: int, limit: int = 10):
-    """Получает запросы на выплату конкретного пользователя"""
+def _user_payout_requests_query(query, tg_user_id: int):
+    return (
+        query.join(BoosterAccount, BoosterPayoutRequest.booster_account_id == BoosterAccount.id)
+        .join(User, BoosterAccount.user_id == User.id)
+        .where(User.tg_id == tg_user_id)
+    )
+
+async def get_user_payout_requests(tg_user_id: int, limit: int = 10, after_id: int = None, before_id: int = None):
+    """Получает страницу запросов на выплату конкретного пользователя"""
     async with AsyncSessionLocal() as session:
         try:
-            # Находим пользователя
-            user_result = await session.execute(select(User).where(User.tg_id == tg_user_id))
-            user = user_result.scalar_one_or_none()
-            
-            if not user:
-                return []
-                
-            # Находим аккаунт бустера
-            account_result = await session.execute(select(BoosterAccount).where(BoosterAccount.user_id == user.id))
-            account = account_result.scalar_one_or_none()
-            
-            if not account:
-                return []
-                
-            # Получаем запросы
-            query = select(BoosterPayoutRequest).where(
-                BoosterPayoutRequest.booster_account_id == account.id
-            ).order_by(BoosterPayoutRequest.created_at.desc()).limit(limit)
-            
-            result = await session.execute(query)
-            return result.scalars().all()
+            query = _user_payout_requests_query(select(BoosterPayoutRequest), tg_user_id)
+            return await fetch_keyset_page(
+                session, query, BoosterPayoutRequest, limit, after_id=after_id, before_id=before_id
+            )
             
         except Exception as e:
             logger.error(f"[PAYOUT REQUEST] Ошибка при получении запросов пользователя {tg_user_id}: {e}")
             return []
 
+async def count_user_payout_requests(tg_user_id: int) -> int:
+    """Количество запросов на выплату пользователя через COUNT"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            _user_payout_requests_query(select(func.count(BoosterPayoutRequest.id)).select_from(BoosterPayoutRequest), tg_user_id)
+        )
+        return result.scalar() or 0
+
 async def get_booster_account_by_id(account_id: int):
     """Получает аккаунт бустера по ID"""
     async with AsyncSessionLocal() as session:
@@ -439,10 +490,13 @@ async def convert_booster_balance_to_region(user_id, target_region):
         await session.commit()
         return True, f"Баланс успешно сконвертирован в {target_currency}: {total_balance:.2f}"
 
-async def get_users_page(offset=0, limit=5):
+async def get_users_page(limit=5, after_id=None, before_id=None):
+    """Страница пользователей в порядке id с keyset пагинацией"""
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).offset(offset).limit(limit))
-        return result.scalars().all()
+        return await fetch_keyset_page(
+            session, select(User), User, limit,
+            after_id=after_id, before_id=before_id, order_column=None, descending=False
+        )
 
 async def count_users():
     async with AsyncSessionLocal() as session:
@@ -456,12 +510,11 @@ async def count_users_by_role(role: str):
 
 async def search_users(query: str):
     async with AsyncSessionLocal() as session:
-        stmt = select(User).where(
-            or_(
-                User.username.ilike(f"%{query}%"),
-                User.tg_id == query if query.isdigit() else False
-            )
-        )
+        conditions = [User.username.icontains(query, autoescape=True)]
+        if query.isdigit():
+            # tg_id числовой: сравнение со строкой работает в SQLite, но не в PostgreSQL
+            conditions.append(User.tg_id == int(query))
+        stmt = select(User).where(or_(*conditions))
         result = await session.execute(stmt)
         return result.scalars().all()
 
@@ -478,6 +531,7 @@ async def update_user_balance(tg_id, new_balance, region=None):
             elif target_region == "🇷🇺 РУ" or target_region == "ru":
                 user.balance_ru = new_balance
             await session.commit()
+            user_cache.invalidate(user_id=user.id)
 
 async def update_user_bonus_balance(tg_id, new_bonus_balance, region=None):
     async with AsyncSessionLocal() as session:
@@ -492,6 +546,7 @@ async def update_user_bonus_balance(tg_id, new_bonus_balance, region=None):
             elif target_region == "🇷🇺 РУ" or target_region == "ru":
                 user.bonus_ru = new_bonus_balance
             await session.commit()
+            user_cache.invalidate(user_id=user.id)
 
 async def update_user_role(tg_id, new_role):
     async with AsyncSessionLocal() as session:
@@ -500,6 +555,8 @@ async def update_user_role(tg_id, new_role):
         if user:
             user.role = new_role
             await session.commit()
+            user_cache.invalidate(user_id=user.id)
+            invalidate_admins_cache()
 
 
 async def create_payment_request(user_id, region, amount, receipt_file_id):
@@ -529,44 +586,99 @@ async def update_payment_request_status(request_id, status):
             request.status = status
             await session.commit()
 
+async def transition_payment_request_status(request_id: int, expected, new_status: str) -> bool:
+    """Compare-and-set статуса заявки на пополнение. False — заявка не найдена или уже обработана"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            _transition_status_stmt(PaymentRequest, PaymentRequest.id, request_id, expected, new_status)
+        )
+        await session.commit()
+        return result.rowcount == 1
+
 async def get_user_by_id(user_id):
+    user = user_cache.get_by_id(user_id)
+    if user is not None:
+        return user
+    generation = user_cache.generation
     async with AsyncSessionLocal() as session:
         result = await session.execute(select(User).where(User.id == user_id))
-        return result.scalar_one_or_none()
+        user = result.scalar_one_or_none()
+    user_cache.put(user, generation)
+    return user
+
+USER_BALANCE_FIELDS = ("balance_kg", "balance_kz", "balance_ru")
+USER_BONUS_FIELDS = {"сом": "bonus_kg", "тенге": "bonus_kz", "руб.": "bonus_ru"}
+REGION_BONUS_FIELDS = {"🇰🇬 КР": "bonus_kg", "🇰🇿 КЗ": "bonus_kz", "🇷🇺 РУ": "bonus_ru"}
+_BALANCE_RETURNING = (User.balance_kg, User.balance_kz, User.balance_ru, User.referrer_id)
+
+def _change_user_column_stmt(user_id: int, field: str, amount: float):
+    """UPDATE users SET field = field + amount с проверкой остатка при списании"""
+    column = getattr(User, field)
+    stmt = update(User).where(User.id == user_id)
+    if amount < 0:
+        stmt = stmt.where(func.coalesce(column, 0) >= -amount)
+    return stmt.values({field: func.coalesce(column, 0) + amount}).execution_options(synchronize_session=False)
 
 async def update_user_balance_by_region(user_id: int, balance_field: str, amount: float):
-    """Обновление баланса пользователя по региону"""
+    """Атомарное изменение баланса пользователя по региону одним UPDATE ... RETURNING.
+    
+    Возвращает новый баланс или None, если пользователь не найден
+    или при списании на балансе недостаточно средств.
+    """
+    if balance_field not in USER_BALANCE_FIELDS:
+        raise ValueError(f"Неизвестное поле баланса: {balance_field}")
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).where(User.id == user_id))
-        user_db = result.scalar_one_or_none()
-        if user_db:
-            # Проверяем первое пополнение только если amount положительный (пополнение)
-            is_first_topup = False
-            if amount > 0:
-                is_first_topup = (
-                    user_db.balance_kg == 0 and
-                    user_db.balance_kz == 0 and
-                    user_db.balance_ru == 0
-                )
-            
-            # Обновляем баланс
-            current_balance = getattr(user_db, balance_field)
-            setattr(user_db, balance_field, current_balance + amount)
-            
-            await session.commit()
-
-            # Если это первое пополнение — начисляем бонус пригласившему
-            if is_first_topup and user_db.referrer_id:
-                BONUS_AMOUNT = 50  # укажи нужную сумму
-                await add_bonus_to_referrer(user_db.id, BONUS_AMOUNT)
-            
-            return getattr(user_db, balance_field)
+        result = await session.execute(
+            _change_user_column_stmt(user_id, balance_field, amount).returning(*_BALANCE_RETURNING)
+        )
+        row = result.one_or_none()
+        await session.commit()
+    if row is None:
         return None
+    return await _after_balance_change(user_id, balance_field, amount, row)
+
+async def _after_balance_change(user_id: int, balance_field: str, amount: float, row):
+    """Сброс кеша и бонус пригласившему после изменения баланса. row — RETURNING _BALANCE_RETURNING"""
+    user_cache.invalidate(user_id=user_id)
+    
+    balances = dict(zip(USER_BALANCE_FIELDS, row[:3]))
+    new_balance = balances[balance_field]
+    # Первое пополнение: до него все балансы были нулевыми
+    is_first_topup = (
+        amount > 0 and new_balance == amount and
+        all(not value for field, value in balances.items() if field != balance_field)
+    )
+    
+    # Если это первое пополнение — начисляем бонус пригласившему
+    if is_first_topup and row.referrer_id:
+        BONUS_AMOUNT = 50  # укажи нужную сумму
+        await add_bonus_to_referrer(user_id, BONUS_AMOUNT)
+    
+    return new_balance
+
+# tg_id админов нужны каждому уведомлению, а меняются редко
+_admins_cache = None  # (истекает, [tg_id])
 
 async def get_admins():
+    """tg_id всех админов (кэш на ADMIN_CACHE_TTL секунд)"""
+    global _admins_cache
+    if _admins_cache is not None and _admins_cache[0] > time.monotonic():
+        return list(_admins_cache[1])
     async with AsyncSessionLocal() as session:
         result = await session.execute(select(User.tg_id).where(User.role == "admin"))
-        return [row[0] for row in result.all()]
+        admins = [row[0] for row in result.all()]
+    _admins_cache = (time.monotonic() + ADMIN_CACHE_TTL, admins)
+    return list(admins)
+
+def _drop_admins_cache():
+    global _admins_cache
+    _admins_cache = None
+
+def invalidate_admins_cache():
+    _drop_admins_cache()
+    publish_invalidation("admins")
+
+on_invalidation("admins", _drop_admins_cache)
     
 async def get_payment_requests_by_user(user_id):
     async with AsyncSessionLocal() as session:
@@ -582,6 +694,33 @@ async def get_all_payment_requests():
         )
         return result.scalars().all()
 
+def _payment_requests_filters(status: str = None, user_id: int = None, region: str = None):
+    filters = []
+    if status:
+        filters.append(PaymentRequest.status == status)
+    if user_id is not None:
+        filters.append(PaymentRequest.user_id == user_id)
+    if region:
+        filters.append(PaymentRequest.region == region)
+    return filters
+
+async def count_payment_requests(status: str = None, user_id: int = None, region: str = None) -> int:
+    """Количество заявок на пополнение (опционально по статусу, пользователю и региону) через COUNT"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(func.count(PaymentRequest.id)).where(*_payment_requests_filters(status, user_id, region))
+        )
+        return result.scalar() or 0
+
+async def get_payment_requests_page(status: str = None, user_id: int = None, region: str = None,
+                                    limit: int = 10, after_id: int = None, before_id: int = None):
+    """Страница заявок на пополнение, отфильтрованная в SQL, с keyset пагинацией"""
+    async with AsyncSessionLocal() as session:
+        query = select(PaymentRequest).where(*_payment_requests_filters(status, user_id, region))
+        return await fetch_keyset_page(
+            session, query, PaymentRequest, limit, after_id=after_id, before_id=before_id
+        )
+
 from sqlalchemy import select
 
 async def set_booster_status(user_id: int, status: str, session):
@@ -599,34 +738,34 @@ async def add_bonus_to_referrer(user_id: int, amount: float):
     async with AsyncSessionLocal() as session:
         user = await session.get(User, user_id)
         if user and user.referrer_id:
-            referrer = await session.get(User, user.referrer_id)
-            if referrer:
-                # Можно начислять в бонус_kg, бонус_kz, бонус_ru по региону реферала
-                if user.region == "🇰🇬 КР":
-                    referrer.bonus_kg += amount
-                elif user.region == "🇰🇿 КЗ":
-                    referrer.bonus_kz += amount
-                elif user.region == "🇷🇺 РУ":
-                    referrer.bonus_ru += amount
-                await session.commit()
-
+            # Можно начислять в бонус_kg, бонус_kz, бонус_ru по региону реферала
+            bonus_field = REGION_BONUS_FIELDS.get(user.region)
+            if bonus_field:
+                # Начисление и запись в историю — одна транзакция
+                result = await session.execute(
+                    _change_user_column_stmt(user.referrer_id, bonus_field, amount).returning(User.tg_id)
+                )
+                referrer_tg_id = result.scalar_one_or_none()
+                if referrer_tg_id is None:
+                    return
+                
                 # Добавляем запись в историю бонусов
-                history = BonusHistory(
-                    user_id=referrer.id,
+                session.add(BonusHistory(
+                    user_id=user.referrer_id,
                     amount=amount,
                     source="Реферал",
                     comment=(
                         f"Бонус за приглашённого пользователя "
                         f"{'@' + user.username if user.username else user.tg_id}"
                     )
-                )
-                session.add(history)
+                ))
                 await session.commit()
+                user_cache.invalidate(user_id=user.referrer_id)
 
-                if referrer.tg_id:
+                if referrer_tg_id:
                     try:
                         await bot.send_message(
-                            referrer.tg_id,
+                            referrer_tg_id,
                             f"Вам начислен бонус {amount} за первое пополнение приглашённого пользователя!"
                         )
                     except Exception:
@@ -674,6 +813,7 @@ async def check_and_activate_promo(user_id: int, code: str):
             # Сохраняем скидку для применения при следующем заказе
             user.active_discount_percent = promo.value
             await session.commit()
+            user_cache.invalidate(user_id=user_id)
             return True, f"Промокод активирован! Скидка {promo.value}% будет применена к вашему следующему заказу."
         elif promo.type == "bonus":
             if promo.currency == "сом":
@@ -691,6 +831,7 @@ async def check_and_activate_promo(user_id: int, code: str):
                 comment=f"Активация промокода {promo.code}"
             ))
             await session.commit()
+            user_cache.invalidate(user_id=user_id)
             return True, f"Промокод активирован! Вам начислено {promo.value} {promo.currency or ''} на бонусный счёт."
         else:
             await session.commit()
@@ -714,6 +855,7 @@ async def apply_user_discount(user_id: int):
             discount = user.active_discount_percent
             user.active_discount_percent = 0  # Сбрасываем скидку после применения
             await session.commit()
+            user_cache.invalidate(user_id=user_id)
             return discount
         return 0
 
@@ -736,30 +878,22 @@ async def get_user_bonus_balance(user_id: int, currency: str):
 
 
 async def use_user_bonus(user_id: int, amount: float, currency: str):
-    """Использует бонусы пользователя для оплаты"""
+    """Использует бонусы пользователя для оплаты (атомарное списание с проверкой остатка)"""
+    bonus_field = USER_BONUS_FIELDS.get(currency)
+    if not bonus_field:
+        return False, "Неподдерживаемая валюта."
+    
     async with AsyncSessionLocal() as session:
-        user = await session.get(User, user_id)
-        if not user:
-            return False, "Пользователь не найден."
-        
-        # Определяем поле бонуса в зависимости от валюты
-        if currency == "сом":
-            current_bonus = user.bonus_kg or 0
-            if current_bonus < amount:
-                return False, f"Недостаточно бонусов. Доступно: {current_bonus:.2f} сом"
-            user.bonus_kg -= amount
-        elif currency == "тенге":
-            current_bonus = user.bonus_kz or 0
-            if current_bonus < amount:
-                return False, f"Недостаточно бонусов. Доступно: {current_bonus:.2f} тенге"
-            user.bonus_kz -= amount
-        elif currency == "руб.":
-            current_bonus = user.bonus_ru or 0
-            if current_bonus < amount:
-                return False, f"Недостаточно бонусов. Доступно: {current_bonus:.2f} руб."
-            user.bonus_ru -= amount
-        else:
-            return False, "Неподдерживаемая валюта."
+        result = await session.execute(
+            _change_user_column_stmt(user_id, bonus_field, -amount).returning(User.id)
+        )
+        if result.scalar_one_or_none() is None:
+            await session.rollback()
+            user = await session.get(User, user_id)
+            if not user:
+                return False, "Пользователь не найден."
+            current_bonus = getattr(user, bonus_field) or 0
+            return False, f"Недостаточно бонусов. Доступно: {current_bonus:.2f} {currency}"
         
         # Добавляем запись в историю бонусов
         session.add(BonusHistory(
@@ -770,6 +904,7 @@ async def use_user_bonus(user_id: int, amount: float, currency: str):
         ))
         
         await session.commit()
+        user_cache.invalidate(user_id=user_id)
         return True, f"Списано {amount:.2f} {currency} с бонусного счета."
 
 
@@ -784,56 +919,142 @@ async def delete_expired_promocodes():
         )
         await session.commit()
 
+def _build_order(order_data: dict, checkout_token: str = None) -> Order:
+    # Генерируем уникальный ID заказа
+    order_id = f"#Z{uuid.uuid4().hex[:6].upper()}"
+    
+    return Order(
+        order_id=order_id,
+        user_id=order_data.get("user_id"),
+        service_type=order_data.get("service_type"),
+        boost_type=order_data.get("boost_type"),
+        region=order_data.get("region"),
+        current_rank=order_data.get("current_rank"),
+        target_rank=order_data.get("target_rank"),
+        current_mythic_stars=order_data.get("current_mythic_stars"),
+        target_mythic_stars=order_data.get("target_mythic_stars"),
+        hero=order_data.get("hero"),
+        lane=order_data.get("lane"),
+        heroes_mains=order_data.get("heroes_mains"),
+        game_login=order_data.get("game_login"),
+        game_password=order_data.get("game_password"),
+        game_id=order_data.get("game_id"),
+        contact_info=order_data.get("contact_info"),
+        base_cost=order_data.get("base_cost"),
+        multiplier=order_data.get("multiplier", 1.0),
+        total_cost=order_data.get("total_cost"),
+        currency=order_data.get("currency"),
+        details=order_data.get("details"),
+        preferred_time=order_data.get("preferred_time"),
+        coaching_topic=order_data.get("coaching_topic"),
+        coaching_hours=order_data.get("coaching_hours"),
+        status=PENDING,
+        checkout_token=checkout_token
+    )
+
+def _order_created_event(order: Order) -> OrderEvent:
+    """Первая запись журнала заказа — создание в статусе pending"""
+    return OrderEvent(order_id=order.order_id, from_status=None, to_status=PENDING)
+
 async def create_order(order_data: dict) -> Order:
     """Создает новый заказ"""
     async with AsyncSessionLocal() as session:
-        # Генерируем уникальный ID заказа
-        order_id = f"#Z{uuid.uuid4().hex[:6].upper()}"
-        
-        order = Order(
-            order_id=order_id,
-            user_id=order_data.get("user_id"),
-            service_type=order_data.get("service_type"),
-            boost_type=order_data.get("boost_type"),
-            region=order_data.get("region"),
-            current_rank=order_data.get("current_rank"),
-            target_rank=order_data.get("target_rank"),
-            current_mythic_stars=order_data.get("current_mythic_stars"),
-            target_mythic_stars=order_data.get("target_mythic_stars"),
-            hero=order_data.get("hero"),
-            lane=order_data.get("lane"),
-            heroes_mains=order_data.get("heroes_mains"),
-            game_login=order_data.get("game_login"),
-            game_password=order_data.get("game_password"),
-            game_id=order_data.get("game_id"),
-            contact_info=order_data.get("contact_info"),
-            base_cost=order_data.get("base_cost"),
-            multiplier=order_data.get("multiplier", 1.0),
-            total_cost=order_data.get("total_cost"),
-            currency=order_data.get("currency"),
-            details=order_data.get("details"),
-            preferred_time=order_data.get("preferred_time"),
-            coaching_topic=order_data.get("coaching_topic"),
-            coaching_hours=order_data.get("coaching_hours"),
-            status="pending"
-        )
+        order = _build_order(order_data)
         
         session.add(order)
+        await session.flush()
+        session.add(_order_created_event(order))
         await session.commit()
         await session.refresh(order)
         return order
 
-async def get_user_orders(user_id: int, limit: int = 10, offset: int = 0):
-    """Получает заказы пользователя"""
+async def get_order_by_checkout_token(checkout_token: str):
+    """Заказ, созданный при оформлении с этим токеном"""
     async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Order)
-            .where(Order.user_id == user_id)
-            .order_by(Order.created_at.desc())
-            .limit(limit)
-            .offset(offset)
+        result = await session.execute(select(Order).where(Order.checkout_token == checkout_token))
+        return result.scalar_one_or_none()
+
+async def checkout_order(checkout_token: str, order_data: dict, balance_field: str,
+                         balance_amount: float = 0, bonus_amount: float = 0, reset_discount: bool = False):
+    """Оформление заказа одной транзакцией: сброс скидки, списание бонусов и баланса, создание заказа.
+    
+    Всё или ничего: при нехватке средств или ошибке ничего не списывается.
+    Повторный вызов с тем же checkout_token возвращает уже созданный заказ без списаний.
+    Возвращает (заказ или None, создан ли заказ этим вызовом, сообщение об ошибке).
+    """
+    if balance_field not in USER_BALANCE_FIELDS:
+        raise ValueError(f"Неизвестное поле баланса: {balance_field}")
+    user_id = order_data.get("user_id")
+    currency = order_data.get("currency")
+    bonus_field = USER_BONUS_FIELDS.get(currency)
+    if bonus_amount > 0 and not bonus_field:
+        return None, False, "Неподдерживаемая валюта."
+    
+    async with AsyncSessionLocal() as session:
+        try:
+            existing = await session.execute(select(Order).where(Order.checkout_token == checkout_token))
+            order = existing.scalar_one_or_none()
+            if order:
+                return order, False, ""
+            
+            if reset_discount:
+                await session.execute(
+                    update(User).where(User.id == user_id).values(active_discount_percent=0)
+                    .execution_options(synchronize_session=False)
+                )
+            
+            if bonus_amount > 0:
+                result = await session.execute(
+                    _change_user_column_stmt(user_id, bonus_field, -bonus_amount).returning(User.id)
+                )
+                if result.scalar_one_or_none() is None:
+                    await session.rollback()
+                    user = await session.get(User, user_id)
+                    available = (getattr(user, bonus_field) or 0) if user else 0
+                    return None, False, f"Недостаточно бонусов. Доступно: {available:.2f} {currency}"
+                session.add(BonusHistory(
+                    user_id=user_id,
+                    amount=-bonus_amount,  # Отрицательная сумма означает списание
+                    source="Оплата заказа",
+                    comment=f"Использование бонусов для оплаты заказа ({bonus_amount} {currency})"
+                ))
+            
+            if balance_amount > 0:
+                result = await session.execute(
+                    _change_user_column_stmt(user_id, balance_field, -balance_amount).returning(User.id)
+                )
+                if result.scalar_one_or_none() is None:
+                    await session.rollback()
+                    user = await session.get(User, user_id)
+                    available = (getattr(user, balance_field) or 0) if user else 0
+                    return None, False, f"Недостаточно средств на балансе. Доступно: {available:.2f} {currency}"
+            
+            order = _build_order(order_data, checkout_token)
+            session.add(order)
+            await session.flush()
+            session.add(_order_created_event(order))
+            await session.commit()
+        except Exception as e:
+            # Параллельное подтверждение с тем же токеном могло успеть создать заказ
+            await session.rollback()
+            duplicate = await get_order_by_checkout_token(checkout_token)
+            if duplicate:
+                return duplicate, False, ""
+            logger.error(f"[CHECKOUT] Ошибка оформления заказа пользователя {user_id}: {e}")
+            return None, False, "Не удалось создать заказ."
+        finally:
+            user_cache.invalidate(user_id=user_id)
+        
+        await session.refresh(order)
+        return order, True, ""
+
+async def get_user_orders(user_id: int, limit: int = 10, after_id: int = None, before_id: int = None):
+    """Получает страницу заказов пользователя (keyset пагинация по created_at, id)"""
+    async with AsyncSessionLocal() as session:
+        return await fetch_keyset_page(
+            session, select(Order).where(Order.user_id == user_id), Order, limit,
+            after_id=after_id, before_id=before_id
         )
-        return result.scalars().all()
 
 # === НОВЫЕ ФУНКЦИИ ДЛЯ УПРАВЛЕНИЯ ЗАКАЗАМИ ===
 
@@ -845,43 +1066,189 @@ async def get_order_by_id(order_id: str):
         )
         return result.scalar_one_or_none()
 
-async def get_all_orders(status_filter: str = "all", limit: int = 20, offset: int = 0):
-    """Получает все заказы с фильтрацией по статусу"""
+async def get_all_orders(status_filter: str = "all", limit: int = 20, after_id: int = None, before_id: int = None):
+    """Получает страницу заказов с фильтрацией по статусу"""
     async with AsyncSessionLocal() as session:
-        query = select(Order).order_by(Order.created_at.desc())
+        query = select(Order)
         
         if status_filter != "all":
             query = query.where(Order.status == status_filter)
         
-        result = await session.execute(query.limit(limit).offset(offset))
-        return result.scalars().all()
+        return await fetch_keyset_page(session, query, Order, limit, after_id=after_id, before_id=before_id)
 
-async def update_order_status(order_id: str, new_status: str):
-    """Обновляет статус заказа"""
+async def get_orders_page_with_users(status_filter: str = "all", limit: int = 20,
+                                     after_id: int = None, before_id: int = None):
+    """Получает страницу заказов вместе с клиентом и бустером одним запросом"""
     async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Order).where(Order.order_id == order_id)
-        )
-        order = result.scalar_one_or_none()
-        if order:
-            order.status = new_status
-            await session.commit()
-            return order
+        query = select(Order).options(joinedload(Order.client), joinedload(Order.booster))
+        
+        if status_filter != "all":
+            query = query.where(Order.status == status_filter)
+        
+        return await fetch_keyset_page(session, query, Order, limit, after_id=after_id, before_id=before_id)
+
+# === ИДЕМПОТЕНТНЫЕ ДЕНЕЖНЫЕ ОПЕРАЦИИ ===
+# Повторное нажатие кнопки или повторная доставка callback'а от Telegram
+# не должны второй раз вернуть деньги или начислить выплату. Статус меняется
+# compare-and-set'ом (UPDATE ... WHERE status = :expected), ключ действия пишется
+# в processed_actions, а деньги двигаются в той же транзакции.
+
+def _transition_status_stmt(model, key_column, key, expected, new_status: str, **values):
+    """UPDATE ... SET status = new_status WHERE key_column = key AND status IN expected"""
+    if isinstance(expected, str):
+        expected = (expected,)
+    return (
+        update(model)
+        .where(key_column == key, model.status.in_(expected))
+        .values(status=new_status, **values)
+        .execution_options(synchronize_session=False)
+    )
+
+async def _claim_action(session, action: str, entity_id, callback_id: str = None) -> bool:
+    """Записывает ключ (action, entity_id) в текущей транзакции. False — действие уже выполнено"""
+    session.add(ProcessedAction(action=action, entity_id=str(entity_id), callback_id=callback_id))
+    try:
+        await session.flush()
+    except IntegrityError:
+        return False
+    return True
+
+async def _apply_order_transition(session, order_id: str, new_status: str, actor_tg_id: int = None,
+                                  expected=None, **values):
+    """Переход статуса заказа внутри транзакции вызывающего.
+    
+    Переход проверяется по ORDER_TRANSITIONS и выполняется одним UPDATE
+    с условием на текущий статус, в order_events добавляется запись.
+    Возвращает строку (status, user_id, total_cost) до перехода
+    или None, если заказ не найден или переход не разрешен.
+    """
+    sources = source_statuses(new_status, expected)
+    result = await session.execute(
+        select(Order.status, Order.user_id, Order.total_cost).where(Order.order_id == order_id)
+    )
+    row = result.one_or_none()
+    if row is None or row.status not in sources:
+        return None
+    result = await session.execute(
+        _transition_status_stmt(Order, Order.order_id, order_id, row.status, new_status, **values)
+    )
+    if result.rowcount != 1:
+        # Статус успели изменить параллельно
         return None
+    session.add(OrderEvent(order_id=order_id, from_status=row.status, to_status=new_status, actor_tg_id=actor_tg_id))
+    return row
 
-async def assign_booster_to_order(order_id: str, booster_id: int):
-    """Назначает бустера на заказ"""
+async def transition_order_status(order_id: str, new_status: str, actor_tg_id: int = None,
+                                  expected=None, outbox=None, **values):
+    """Переводит заказ в new_status, если переход разрешен.
+    
+    expected сужает допустимые исходные статусы, values — дополнительные
+    поля заказа, обновляемые тем же UPDATE. outbox — уведомления, которые
+    ставятся в очередь в той же транзакции. Возвращает обновленный заказ
+    или None, если заказ не найден или переход не выполнен.
+    """
     async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Order).where(Order.order_id == order_id)
-        )
-        order = result.scalar_one_or_none()
-        if order:
-            order.assigned_booster_id = booster_id
-            order.status = "confirmed"
+        if await _apply_order_transition(session, order_id, new_status, actor_tg_id, expected, **values) is None:
+            await session.rollback()
+            logger.warning(f"[ORDER] Переход заказа {order_id} в {new_status} не выполнен")
+            return None
+        _enqueue_outbox(session, outbox)
+        await session.commit()
+        result = await session.execute(select(Order).where(Order.order_id == order_id))
+        return result.scalar_one_or_none()
+
+async def reject_order_with_refund(order_id: str, balance_field: str, callback_id: str = None,
+                                   actor_tg_id: int = None, outbox=None) -> bool:
+    """Отмена заказа и возврат total_cost клиенту одной транзакцией.
+    
+    Возвращает True, если отмена выполнена этим вызовом, и False,
+    если заказ не найден, уже отменен или уже не может быть отменен.
+    """
+    if balance_field not in USER_BALANCE_FIELDS:
+        raise ValueError(f"Неизвестное поле баланса: {balance_field}")
+    async with AsyncSessionLocal() as session:
+        try:
+            row = await _apply_order_transition(session, order_id, CANCELLED, actor_tg_id)
+            if row is None or not await _claim_action(session, "order_reject", order_id, callback_id):
+                await session.rollback()
+                return False
+            await session.execute(_change_user_column_stmt(row.user_id, balance_field, row.total_cost or 0))
+            _enqueue_outbox(session, outbox)
             await session.commit()
-            return order
-        return None
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"[ORDER] Ошибка отмены заказа {order_id} с возвратом: {e}")
+            return False
+    user_cache.invalidate(user_id=row.user_id)
+    logger.info(f"[ORDER] Заказ {order_id} отменен, клиенту {row.user_id} возвращено {row.total_cost} ({balance_field})")
+    return True
+
+async def complete_order_with_payout(order_id: str, booster_id: int, amount_usd: float,
+                                     callback_id: str = None, actor_tg_id: int = None, outbox=None) -> bool:
+    """Завершение заказа после проверки и начисление бустеру в USD одной транзакцией.
+    
+    Возвращает True, если заказ завершен этим вызовом, и False,
+    если заказ не найден или уже не ожидает проверки.
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            row = await _apply_order_transition(session, order_id, COMPLETED, actor_tg_id, expected=PENDING_REVIEW)
+            if row is None or not await _claim_action(session, "order_complete", order_id, callback_id):
+                await session.rollback()
+                return False
+            credited = await session.execute(
+                update(BoosterAccount).where(BoosterAccount.user_id == booster_id)
+                .values(balance_usd=func.coalesce(BoosterAccount.balance_usd, 0) + amount_usd)
+                .execution_options(synchronize_session=False)
+            )
+            if credited.rowcount != 1:
+                logger.warning(f"[BOOSTER PAYOUT] Аккаунт бустера {booster_id} не найден, заказ {order_id} завершен без начисления")
+            _enqueue_outbox(session, outbox)
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"[ORDER] Ошибка завершения заказа {order_id}: {e}")
+            return False
+    logger.info(f"[BOOSTER PAYOUT] Заказ {order_id} завершен, бустеру {booster_id} начислено {amount_usd} USD")
+    return True
+
+async def accept_payment_request(request_id: int, balance_field: str, callback_id: str = None):
+    """Принятие заявки на пополнение и зачисление суммы на баланс одной транзакцией.
+    
+    Возвращает новый баланс пользователя или None,
+    если заявка не найдена или уже обработана.
+    """
+    if balance_field not in USER_BALANCE_FIELDS:
+        raise ValueError(f"Неизвестное поле баланса: {balance_field}")
+    async with AsyncSessionLocal() as session:
+        try:
+            result = await session.execute(
+                _transition_status_stmt(PaymentRequest, PaymentRequest.id, request_id, "pending", "accepted")
+                .returning(PaymentRequest.user_id, PaymentRequest.amount)
+            )
+            request = result.one_or_none()
+            if request is None or not await _claim_action(session, "payment_accept", request_id, callback_id):
+                await session.rollback()
+                return None
+            result = await session.execute(
+                _change_user_column_stmt(request.user_id, balance_field, request.amount)
+                .returning(*_BALANCE_RETURNING)
+            )
+            row = result.one_or_none()
+            if row is None:
+                # Пользователь удален — заявку не принимаем
+                await session.rollback()
+                return None
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"[PAYMENT] Ошибка принятия заявки {request_id}: {e}")
+            return None
+    return await _after_balance_change(request.user_id, balance_field, request.amount, row)
+
+async def assign_booster_to_order(order_id: str, booster_id: int, actor_tg_id: int = None, outbox=None):
+    """Назначает (или переназначает) бустера на заказ, заказ переходит в confirmed"""
+    return await transition_order_status(order_id, CONFIRMED, actor_tg_id, outbox=outbox, assigned_booster_id=booster_id)
 
 async def get_boosters():
     """Получает всех активных бустеров"""
@@ -903,9 +1270,6 @@ async def get_active_boosters():
 
 async def get_orders_by_booster(booster_id: int):
     """Получает заказы назначенные бустеру"""
-    import logging
-    logger = logging.getLogger(__name__)
-    
     async with AsyncSessionLocal() as session:
         result = await session.execute(
             select(Order)
@@ -913,11 +1277,46 @@ async def get_orders_by_booster(booster_id: int):
             .order_by(Order.created_at.desc())
         )
         orders = result.scalars().all()
-        logger.info(f"CRUD: get_orders_by_booster({booster_id}) нашел {len(orders)} заказов")
-        for order in orders[:3]:  # Логируем первые 3 заказа
-            logger.info(f"CRUD: Заказ {order.order_id}: статус {order.status}, назначен {order.assigned_booster_id}")
+        logger.debug(f"CRUD: get_orders_by_booster({booster_id}) нашел {len(orders)} заказов")
         return orders
 
+async def count_booster_orders_by_status(booster_id: int) -> dict:
+    """Количество заказов бустера по статусам одним GROUP BY запросом"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Order.status, func.count())
+            .where(Order.assigned_booster_id == booster_id)
+            .group_by(Order.status)
+        )
+        return {status: count for status, count in result.all()}
+
+async def get_booster_orders_page(booster_id: int, statuses: list = None, limit: int = 5,
+                                  after_id: int = None, before_id: int = None):
+    """Страница заказов бустера с keyset пагинацией по (created_at, id).
+    
+    after_id — следующая страница после заказа с этим id,
+    before_id — предыдущая страница перед заказом с этим id.
+    """
+    async with AsyncSessionLocal() as session:
+        query = select(Order).where(Order.assigned_booster_id == booster_id)
+        if statuses:
+            query = query.where(Order.status.in_(statuses))
+        return await fetch_keyset_page(session, query, Order, limit, after_id=after_id, before_id=before_id)
+
+async def get_booster_order_stats(booster_id: int) -> dict:
+    """Статистика бустера на стороне БД: заказы по статусам и сумма завершенных по валютам"""
+    by_status = await count_booster_orders_by_status(booster_id)
+    async with AsyncSessionLocal() as session:
+        earned_result = await session.execute(
+            select(Order.currency, func.coalesce(func.sum(Order.total_cost), 0))
+            .where(Order.assigned_booster_id == booster_id, Order.status == "completed")
+            .group_by(Order.currency)
+        )
+        return {
+            "by_status": by_status,
+            "completed_by_currency": {currency: total for currency, total in earned_result.all()},
+        }
+
 async def count_orders_by_status(status: str = None):
     """Подсчитывает количество заказов по статусу"""
     async with AsyncSessionLocal() as session:
@@ -927,26 +1326,32 @@ async def count_orders_by_status(status: str = None):
         result = await session.execute(query)
         return result.scalar_one()
 
+async def count_orders_grouped_by_status() -> dict:
+    """Подсчитывает заказы по всем статусам одним GROUP BY запросом"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Order.status, func.count()).group_by(Order.status)
+        )
+        return {status: count for status, count in result.all()}
+
 async def search_orders(query: str):
     """Поиск заказов по ID или имени пользователя"""
     async with AsyncSessionLocal() as session:
         # Поиск по ID заказа
         if query.startswith("#"):
             result = await session.execute(
-                select(Order).where(Order.order_id.ilike(f"%{query}%"))
+                select(Order).where(Order.order_id.icontains(query, autoescape=True))
             )
             return result.scalars().all()
         
         # Поиск по имени пользователя или telegram ID
+        conditions = [User.username.icontains(query, autoescape=True)]
+        if query.isdigit():
+            conditions.append(User.tg_id == int(query))
         result = await session.execute(
             select(Order)
             .join(User, Order.user_id == User.id)
-            .where(
-                or_(
-                    User.username.ilike(f"%{query}%"),
-                    User.tg_id == int(query) if query.isdigit() else False
-                )
-            )
+            .where(or_(*conditions))
         )
         return result.scalars().all()
 
@@ -967,13 +1372,44 @@ async def get_orders_count(user_id: int) -> int:
     """Получает количество заказов пользователя"""
     async with AsyncSessionLocal() as session:
         result = await session.execute(
-            select(Order)
+            select(func.count(Order.id))
             .where(Order.user_id == user_id)
         )
-        orders = result.scalars().all()
-        return len(orders)
+        return result.scalar() or 0
+
 
 
+async def count_referrals(user_id: int) -> int:
+    """Количество приглашённых пользователем через COUNT"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(func.count(User.id)).where(User.referrer_id == user_id)
+        )
+        return result.scalar() or 0
+
+async def get_referrals(user_id: int, limit: int = 10):
+    """Последние приглашённые пользователем (ограниченный список)"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(User)
+            .where(User.referrer_id == user_id)
+            .order_by(User.created_at.desc(), User.id.desc())
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+async def get_referral_bonus_summary(user_id: int):
+    """Сумма реферальных бонусов и число рефералов с пополнением одним агрегатом"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(
+                func.coalesce(func.sum(BonusHistory.amount), 0),
+                func.count(func.nullif(BonusHistory.comment, "")),
+            )
+            .where(BonusHistory.user_id == user_id, BonusHistory.source == "Реферал")
+        )
+        total_amount, with_comment = result.one()
+        return float(total_amount or 0), with_comment or 0
 
 async def get_users_by_role(role: str):
     """Получение пользователей по роли"""
@@ -989,63 +1425,60 @@ async def get_users_by_role(role: str):
         logger.error(f"Ошибка получения пользователей с ролью '{role}': {e}")
         return []
 
-async def approve_payout_request(request_id: int, receipt_file_id: str):
-    """Одобряет запрос на выплату с загруженным чеком"""
+async def approve_payout_request(request_id: int, receipt_file_id: str, callback_id: str = None):
+    """Одобряет запрос на выплату с загруженным чеком и списывает сумму с баланса бустера.
+    
+    Одобряется только запрос в статусе pending: повторная загрузка чека
+    возвращает None и не отправляет бустеру второе уведомление. Списание
+    с проверкой остатка идет в той же транзакции: если средств уже не хватает,
+    запрос остается в pending и функция возвращает None.
+    """
     logger.info(f"[PAYOUT REQUEST] Одобрение запроса выплаты {request_id} с чеком {receipt_file_id}")
     
     async with AsyncSessionLocal() as session:
         try:
             result = await session.execute(
-                select(BoosterPayoutRequest).where(BoosterPayoutRequest.id == request_id)
+                _transition_status_stmt(
+                    BoosterPayoutRequest, BoosterPayoutRequest.id, request_id, "pending", "approved",
+                    receipt_file_id=receipt_file_id, updated_at=datetime.now()
+                ).returning(
+                    BoosterPayoutRequest.booster_account_id, BoosterPayoutRequest.currency, BoosterPayoutRequest.amount
+                )
             )
-            payout_request = result.scalar_one_or_none()
+            payout = result.one_or_none()
+            if payout is None or not await _claim_action(session, "payout_approve", request_id, callback_id):
+                await session.rollback()
+                logger.warning(f"[PAYOUT REQUEST] Запрос выплаты {request_id} не найден или уже обработан")
+                return None
             
-            if not payout_request:
-                logger.error(f"[PAYOUT REQUEST] Запрос выплаты {request_id} не найден")
+            # Баланс при создании запроса не резервируется: списываем при одобрении с проверкой остатка
+            balance_field = PAYOUT_BALANCE_FIELDS.get(payout.currency)
+            debit = None
+            if balance_field:
+                debit = await session.execute(
+                    _change_booster_column_stmt(
+                        BoosterAccount.id == payout.booster_account_id, balance_field, -payout.amount
+                    )
+                )
+            if debit is None or debit.rowcount != 1:
+                await session.rollback()
+                logger.warning(
+                    f"[PAYOUT REQUEST] Недостаточно средств {payout.currency} для выплаты по запросу {request_id}"
+                )
                 return None
-                
-            # Обновляем статус и добавляем чек
-            payout_request.status = "approved"
-            payout_request.receipt_file_id = receipt_file_id
-            payout_request.updated_at = datetime.now()
             
             await session.commit()
+            logger.info(
+                f"[PAYOUT REQUEST] Списано {payout.amount} {payout.currency} с аккаунта {payout.booster_account_id}"
+            )
             logger.info(f"[PAYOUT REQUEST] Запрос выплаты {request_id} одобрен с чеком")
-            return payout_request
+            return await session.get(BoosterPayoutRequest, request_id)
             
         except Exception as e:
             await session.rollback()
             logger.error(f"[PAYOUT REQUEST] Ошибка при одобрении запроса {request_id}: {e}")
             return None
 
-async def reject_payout_request(request_id: int):
-    """Отклоняет запрос на выплату"""
-    logger.info(f"[PAYOUT REQUEST] Отклонение запроса выплаты {request_id}")
-    
-    async with AsyncSessionLocal() as session:
-        try:
-            result = await session.execute(
-                select(BoosterPayoutRequest).where(BoosterPayoutRequest.id == request_id)
-            )
-            payout_request = result.scalar_one_or_none()
-            
-            if not payout_request:
-                logger.error(f"[PAYOUT REQUEST] Запрос выплаты {request_id} не найден")
-                return None
-                
-            # Обновляем статус
-            payout_request.status = "rejected"
-            payout_request.updated_at = datetime.now()
-            
-            await session.commit()
-            logger.info(f"[PAYOUT REQUEST] Запрос выплаты {request_id} отклонен")
-            return payout_request
-            
-        except Exception as e:
-            await session.rollback()
-            logger.error(f"[PAYOUT REQUEST] Ошибка при отклонении запроса {request_id}: {e}")
-            return None
-
 async def get_all_payout_requests():
     """Получает все запросы на выплату"""
     async with AsyncSessionLocal() as session:
@@ -1057,3 +1490,235 @@ async def get_all_payout_requests():
         except Exception as e:
             logger.error(f"[PAYOUT REQUEST] Ошибка при получении всех запросов: {e}")
             return []
+
+# === РАССЫЛКИ ===
+
+def _broadcast_recipients_filters(role: str = None, exclude_tg_id: int = None):
+    filters = [or_(User.bot_blocked.is_(None), User.bot_blocked.is_(False))]
+    if role:
+        filters.append(User.role == role)
+    if exclude_tg_id is not None:
+        filters.append(User.tg_id != exclude_tg_id)
+    return filters
+
+async def create_broadcast(admin_tg_id: int, text: str = None, photo_file_id: str = None, role: str = None,
+                           progress_chat_id: int = None, progress_message_id: int = None) -> Broadcast:
+    """Создает рассылку в статусе running; total — число получателей на момент запуска"""
+    async with AsyncSessionLocal() as session:
+        total = await session.scalar(
+            select(func.count(User.id)).where(*_broadcast_recipients_filters(role, admin_tg_id))
+        )
+        broadcast = Broadcast(
+            admin_tg_id=admin_tg_id,
+            role=role,
+            text=text,
+            photo_file_id=photo_file_id,
+            status="running",
+            last_user_id=0,
+            total=total or 0,
+            delivered=0,
+            failed=0,
+            blocked=0,
+            progress_chat_id=progress_chat_id,
+            progress_message_id=progress_message_id
+        )
+        session.add(broadcast)
+        await session.commit()
+        await session.refresh(broadcast)
+        return broadcast
+
+async def get_broadcast(broadcast_id: int):
+    async with AsyncSessionLocal() as session:
+        return await session.get(Broadcast, broadcast_id)
+
+async def get_running_broadcasts():
+    """Незавершенные рассылки — продолжаются после перезапуска бота"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Broadcast).where(Broadcast.status == "running").order_by(Broadcast.id)
+        )
+        return result.scalars().all()
+
+async def get_broadcast_recipients(role: str = None, after_id: int = 0, limit: int = 500,
+                                   exclude_tg_id: int = None):
+    """Очередная пачка получателей (id, tg_id) после users.id = after_id в порядке id"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(User.id, User.tg_id)
+            .where(User.id > after_id, *_broadcast_recipients_filters(role, exclude_tg_id))
+            .order_by(User.id)
+            .limit(limit)
+        )
+        return result.all()
+
+async def save_broadcast_progress(broadcast_id: int, last_user_id: int, delivered: int, failed: int,
+                                  blocked: int, status: str = None) -> bool:
+    """Сохраняет чекпоинт рассылки. False — рассылку успели отменить"""
+    values = dict(last_user_id=last_user_id, delivered=delivered, failed=failed, blocked=blocked)
+    if status:
+        values.update(status=status, finished_at=func.now())
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(Broadcast).where(Broadcast.id == broadcast_id, Broadcast.status == "running")
+            .values(**values).execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        return result.rowcount == 1
+
+async def stop_broadcast(broadcast_id: int) -> bool:
+    """Останавливает рассылку. False — она уже завершена или отменена"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(Broadcast).where(Broadcast.id == broadcast_id, Broadcast.status == "running")
+            .values(status="cancelled", finished_at=func.now()).execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        return result.rowcount == 1
+
+# === OUTBOX ИСХОДЯЩИХ СООБЩЕНИЙ ===
+# Уведомления пишутся в outbox той же транзакцией, что и изменение,
+# и отправляются воркерами (app/utils/outbox.py) независимо от хендлера.
+
+def _enqueue_outbox(session, messages):
+    """Добавляет сообщения (словари из outbox_message) в текущую транзакцию"""
+    for message in messages or ():
+        session.add(OutboxMessage(**message))
+
+async def enqueue_outbox(messages):
+    """Ставит сообщения в очередь отдельной транзакцией"""
+    async with AsyncSessionLocal() as session:
+        _enqueue_outbox(session, messages)
+        await session.commit()
+
+async def claim_outbox_batch(limit: int, lease_seconds: float):
+    """Забирает до limit сообщений, готовых к отправке.
+    
+    Из каждого чата берется только самое раннее неотправленное сообщение,
+    поэтому порядок внутри чата сохраняется. Забранные сообщения скрываются
+    от других воркеров на lease_seconds — если воркер упал, их заберут снова.
+    """
+    now = datetime.now()
+    earlier = aliased(OutboxMessage)
+    chat_head = (
+        select(func.min(earlier.id))
+        .where(earlier.chat_id == OutboxMessage.chat_id, earlier.status == "pending")
+        .correlate(OutboxMessage)
+        .scalar_subquery()
+    )
+    async with AsyncSessionLocal() as session:
+        ids = (await session.execute(
+            select(OutboxMessage.id)
+            .where(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now,
+                   OutboxMessage.id == chat_head)
+            .order_by(OutboxMessage.id)
+            .limit(limit)
+        )).scalars().all()
+        if not ids:
+            return []
+        # Условие на next_attempt_at повторно: параллельный воркер мог забрать те же строки
+        result = await session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids), OutboxMessage.status == "pending",
+                   OutboxMessage.next_attempt_at <= now)
+            .values(next_attempt_at=now + timedelta(seconds=lease_seconds), attempts=OutboxMessage.attempts + 1)
+            .returning(OutboxMessage.id, OutboxMessage.chat_id, OutboxMessage.text,
+                       OutboxMessage.parse_mode, OutboxMessage.reply_markup, OutboxMessage.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        claimed = result.all()
+        await session.commit()
+        return sorted(claimed, key=lambda row: row.id)
+
+async def mark_outbox_sent(message_ids):
+    if not message_ids:
+        return
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(OutboxMessage).where(OutboxMessage.id.in_(message_ids))
+            .values(status="sent", sent_at=datetime.now(), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+
+async def mark_outbox_failed(message_id: int, error: str, retry_in: float = None):
+    """Ошибка отправки: повтор через retry_in секунд или dead-letter, если retry_in не задан"""
+    values = {"last_error": error[:1000]}
+    if retry_in is None:
+        values["status"] = "dead"
+    else:
+        values["next_attempt_at"] = datetime.now() + timedelta(seconds=retry_in)
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(OutboxMessage).where(OutboxMessage.id == message_id)
+            .values(**values).execution_options(synchronize_session=False)
+        )
+        await session.commit()
+
+async def purge_sent_outbox(older_than_days: int = 7) -> int:
+    """Удаляет давно отправленные сообщения; dead-letter остаются для разбора"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            delete(OutboxMessage).where(
+                OutboxMessage.status == "sent",
+                OutboxMessage.sent_at < datetime.now() - timedelta(days=older_than_days)
+            )
+        )
+        await session.commit()
+        return result.rowcount
+
+# === ХРАНИЛИЩЕ FSM ===
+
+def _fsm_fresh(ttl: int):
+    """Условие "запись не истекла": ttl=0 — состояния не истекают"""
+    if not ttl:
+        return true()
+    return FsmState.updated_at >= datetime.now() - timedelta(seconds=ttl)
+
+async def get_fsm_record(key: str, ttl: int):
+    """(state, data) по ключу FSM или None, если записи нет или она истекла"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(FsmState.state, FsmState.data).where(FsmState.key == key, _fsm_fresh(ttl))
+        )
+        return result.one_or_none()
+
+async def save_fsm_record(key: str, ttl: int, **values) -> None:
+    """Записывает state и/или data по ключу FSM (upsert без диалектных конструкций)"""
+    values["updated_at"] = datetime.now()
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(FsmState).where(FsmState.key == key, _fsm_fresh(ttl)).values(**values)
+        )
+        if not result.rowcount:
+            # Записи нет или она истекла: начинаем диалог с чистого листа
+            await session.execute(delete(FsmState).where(FsmState.key == key))
+            session.add(FsmState(key=key, **values))
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Параллельный апдейт того же пользователя успел вставить строку
+            await session.rollback()
+            await session.execute(update(FsmState).where(FsmState.key == key).values(**values))
+            await session.commit()
+        
+        if any(value is None for value in values.values()):
+            # state.clear(): пустые записи не храним
+            await session.execute(
+                delete(FsmState).where(FsmState.key == key, FsmState.state.is_(None), FsmState.data.is_(None))
+            )
+            await session.commit()
+
+async def delete_expired_fsm_records(ttl: int, batch_size: int) -> int:
+    """Удаляет брошенные диалоги пачками, не держа долгую блокировку на записи"""
+    cutoff = datetime.now() - timedelta(seconds=ttl)
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            expired = select(FsmState.key).where(FsmState.updated_at < cutoff).limit(batch_size)
+            result = await session.execute(
+                delete(FsmState).where(FsmState.key.in_(expired)).execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
@@ -1,7 +1,79 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from app.config import (
+    DATABASE_URL, DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_TIMEOUT,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE, SQLITE_TEMP_STORE, SQLITE_POOL_SIZE
+)
 
-DATABASE_URL = "sqlite+aiosqlite:///rich_boost.db"
+# Синхронные драйверы для alembic вместо асинхронных
+_SYNC_DRIVERS = {
+    "sqlite+aiosqlite": "sqlite",
+    "postgresql+asyncpg": "postgresql",
+}
 
-engine = create_async_engine(DATABASE_URL, echo=False)
-AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
\ No newline at end of file
+def is_sqlite(url: str = DATABASE_URL) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def get_sqlite_path(url: str = DATABASE_URL):
+    """Путь к файлу SQLite из URL движка; None — база в памяти или не SQLite"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return None
+    return parsed.database
+
+def get_sync_database_url(url: str = DATABASE_URL) -> str:
+    """URL с синхронным драйвером (для миграций alembic)"""
+    parsed = make_url(url)
+    drivername = _SYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+def _sqlite_pragmas():
+    # busy_timeout первым: смена journal_mode тоже может упереться в блокировку
+    return {
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "journal_mode": SQLITE_JOURNAL_MODE,
+        "synchronous": SQLITE_SYNCHRONOUS,
+        "cache_size": SQLITE_CACHE_SIZE,
+        "mmap_size": SQLITE_MMAP_SIZE,
+        "temp_store": SQLITE_TEMP_STORE,
+    }
+
+def create_engine(url: str = DATABASE_URL, **kwargs):
+    """Единая фабрика движка: для SQLite на каждое соединение применяются PRAGMA,
+    для серверных СУБД настраивается пул соединений"""
+    if not is_sqlite(url):
+        kwargs.setdefault("pool_size", DB_POOL_SIZE)
+        kwargs.setdefault("max_overflow", DB_MAX_OVERFLOW)
+        kwargs.setdefault("pool_recycle", DB_POOL_RECYCLE)
+        kwargs.setdefault("pool_timeout", DB_POOL_TIMEOUT)
+        kwargs.setdefault("pool_pre_ping", True)
+    elif get_sqlite_path(url):
+        # По умолчанию у файловой SQLite NullPool: каждая сессия открывает свое соединение,
+        # и сотни писателей толкаются в busy-обработчике SQLite, который не гарантирует
+        # очередности и отдает "database is locked". Небольшой пул ставит их в очередь FIFO
+        kwargs.setdefault("poolclass", AsyncAdaptedQueuePool)
+        kwargs.setdefault("pool_size", SQLITE_POOL_SIZE)
+        kwargs.setdefault("max_overflow", 0)
+        kwargs.setdefault("pool_timeout", DB_POOL_TIMEOUT)
+    engine = create_async_engine(url, echo=DB_ECHO, **kwargs)
+    
+    if engine.dialect.name == "sqlite":
+        pragmas = _sqlite_pragmas()
+        
+        @event.listens_for(engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+    
+    return engine
+
+engine = create_engine()
+AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
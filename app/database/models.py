@@ -1,12 +1,14 @@
-from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey, Float, Boolean, Text
+from datetime import datetime
+from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, func, ForeignKey, Float, Boolean, Text, Index, Enum
+from app.database.order_status import ORDER_STATUSES, PENDING
 
 Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True)
-    tg_id = Column(Integer, unique=True, nullable=False, index=True)
+    tg_id = Column(BigInteger, unique=True, nullable=False, index=True)  # id Telegram не помещаются в 32 бита
     username = Column(String)
     region = Column(String)
     balance_kg = Column(Float, default=0)
@@ -17,7 +19,8 @@ class User(Base):
     bonus_ru = Column(Float, default=0)
     role = Column(String, default="user", index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    referrer_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # <-- Новое поле
+    referrer_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)  # <-- Новое поле
+    bot_blocked = Column(Boolean, default=False)  # Пользователь заблокировал бота (рассылки его пропускают)
     active_discount_percent = Column(Float, default=0)  # Активная скидка в процентах
 
 class BoosterAccount(Base):
@@ -30,6 +33,7 @@ class BoosterAccount(Base):
     balance_ru = Column(Float, default=0)  # Баланс в рублях (РУ)
     balance_usd = Column(Float, default=0)  # Баланс в долларах (USD)
     status = Column(String, default="active") 
+    user = relationship("User")
 
 class BoosterPayout(Base):
     __tablename__ = "booster_payouts"
@@ -53,6 +57,14 @@ class BoosterPayoutRequest(Base):
     admin_comment = Column(String, nullable=True)
     admin_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Кто обработал запрос
     receipt_file_id = Column(String, nullable=True)  # file_id чека выплаты
+    booster_account = relationship("BoosterAccount")
+    admin = relationship("User", foreign_keys=[admin_id])
+    
+    __table_args__ = (
+        # Списки выплат админа по статусу и запросы бустера, новые сверху
+        Index("ix_payout_requests_status_created", "status", "created_at"),
+        Index("ix_payout_requests_account_created", "booster_account_id", "created_at"),
+    )
 
 class PaymentRequest(Base):
     __tablename__ = "payment_requests"
@@ -63,6 +75,12 @@ class PaymentRequest(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(String, default="pending")  # pending, accepted, rejected
     receipt_file_id = Column(String)  # file_id скрина чека
+    
+    __table_args__ = (
+        # История пополнений пользователя в регионе и фильтр заявок админа по статусу
+        Index("ix_payment_requests_user_region_created", "user_id", "region", "created_at"),
+        Index("ix_payment_requests_status_created", "status", "created_at"),
+    )
 
 class PromoCode(Base):
     __tablename__ = "promo_codes"
@@ -88,6 +106,11 @@ class PromoActivation(Base):
     promo_id = Column(Integer)
     promo_code = Column(String)  # Новый уникальный идентификатор промокода
     activated_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Проверка повторной активации промокода пользователем
+        Index("ix_promo_activations_user_code", "user_id", "promo_code"),
+    )
 
 class BonusHistory(Base):
     __tablename__ = "bonus_history"
@@ -97,6 +120,11 @@ class BonusHistory(Base):
     source = Column(String)  # например: "Реферал", "Промокод", "Админ"
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     comment = Column(String, nullable=True)
+    
+    __table_args__ = (
+        # История бонусов пользователя, в т.ч. только реферальных
+        Index("ix_bonus_history_user_source_created", "user_id", "source", "created_at"),
+    )
 
 class Order(Base):
     __tablename__ = "orders"
@@ -138,7 +166,15 @@ class Order(Base):
     coaching_hours = Column(Integer, nullable=True)
     
     # Статус заказа
-    status = Column(String, default="pending")  # pending, confirmed, in_progress, completed, cancelled
+    # Переходы между статусами — только через transition_order_status (app/database/order_status.py)
+    status = Column(
+        Enum(*ORDER_STATUSES, name="order_status", native_enum=False, create_constraint=True,
+             validate_strings=True, length=20),
+        default=PENDING
+    )
+    
+    # Токен оформления из FSM: повторное подтверждение не создает второй заказ
+    checkout_token = Column(String, nullable=True)
     
     # Даты
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -146,13 +182,108 @@ class Order(Base):
     
     # Связи
     assigned_booster_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    client = relationship("User", foreign_keys=[user_id])
+    booster = relationship("User", foreign_keys=[assigned_booster_id])
     
     # Файлы доказательств завершения (JSON массив file_id)
     completion_files = Column(Text, nullable=True)  # JSON массив с file_id и типами файлов
     
+    __table_args__ = (
+        # Список заказов бустера: фильтр по статусу и keyset пагинация по дате
+        Index("ix_orders_booster_status_created", "assigned_booster_id", "status", "created_at"),
+        # Заказы клиента, список админа по статусу и общий список, новые сверху
+        Index("ix_orders_user_created", "user_id", "created_at"),
+        Index("ix_orders_status_created", "status", "created_at"),
+        Index("ix_orders_created_at", "created_at"),
+        Index("ix_orders_checkout_token", "checkout_token", unique=True),
+    )
+    
     def __repr__(self):
         return f"<Order {self.order_id}>"
 
+class OrderEvent(Base):
+    """Журнал переходов статусов заказа: время в каждом статусе, SLA, дашборды"""
+    __tablename__ = "order_events"
+    
+    id = Column(Integer, primary_key=True)
+    order_id = Column(String, ForeignKey("orders.order_id"), nullable=False)
+    from_status = Column(String(20), nullable=True)  # None — создание заказа
+    to_status = Column(String(20), nullable=False)
+    actor_tg_id = Column(BigInteger, nullable=True)  # Кто выполнил переход (None — система)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_order_events_order_created", "order_id", "created_at"),
+        Index("ix_order_events_status_created", "to_status", "created_at"),
+    )
+    
+    def __repr__(self):
+        return f"<OrderEvent {self.order_id}: {self.from_status} -> {self.to_status}>"
+
+class Broadcast(Base):
+    """Рассылка: текст/фото, получатели и чекпоинт для продолжения после перезапуска"""
+    __tablename__ = "broadcasts"
+    
+    id = Column(Integer, primary_key=True)
+    admin_tg_id = Column(BigInteger, nullable=False)  # Кто запустил (себе не отправляем)
+    role = Column(String, nullable=True)              # None — все пользователи, иначе роль получателей
+    text = Column(Text, nullable=True)
+    photo_file_id = Column(String, nullable=True)
+    status = Column(String, default="running")        # running, completed, cancelled
+    last_user_id = Column(Integer, default=0)         # Чекпоинт: users.id последнего обработанного получателя
+    total = Column(Integer, default=0)
+    delivered = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    blocked = Column(Integer, default=0)
+    progress_chat_id = Column(BigInteger, nullable=True)     # Сообщение с живым прогрессом
+    progress_message_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_broadcasts_status", "status"),
+    )
+    
+    def __repr__(self):
+        return f"<Broadcast {self.id} {self.status}>"
+
+class OutboxMessage(Base):
+    """Исходящее сообщение Telegram: пишется в одной транзакции с изменением, отправляется воркером"""
+    __tablename__ = "outbox"
+    
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    parse_mode = Column(String, nullable=True)
+    reply_markup = Column(Text, nullable=True)   # JSON клавиатуры
+    status = Column(String, default="pending")   # pending, sent, dead
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.now)  # Не раньше этого времени (ретраи и аренда воркером)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    sent_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Выборка готовых к отправке и первого неотправленного сообщения в чате
+        Index("ix_outbox_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_outbox_chat_status_id", "chat_id", "status", "id"),
+    )
+    
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} -> {self.chat_id} {self.status}>"
+
+class FsmState(Base):
+    """Состояние FSM пользователя (мастер заказа и другие диалоги): переживает перезапуск бота"""
+    __tablename__ = "fsm_states"
+    
+    key = Column(String, primary_key=True)   # bot_id:chat_id:user_id[:thread_id]:destiny
+    state = Column(String, nullable=True)
+    data = Column(Text, nullable=True)       # Компактный JSON
+    updated_at = Column(DateTime, default=datetime.now, index=True)  # По нему истекают брошенные диалоги
+    
+    def __repr__(self):
+        return f"<FsmState {self.key} {self.state}>"
+
 class BotSettings(Base):
     __tablename__ = "bot_settings"
     
@@ -165,4 +296,32 @@ class BotSettings(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     def __repr__(self):
-        return f"<BotSettings {self.key}={self.value}>"
\ No newline at end of file
+        return f"<BotSettings {self.key}={self.value}>"
+
+class CurrencyRate(Base):
+    __tablename__ = "currency_rates"
+    
+    id = Column(Integer, primary_key=True)
+    code = Column(String, unique=True, nullable=False)  # Код валюты (KGS, KZT, RUB)
+    rate = Column(Float, nullable=False)                # Сколько единиц валюты за 1 USD
+    updated_at = Column(DateTime(timezone=True), nullable=False)  # Когда курс получен из API
+    
+    def __repr__(self):
+        return f"<CurrencyRate {self.code}={self.rate}>"
+
+class ProcessedAction(Base):
+    """Ключи уже выполненных денежных действий: повтор callback'а не проводит операцию дважды"""
+    __tablename__ = "processed_actions"
+    
+    id = Column(Integer, primary_key=True)
+    action = Column(String, nullable=False)       # Тип действия (order_reject, payment_accept, ...)
+    entity_id = Column(String, nullable=False)    # ID заказа или заявки
+    callback_id = Column(String, nullable=True)   # id callback_query, которым действие выполнено
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_processed_actions_action_entity", "action", "entity_id", unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<ProcessedAction {self.action}:{self.entity_id}>"
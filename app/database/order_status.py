@@ -0,0 +1,41 @@
+from typing import Iterable, Tuple
+
+# Статусы заказа — фиксированный набор, колонка orders.status ограничена им через CHECK
+PENDING = "pending"                # Создан, ждет назначения бустера
+CONFIRMED = "confirmed"            # Бустер назначен
+IN_PROGRESS = "in_progress"        # В работе
+PAUSED = "paused"                  # Приостановлен админом
+PENDING_REVIEW = "pending_review"  # Бустер отправил доказательство, ждет проверки
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+
+ORDER_STATUSES = (PENDING, CONFIRMED, IN_PROGRESS, PAUSED, PENDING_REVIEW, COMPLETED, CANCELLED)
+
+# Допустимые переходы: текущий статус -> статусы, в которые можно перейти
+ORDER_TRANSITIONS = {
+    PENDING: (CONFIRMED, CANCELLED),
+    CONFIRMED: (CONFIRMED, IN_PROGRESS, PAUSED, CANCELLED),  # confirmed -> confirmed: переназначение бустера
+    IN_PROGRESS: (PAUSED, PENDING_REVIEW, COMPLETED),
+    PAUSED: (IN_PROGRESS, COMPLETED),
+    PENDING_REVIEW: (IN_PROGRESS, COMPLETED),  # Возврат в работу при отклонении проверки
+    COMPLETED: (),
+    CANCELLED: (),
+}
+
+def can_transition(current: str, new_status: str) -> bool:
+    """Разрешен ли переход current -> new_status"""
+    return new_status in ORDER_TRANSITIONS.get(current, ())
+
+def source_statuses(new_status: str, expected: Iterable[str] = None) -> Tuple[str, ...]:
+    """Статусы, из которых можно перейти в new_status (опционально сужено до expected)"""
+    if new_status not in ORDER_STATUSES:
+        raise ValueError(f"Неизвестный статус заказа: {new_status}")
+    if isinstance(expected, str):
+        expected = (expected,)
+    return tuple(
+        status for status in ORDER_STATUSES
+        if can_transition(status, new_status) and (expected is None or status in expected)
+    )
+
+# Отклонить с возвратом денег можно только заказ, работа по которому не начиналась
+ORDER_REJECTABLE_STATUSES = source_statuses(CANCELLED)
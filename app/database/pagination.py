@@ -0,0 +1,40 @@
+from typing import Optional
+from sqlalchemy import and_, or_, select
+
+async def fetch_keyset_page(session, query, model, limit: int, after_id: Optional[int] = None,
+                            before_id: Optional[int] = None, order_column: Optional[str] = "created_at",
+                            descending: bool = True):
+    """Страница строк с keyset пагинацией по (order_column, id) вместо OFFSET.
+
+    after_id — следующая страница после строки с этим id,
+    before_id — предыдущая страница перед строкой с этим id.
+    Значение order_column курсора берется подзапросом по id, поэтому в callback_data
+    достаточно хранить только id. Без order_column сортировка идет по одному id.
+    Запрос не должен содержать собственный order_by.
+    """
+    id_column = model.id
+    sort_column = getattr(model, order_column) if order_column else None
+    backwards = after_id is None and before_id is not None
+    cursor_id = before_id if backwards else after_id
+    # Назад листаем в обратном порядке и разворачиваем результат
+    scan_descending = descending != backwards
+
+    def beyond(column, value):
+        return column < value if scan_descending else column > value
+
+    if cursor_id is not None:
+        if sort_column is None:
+            query = query.where(beyond(id_column, cursor_id))
+        else:
+            cursor_value = select(sort_column).where(id_column == cursor_id).scalar_subquery()
+            query = query.where(or_(
+                beyond(sort_column, cursor_value),
+                and_(sort_column == cursor_value, beyond(id_column, cursor_id))
+            ))
+
+    columns = [sort_column, id_column] if sort_column is not None else [id_column]
+    query = query.order_by(*[column.desc() if scan_descending else column.asc() for column in columns])
+
+    result = await session.execute(query.limit(limit))
+    rows = result.scalars().all()
+    return list(reversed(rows)) if backwards else list(rows)
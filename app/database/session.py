@@ -1,7 +1,5 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
-from .db import engine
-
-AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import AsyncSessionLocal
 
 def get_session() -> AsyncSession:
-    return AsyncSessionLocal()
\ No newline at end of file
+    return AsyncSessionLocal()
@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from app.config import USER_CACHE_SIZE, USER_CACHE_TTL
+from app.utils.shared_state import on_invalidation, publish_invalidation
+from .models import User
+
+_USER_COLUMNS = [column.key for column in User.__table__.columns]
+
+class UserCache:
+    """LRU кэш снимков User с TTL, доступный по id и по tg_id"""
+    
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._by_id: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (истекает, снимок)
+        self._id_by_tg: Dict[int, int] = {}
+        # Растет при каждой инвалидации: защищает от записи в кэш данных,
+        # прочитанных из БД до изменения пользователя
+        self.generation = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+    
+    def _get(self, user_id: Optional[int]) -> Optional[User]:
+        entry = self._by_id.get(user_id) if user_id is not None else None
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        expires_at, snapshot = entry
+        if expires_at < time.monotonic():
+            self._drop(user_id)
+            self.stats["misses"] += 1
+            return None
+        self._by_id.move_to_end(user_id)
+        self.stats["hits"] += 1
+        # Каждый вызывающий получает свой объект, кэш изменить нельзя
+        return User(**snapshot)
+    
+    def get_by_id(self, user_id: int) -> Optional[User]:
+        return self._get(user_id)
+    
+    def get_by_tg_id(self, tg_id: int) -> Optional[User]:
+        return self._get(self._id_by_tg.get(tg_id))
+    
+    def put(self, user: User, generation: int) -> None:
+        """Сохраняет снимок пользователя, если с момента чтения его не меняли"""
+        if user is None or generation != self.generation:
+            return
+        snapshot = {key: getattr(user, key) for key in _USER_COLUMNS}
+        self._drop(user.id)
+        self._by_id[user.id] = (time.monotonic() + self.ttl, snapshot)
+        self._id_by_tg[user.tg_id] = user.id
+        while len(self._by_id) > self.maxsize:
+            oldest_id = next(iter(self._by_id))
+            self._drop(oldest_id)
+            self.stats["evictions"] += 1
+    
+    def _drop(self, user_id: int) -> None:
+        entry = self._by_id.pop(user_id, None)
+        if entry is not None:
+            self._id_by_tg.pop(entry[1]["tg_id"], None)
+    
+    def invalidate(self, user_id: int = None, tg_id: int = None) -> None:
+        """Удаляет пользователя из кэша после изменения в БД, в том числе в других процессах"""
+        self.invalidate_local(user_id, tg_id)
+        publish_invalidation("user", user_id=user_id, tg_id=tg_id)
+    
+    def invalidate_local(self, user_id: int = None, tg_id: int = None) -> None:
+        self.generation += 1
+        self.stats["invalidations"] += 1
+        if tg_id is not None and user_id is None:
+            user_id = self._id_by_tg.get(tg_id)
+        if user_id is not None:
+            self._drop(user_id)
+    
+    def clear(self) -> None:
+        self.generation += 1
+        self._by_id.clear()
+        self._id_by_tg.clear()
+    
+    def get_stats(self) -> Dict[str, float]:
+        total = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._by_id),
+            "hit_rate": round(self.stats["hits"] / total, 3) if total else 0.0,
+        }
+
+# Глобальный кэш пользователей процесса
+user_cache = UserCache()
+on_invalidation("user", user_cache.invalidate_local)
@@ -4,9 +4,11 @@ from aiogram.fsm.context import FSMContext
 from datetime import datetime
 from app.database.models import PromoCode
 from app.database.db import AsyncSessionLocal
+from app.database.pagination import fetch_keyset_page
+from app.utils.pagination import parse_page_callback
 from app.utils.roles import admin_only
 from app.states.admin_states import PromoCreateStates
-from sqlalchemy import select
+from sqlalchemy import select, func
 from app.keyboards.admin.promo import (
     promo_type_keyboard,
     promo_currency_keyboard,
@@ -53,25 +55,26 @@ async def promo_active_list(call: CallbackQuery, state: FSMContext):
     logger.info(f"Админ @{call.from_user.username} открыл список активных промокодов")
     await show_promo_page(call.message, state, page=1)
 
-async def show_promo_page(event, state, page=1, search_query=None):
+async def show_promo_page(event, state, page=1, search_query=None, after_id=None, before_id=None):
     # лог не нужен, т.к. вызывается из других функций
+    if search_query:
+        condition = PromoCode.code.icontains(search_query, autoescape=True)
+    else:
+        condition = PromoCode.is_active == True
     async with AsyncSessionLocal() as session:
-        if search_query:
-            query = select(PromoCode).where(PromoCode.code.ilike(f"%{search_query}%"))
-        else:
-            query = select(PromoCode).where(PromoCode.is_active == True)
-        promos = (await session.execute(query.order_by(PromoCode.id.desc()))).scalars().all()
-    total = len(promos)
+        total = (await session.execute(select(func.count(PromoCode.id)).where(condition))).scalar() or 0
+        # Промокоды упорядочены по id, курсор — id крайнего промокода на странице
+        page_promos = await fetch_keyset_page(
+            session, select(PromoCode).where(condition), PromoCode, PROMOS_PER_PAGE,
+            after_id=after_id, before_id=before_id, order_column=None
+        )
     total_pages = max(1, (total + PROMOS_PER_PAGE - 1) // PROMOS_PER_PAGE)
     page = max(1, min(page, total_pages))
-    start = (page - 1) * PROMOS_PER_PAGE
-    end = start + PROMOS_PER_PAGE
-    page_promos = promos[start:end]
     if search_query:
-        text = "Результаты поиска:" if promos else "Промокоды не найдены."
+        text = "Результаты поиска:" if total else "Промокоды не найдены."
     else:
-        text = "🟢 Активные промокоды:" if promos else "Нет активных промокодов."
-    kb = promo_list_keyboard(page_promos, page, total_pages) if promos else promo_menu_keyboard()
+        text = "🟢 Активные промокоды:" if total else "Нет активных промокодов."
+    kb = promo_list_keyboard(page_promos, page, total_pages) if total else promo_menu_keyboard()
 
     try:
         await event.edit_text(text, reply_markup=kb)
@@ -83,14 +86,14 @@ async def show_promo_page(event, state, page=1, search_query=None):
 @admin_only
 async def promo_page_nav(call: CallbackQuery, state: FSMContext):
     logger.info(f"Админ @{call.from_user.username} листает страницы промокодов (страница {call.data.split(':')[1]})")
-    page = call.data.split(":")[1]
-    if page == "cur":
+    if call.data == "promo_page:cur":
         await call.answer()
         return
-    page = int(page)
+    cursor = parse_page_callback(call.data, first_page=1)
     data = await state.get_data()
     search_query = data.get("promo_search")
-    await show_promo_page(call.message, state, page=page, search_query=search_query)
+    await show_promo_page(call.message, state, page=cursor.page, search_query=search_query,
+                          after_id=cursor.after_id, before_id=cursor.before_id)
 
 @router.callback_query(F.data == "promo_search")
 @admin_only
@@ -370,8 +373,8 @@ async def promo_confirm_callback(call: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     expires_at = data.get("expires_at")
     # Получаем регион админа
-    from app.database.crud import get_user_by_tg_id
-    admin_user = await get_user_by_tg_id(call.from_user.id)
+    from app.utils.user import get_current_user
+    admin_user = await get_current_user(call.from_user.id)
     region = getattr(admin_user, "region", None) if admin_user else None
     # Карта регионов в таймзоны
     region_tz = {
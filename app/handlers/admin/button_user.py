@@ -18,12 +18,16 @@ from app.database.crud import (
     update_user_bonus_balance,
     update_user_role,
     create_booster_account,
-    set_booster_status
+    set_booster_status,
+    create_broadcast,
+    stop_broadcast
 )
 from app.database.session import get_session
 from aiogram.fsm.context import FSMContext
 from app.states.admin_states import AdminStates
 from app.utils.user import format_user_profile
+from app.utils.pagination import parse_page_callback
+from app.utils.broadcast import start_broadcast
 router = Router()
 logger = logging.getLogger(__name__)
 
@@ -48,7 +52,7 @@ async def admin_users(message: Message):
     total_clients = await count_users_by_role("user")
     total_boosters = await count_users_by_role("booster")
     total_pages = max(1, (total_users + USERS_PER_PAGE - 1) // USERS_PER_PAGE)
-    users = await get_users_page(offset=0, limit=USERS_PER_PAGE)
+    users = await get_users_page(limit=USERS_PER_PAGE)
     text = (
         f"<b>Всего пользователей:</b> {total_users}\n"
         f"<b>Клиентов:</b> {total_clients}\n"
@@ -64,12 +68,12 @@ async def admin_users(message: Message):
 @router.callback_query(F.data.startswith("users_page:"))
 @admin_only
 async def users_page_callback(call: CallbackQuery):
-    logger.info(f"Админ @{call.from_user.username} листает пользователей, страница {call.data.split(':')[1]}")
-    page = int(call.data.split(":")[1])
+    cursor = parse_page_callback(call.data, first_page=1)
+    page = cursor.page
+    logger.info(f"Админ @{call.from_user.username} листает пользователей, страница {page}")
     total_users = await count_users()
     total_pages = max(1, (total_users + USERS_PER_PAGE - 1) // USERS_PER_PAGE)
-    offset = (page - 1) * USERS_PER_PAGE
-    users = await get_users_page(offset=offset, limit=USERS_PER_PAGE)
+    users = await get_users_page(limit=USERS_PER_PAGE, after_id=cursor.after_id, before_id=cursor.before_id)
     total_clients = await count_users_by_role("user")
     total_boosters = await count_users_by_role("booster")
     text = (
@@ -341,57 +345,33 @@ async def users_broadcast_start(call: CallbackQuery, state: FSMContext):
 @admin_only
 async def users_broadcast_process(message: Message, state: FSMContext):
     logger.info(f"Админ @{message.from_user.username} отправляет рассылку всем: {message.text or '[фото]'}")
-    users = await get_users_page(offset=0, limit=1000000)
-    total = len(users)
-    delivered = 0
-    failed = 0
-
-    progress_msg = await message.answer(f"📢 Рассылка началась...\nВсего пользователей: {total}")
+    await _launch_broadcast(message, role=None)
+    await state.clear()
 
+async def _launch_broadcast(message: Message, role: str = None):
+    """Создает рассылку и запускает ее в фоне; прогресс обновляется в отдельном сообщении"""
     is_photo = message.photo and len(message.photo) > 0
-    text = message.caption if is_photo else message.text
-
-    for idx, user in enumerate(users, start=1):
-        if user.tg_id == message.from_user.id:
-            continue
-        try:
-            if is_photo:
-                await message.bot.send_photo(
-                    user.tg_id,
-                    photo=message.photo[-1].file_id,
-                    caption=text
-                )
-            else:
-                await message.bot.send_message(user.tg_id, text)
-            delivered += 1
-        except Exception:
-            failed += 1
-
-        if idx % 5 == 0 or idx == total:
-            try:
-                await progress_msg.edit_text(
-                    f"📢 Рассылка идёт...\n"
-                    f"Отправлено: {delivered}\n"
-                    f"Не доставлено: {failed}\n"
-                    f"Всего: {total}"
-                )
-            except Exception:
-                pass
-
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="⬅️ Назад к списку", callback_data="users_page:1")]
-        ]
-    )
-    await progress_msg.edit_text(
-        f"✅ Рассылка завершена!\n"
-        f"Доставлено: {delivered}\n"
-        f"Не доставлено: {failed}\n"
-        f"Всего пользователей: {total}",
-        reply_markup=keyboard
+    progress_msg = await message.answer("📢 Рассылка запускается...")
+    broadcast = await create_broadcast(
+        message.from_user.id,
+        text=message.caption if is_photo else message.text,
+        photo_file_id=message.photo[-1].file_id if is_photo else None,
+        role=role,
+        progress_chat_id=progress_msg.chat.id,
+        progress_message_id=progress_msg.message_id
     )
-    logger.info(f"Админ @{message.from_user.username} завершил рассылку: доставлено {delivered}, не доставлено {failed}")
-    await state.clear()
+    start_broadcast(message.bot, broadcast.id)
+    logger.info(f"Админ @{message.from_user.username} запустил рассылку {broadcast.id}, получателей: {broadcast.total}")
+
+@router.callback_query(F.data.startswith("broadcast_stop:"))
+@admin_only
+async def broadcast_stop(call: CallbackQuery):
+    broadcast_id = int(call.data.split(":")[1])
+    if await stop_broadcast(broadcast_id):
+        logger.info(f"Админ @{call.from_user.username} остановил рассылку {broadcast_id}")
+        await call.answer("Рассылка будет остановлена")
+    else:
+        await call.answer("Рассылка уже завершена", show_alert=True)
 
 @router.callback_query(F.data == "boosters_broadcast")
 @admin_only
@@ -411,56 +391,7 @@ async def boosters_broadcast_start(call: CallbackQuery, state: FSMContext):
 @admin_only
 async def boosters_broadcast_process(message: Message, state: FSMContext):
     logger.info(f"Админ @{message.from_user.username} отправляет рассылку бустерам: {message.text or '[фото]'}")
-    boosters = await search_users("booster")
-    total = len(boosters)
-    delivered = 0
-    failed = 0
-
-    progress_msg = await message.answer(f"📢 Рассылка бустерам началась...\nВсего бустеров: {total}")
-
-    is_photo = message.photo and len(message.photo) > 0
-    text = message.caption if is_photo else message.text
-
-    for idx, user in enumerate(boosters, start=1):
-        if user.tg_id == message.from_user.id:
-            continue
-        try:
-            if is_photo:
-                await message.bot.send_photo(
-                    user.tg_id,
-                    photo=message.photo[-1].file_id,
-                    caption=text
-                )
-            else:
-                await message.bot.send_message(user.tg_id, text)
-            delivered += 1
-        except Exception:
-            failed += 1
-
-        if idx % 5 == 0 or idx == total:
-            try:
-                await progress_msg.edit_text(
-                    f"📢 Рассылка идёт...\n"
-                    f"Отправлено: {delivered}\n"
-                    f"Не доставлено: {failed}\n"
-                    f"Всего: {total}"
-                )
-            except Exception:
-                pass
-
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="⬅️ Назад к списку", callback_data="users_page:1")]
-        ]
-    )
-    await progress_msg.edit_text(
-        f"✅ Рассылка бустерам завершена!\n"
-        f"Доставлено: {delivered}\n"
-        f"Не доставлено: {failed}\n"
-        f"Всего бустеров: {total}",
-        reply_markup=keyboard
-    )
-    logger.info(f"Админ @{message.from_user.username} завершил рассылку бустерам: доставлено {delivered}, не доставлено {failed}")
+    await _launch_broadcast(message, role="booster")
     await state.clear()
 
 # --- Отмена рассылки ---
@@ -4,14 +4,20 @@ from aiogram.fsm.context import FSMContext
 from app.utils.roles import admin_only
 from app.states.admin_states import AdminStates
 from app.database.crud import (
-    get_order_by_id, get_all_orders, update_order_status, assign_booster_to_order,
-    get_active_boosters, get_user_by_id, update_user_balance_by_region,
-    search_orders, count_orders_by_status, get_boosters, update_booster_balance
+    get_order_by_id, transition_order_status, assign_booster_to_order,
+    get_active_boosters, get_user_by_id, search_orders, get_boosters,
+    get_orders_page_with_users, count_orders_grouped_by_status,
+    reject_order_with_refund, complete_order_with_payout
+)
+from app.database.order_status import (
+    CONFIRMED, IN_PROGRESS, PAUSED, PENDING_REVIEW, COMPLETED, ORDER_REJECTABLE_STATUSES
 )
 from app.keyboards.admin.order_management import (
     admin_order_details_keyboard, admin_boosters_list_keyboard, 
     admin_orders_list_keyboard, confirm_action_keyboard
 )
+from app.utils.pagination import parse_page_callback, next_page_callback, prev_page_callback
+from app.utils.outbox import outbox_message
 import logging
 from datetime import datetime
 
@@ -93,7 +99,7 @@ async def admin_reject_order(call: CallbackQuery):
         await call.answer("Заказ не найден!", show_alert=True)
         return
     
-    if order.status != "pending":
+    if order.status not in ORDER_REJECTABLE_STATUSES:
         await call.answer("Заказ уже обработан!", show_alert=True)
         return
     
@@ -121,29 +127,39 @@ async def admin_confirm_reject_order(call: CallbackQuery):
         await call.answer("Заказ не найден!", show_alert=True)
         return
     
-    # Отменяем заказ и возвращаем деньги
-    await update_order_status(order_id, "cancelled")
+    if order.status not in ORDER_REJECTABLE_STATUSES:
+        await call.answer("Заказ уже обработан!", show_alert=True)
+        return
     
-    # Возвращаем деньги на баланс пользователя
-    user = await get_user_by_id(order.user_id)
-    if user:
-        # Определяем поле баланса по региону заказа
-        if "🇰🇬" in order.region or order.region == "KG":
-            balance_field = "balance_kg"
-        elif "🇰🇿" in order.region or order.region == "KZ":
-            balance_field = "balance_kz"
-        elif "🇷🇺" in order.region or order.region == "RU":
-            balance_field = "balance_ru"
-        else:
-            # По умолчанию возвращаем в рублях
-            balance_field = "balance_ru"
-        
-        await update_user_balance_by_region(user.id, balance_field, order.total_cost)
+    # Определяем поле баланса по региону заказа
+    if "🇰🇬" in order.region or order.region == "KG":
+        balance_field = "balance_kg"
+    elif "🇰🇿" in order.region or order.region == "KZ":
+        balance_field = "balance_kz"
+    elif "🇷🇺" in order.region or order.region == "RU":
+        balance_field = "balance_ru"
+    else:
+        # По умолчанию возвращаем в рублях
+        balance_field = "balance_ru"
     
     # Получаем информацию о клиенте
     user = await get_user_by_id(order.user_id)
     currency = get_currency_for_order(order, user)
     
+    # Уведомление клиента ставится в outbox той же транзакцией
+    notifications = [outbox_message(
+        user.tg_id,
+        f"❌ <b>Ваш заказ {order_id} отклонен</b>\n\n"
+        f"Деньги возвращены на ваш баланс: <b>{order.total_cost:.0f} {currency}</b>\n"
+        f"Вы можете создать новый заказ в любое время."
+    )]
+    
+    # Отменяем заказ и возвращаем деньги одной транзакцией: повторное нажатие ничего не вернет
+    if not await reject_order_with_refund(order_id, balance_field, callback_id=call.id,
+                                          actor_tg_id=call.from_user.id, outbox=notifications):
+        await call.answer("Заказ уже обработан!", show_alert=True)
+        return
+    
     await call.message.edit_text(
         f"❌ <b>Заказ {order_id} отклонен</b>\n\n"
         f"Деньги возвращены на баланс клиента: <b>{order.total_cost:.0f} {currency}</b>\n"
@@ -154,19 +170,6 @@ async def admin_confirm_reject_order(call: CallbackQuery):
         ])
     )
     
-    # Уведомляем клиента
-    try:
-        await call.bot.send_message(
-            user.tg_id,
-            f"❌ <b>Ваш заказ {order_id} отклонен</b>\n\n"
-            f"Деньги возвращены на ваш баланс: <b>{order.total_cost:.0f} {currency}</b>\n"
-            f"Вы можете создать новый заказ в любое время.",
-            parse_mode="HTML"
-        )
-        logger.info(f"Клиент {user.tg_id} уведомлен об отклонении заказа {order_id}")
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить клиента {user.tg_id}: {e}")
-    
     logger.info(f"Админ @{call.from_user.username} отклонил заказ {order_id}, возвращено {order.total_cost} {currency}")
     await call.answer("Заказ отклонен, деньги возвращены!")
 
@@ -328,19 +331,71 @@ async def admin_select_booster(call: CallbackQuery):
         await call.answer("Заказ не найден!", show_alert=True)
         return
     
-    # Если заказ еще pending, меняем статус на confirmed при назначении бустера
-    if order.status == "pending":
-        await update_order_status(order_id, "confirmed")
-    
-    # Назначаем бустера
-    order = await assign_booster_to_order(order_id, booster_user_id)
-    if not order:
-        await call.answer("Ошибка назначения бустера!", show_alert=True)
-        return
-    
     # Получаем информацию о бустере и клиенте
     booster = await get_user_by_id(booster_user_id)
     client = await get_user_by_id(order.user_id)
+    currency = get_currency_for_order(order, client)
+    
+    # Формируем детальную информацию для бустера
+    notification_text = f"🎯 <b>Вам назначен новый заказ!</b>\n\n"
+    notification_text += f"📋 <b>Заказ:</b> {order_id}\n"
+    if client.username:
+        notification_text += f"👤 <b>Клиент:</b> @{client.username} (ID: {client.tg_id})\n"
+    else:
+        notification_text += f"👤 <b>Клиент:</b> <a href='tg://user?id={client.tg_id}'>Связаться</a> (ID: {client.tg_id})\n"
+    notification_text += f"🌍 <b>Регион:</b> {client.region}\n"
+    
+    # Получаем процент дохода бустера из настроек
+    from app.utils.settings import get_booster_income_percent
+    try:
+        booster_percent = await get_booster_income_percent()
+    except:
+        booster_percent = 70  # По умолчанию 70%
+    
+    booster_income = order.total_cost * (booster_percent / 100)
+    notification_text += f"💰 <b>Ваш доход:</b> {booster_income:.0f} {currency} ({booster_percent}%)\n\n"
+    
+    # Добавляем краткую информацию о заказе
+    if order.service_type == "coaching":
+        notification_text += f"📚 <b>Услуга:</b> Гайд / обучение\n"
+        if order.coaching_topic:
+            notification_text += f"📖 <b>Тема:</b> {order.coaching_topic}\n"
+        if order.coaching_hours:
+            notification_text += f"⏱️ <b>Часов:</b> {order.coaching_hours}\n"
+    else:
+        notification_text += f"🎮 <b>Услуга:</b> Буст ранга\n"
+        if order.current_rank:
+            notification_text += f"📊 <b>Текущий ранг:</b> {order.current_rank}\n"
+        if order.target_rank:
+            notification_text += f"🎯 <b>Целевой ранг:</b> {order.target_rank}\n"
+    
+    notification_text += f"\n💡 <i>Нажмите кнопку ниже для просмотра полных деталей заказа</i>"
+    
+    booster_contact = f"@{booster.username}" if booster.username else f"<a href='tg://user?id={booster.tg_id}'>Связаться с исполнителем</a>"
+    
+    # Уведомления бустеру и клиенту ставятся в outbox той же транзакцией
+    notifications = [
+        outbox_message(
+            booster.tg_id,
+            notification_text,
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="📋 Подробнее о заказе", callback_data=f"booster_order_details:{order_id}")],
+                [InlineKeyboardButton(text="📦 Мои заказы", callback_data="booster_refresh_orders")]
+            ])
+        ),
+        outbox_message(
+            client.tg_id,
+            f"✅ <b>Ваш заказ {order_id} принят в работу!</b>\n\n"
+            f"👨‍💼 <b>Назначен исполнитель:</b> {booster_contact}\n\n"
+            f"Исполнитель свяжется с вами в ближайшее время для начала работы."
+        ),
+    ]
+    
+    # Назначаем бустера: pending и confirmed заказ переходит в confirmed
+    order = await assign_booster_to_order(order_id, booster_user_id, actor_tg_id=call.from_user.id, outbox=notifications)
+    if not order:
+        await call.answer("Бустера нельзя назначить в текущем статусе заказа!", show_alert=True)
+        return
     
     if booster.username:
         booster_text = f"👨‍💼 <b>Бустер:</b> @{booster.username} (ID: {booster.tg_id})"
@@ -362,73 +417,7 @@ async def admin_select_booster(call: CallbackQuery):
         reply_markup=admin_order_details_keyboard(order_id, "confirmed")
     )
     
-    # Уведомляем бустера
-    try:
-        currency = get_currency_for_order(order, client)
-        
-        # Формируем детальную информацию для бустера
-        notification_text = f"🎯 <b>Вам назначен новый заказ!</b>\n\n"
-        notification_text += f"📋 <b>Заказ:</b> {order_id}\n"
-        if client.username:
-            notification_text += f"👤 <b>Клиент:</b> @{client.username} (ID: {client.tg_id})\n"
-        else:
-            notification_text += f"👤 <b>Клиент:</b> <a href='tg://user?id={client.tg_id}'>Связаться</a> (ID: {client.tg_id})\n"
-        notification_text += f"🌍 <b>Регион:</b> {client.region}\n"
-        
-        # Получаем процент дохода бустера из настроек
-        from app.utils.settings import get_booster_income_percent
-        try:
-            booster_percent = await get_booster_income_percent()
-        except:
-            booster_percent = 70  # По умолчанию 70%
-        
-        booster_income = order.total_cost * (booster_percent / 100)
-        notification_text += f"💰 <b>Ваш доход:</b> {booster_income:.0f} {currency} ({booster_percent}%)\n\n"
-        
-        # Добавляем краткую информацию о заказе
-        if order.service_type == "coaching":
-            notification_text += f"📚 <b>Услуга:</b> Гайд / обучение\n"
-            if order.coaching_topic:
-                notification_text += f"📖 <b>Тема:</b> {order.coaching_topic}\n"
-            if order.coaching_hours:
-                notification_text += f"⏱️ <b>Часов:</b> {order.coaching_hours}\n"
-        else:
-            notification_text += f"🎮 <b>Услуга:</b> Буст ранга\n"
-            if order.current_rank:
-                notification_text += f"📊 <b>Текущий ранг:</b> {order.current_rank}\n"
-            if order.target_rank:
-                notification_text += f"🎯 <b>Целевой ранг:</b> {order.target_rank}\n"
-        
-        notification_text += f"\n💡 <i>Нажмите кнопку ниже для просмотра полных деталей заказа</i>"
-        
-        await call.bot.send_message(
-            booster.tg_id,
-            notification_text,
-            parse_mode="HTML",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="📋 Подробнее о заказе", callback_data=f"booster_order_details:{order_id}")],
-                [InlineKeyboardButton(text="📦 Мои заказы", callback_data="booster_refresh_orders")]
-            ])
-        )
-        logger.info(f"Бустер {booster.tg_id} уведомлен о назначении на заказ {order_id}")
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить бустера {booster.tg_id}: {e}")
-    
-    # Уведомляем клиента
-    try:
-        booster_contact = f"@{booster.username}" if booster.username else f"<a href='tg://user?id={booster.tg_id}'>Связаться с исполнителем</a>"
-        
-        await call.bot.send_message(
-            client.tg_id,
-            f"✅ <b>Ваш заказ {order_id} принят в работу!</b>\n\n"
-            f"👨‍💼 <b>Назначен исполнитель:</b> {booster_contact}\n\n"
-            f"Исполнитель свяжется с вами в ближайшее время для начала работы.",
-            parse_mode="HTML"
-        )
-        logger.info(f"Клиент {client.tg_id} уведомлен о принятии заказа и назначении бустера {order_id}")
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить клиента {client.tg_id}: {e}")
-    
+    logger.info(f"Уведомления о назначении на заказ {order_id} поставлены в очередь")
     await call.answer("Бустер назначен, заказ подтвержден!")
 
 # === УПРАВЛЕНИЕ СТАТУСАМИ ЗАКАЗОВ ===
@@ -439,11 +428,25 @@ async def admin_start_order(call: CallbackQuery):
     """Запуск заказа в работу"""
     order_id = call.data.split(":")[1]
     
-    await update_order_status(order_id, "in_progress")
-    
     order = await get_order_by_id(order_id)
+    if not order:
+        await call.answer("Заказ не найден!", show_alert=True)
+        return
+    
     client = await get_user_by_id(order.user_id)
     
+    # Уведомление клиента ставится в outbox той же транзакцией
+    notifications = [outbox_message(
+        client.tg_id,
+        f"🚀 <b>Ваш заказ {order_id} взят в работу!</b>\n\n"
+        f"Исполнитель начал выполнение заказа.\n"
+        f"Следите за прогрессом в разделе \"Мои заказы\"."
+    )]
+    
+    if not await transition_order_status(order_id, IN_PROGRESS, call.from_user.id, expected=CONFIRMED, outbox=notifications):
+        await call.answer("Заказ нельзя взять в работу в текущем статусе!", show_alert=True)
+        return
+    
     await call.message.edit_text(
         f"🚀 <b>Заказ {order_id} запущен в работу!</b>\n\n"
         f"Статус изменен на: <b>В работе</b>\n"
@@ -452,18 +455,6 @@ async def admin_start_order(call: CallbackQuery):
         reply_markup=admin_order_details_keyboard(order_id, "in_progress")
     )
     
-    # Уведомляем клиента
-    try:
-        await call.bot.send_message(
-            client.tg_id,
-            f"🚀 <b>Ваш заказ {order_id} взят в работу!</b>\n\n"
-            f"Исполнитель начал выполнение заказа.\n"
-            f"Следите за прогрессом в разделе \"Мои заказы\".",
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить клиента {client.tg_id}: {e}")
-    
     logger.info(f"Админ @{call.from_user.username} запустил заказ {order_id} в работу")
     await call.answer("Заказ запущен в работу!")
 
@@ -473,11 +464,25 @@ async def admin_complete_order(call: CallbackQuery):
     """Завершение заказа"""
     order_id = call.data.split(":")[1]
     
-    await update_order_status(order_id, "completed")
-    
     order = await get_order_by_id(order_id)
+    if not order:
+        await call.answer("Заказ не найден!", show_alert=True)
+        return
+    
     client = await get_user_by_id(order.user_id)
     
+    # Уведомление клиента ставится в outbox той же транзакцией
+    notifications = [outbox_message(
+        client.tg_id,
+        f"🎉 <b>Ваш заказ {order_id} завершен!</b>\n\n"
+        f"Спасибо за использование наших услуг!\n"
+        f"Вы можете оставить отзыв или создать новый заказ."
+    )]
+    
+    if not await transition_order_status(order_id, COMPLETED, call.from_user.id, expected=(IN_PROGRESS, PAUSED), outbox=notifications):
+        await call.answer("Заказ нельзя завершить в текущем статусе!", show_alert=True)
+        return
+    
     await call.message.edit_text(
         f"✅ <b>Заказ {order_id} завершен!</b>\n\n"
         f"Статус изменен на: <b>Завершен</b>\n"
@@ -486,18 +491,6 @@ async def admin_complete_order(call: CallbackQuery):
         reply_markup=admin_order_details_keyboard(order_id, "completed")
     )
     
-    # Уведомляем клиента
-    try:
-        await call.bot.send_message(
-            client.tg_id,
-            f"🎉 <b>Ваш заказ {order_id} завершен!</b>\n\n"
-            f"Спасибо за использование наших услуг!\n"
-            f"Вы можете оставить отзыв или создать новый заказ.",
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить клиента {client.tg_id}: {e}")
-    
     logger.info(f"Админ @{call.from_user.username} завершил заказ {order_id}")
     await call.answer("Заказ завершен!")
 
@@ -515,32 +508,37 @@ async def admin_orders_filter(call: CallbackQuery):
     """Фильтрация заказов по статусу"""
     parts = call.data.split(":")
     status_filter = parts[1]
-    page = int(parts[2]) if len(parts) > 2 else 0
     
+    # Смена фильтра всегда начинается с первой страницы
     logger.info(f"Админ @{call.from_user.username} применил фильтр: {status_filter}")
-    await show_orders_list(call, status_filter, page, edit_message=True)
+    await show_orders_list(call, status_filter, page=0, edit_message=True)
 
 @router.callback_query(F.data.startswith("admin_orders_page:"))
 @admin_only
 async def admin_orders_page(call: CallbackQuery):
     """Навигация по страницам заказов"""
-    parts = call.data.split(":")
-    status_filter = parts[1]
-    page = int(parts[2])
+    # Формат: admin_orders_page:<фильтр>:<страница>:<n|p>:<id заказа-курсора>
+    cursor = parse_page_callback(call.data, extra_count=1)
+    status_filter = cursor.extra[0]
+    page = cursor.page
     
     logger.info(f"Админ @{call.from_user.username} перешел на страницу {page + 1} с фильтром {status_filter}")
-    await show_orders_list(call, status_filter, page, edit_message=True)
+    await show_orders_list(call, status_filter, page, edit_message=True,
+                           after_id=cursor.after_id, before_id=cursor.before_id)
 
-async def show_orders_list(event, status_filter: str = "all", page: int = 0, edit_message: bool = False):
-    """Отображает список заказов с пагинацией"""
+async def show_orders_list(event, status_filter: str = "all", page: int = 0, edit_message: bool = False,
+                           after_id: int = None, before_id: int = None):
+    """Отображает список заказов с keyset пагинацией"""
     per_page = 5  # Уменьшаем количество заказов на страницу
-    offset = page * per_page
     
-    orders = await get_all_orders(status_filter, per_page + 1, offset)  # +1 для проверки наличия следующей страницы
+    # Заказы вместе с клиентами одним запросом
+    orders = await get_orders_page_with_users(status_filter, per_page, after_id=after_id, before_id=before_id)
     
-    # Статистика
-    total_count = await count_orders_by_status()
-    pending_count = await count_orders_by_status("pending")
+    # Статистика по всем статусам одним запросом
+    status_counts = await count_orders_grouped_by_status()
+    total_count = sum(status_counts.values())
+    pending_count = status_counts.get("pending", 0)
+    filtered_count = total_count if status_filter == "all" else status_counts.get(status_filter, 0)
     
     text = f"📋 <b>Управление заказами</b>\n\n"
     text += f"📊 <b>Статистика:</b>\n"
@@ -566,11 +564,10 @@ async def show_orders_list(event, status_filter: str = "all", page: int = 0, edi
     if not orders:
         text += "❌ Заказов не найдено."
     else:
-        # Показываем заказы (максимум per_page)
-        display_orders = orders[:per_page]
+        display_orders = orders
         
         for i, order in enumerate(display_orders, 1):
-            user =await get_user_by_id(order.user_id)
+            user = order.client
             currency = get_currency_for_order(order, user)
             status_emoji = {
                 "pending": "⏳",
@@ -611,7 +608,8 @@ async def show_orders_list(event, status_filter: str = "all", page: int = 0, edi
         for j in range(i, min(i + 3, len(status_filters))):
             text_filter, status = status_filters[j]
             emoji = "🔹" if status == status_filter else ""
-            button_text = f"{emoji}{text_filter}"
+            count = total_count if status == "all" else status_counts.get(status, 0)
+            button_text = f"{emoji}{text_filter} ({count})"
             row.append(InlineKeyboardButton(
                 text=button_text,
                 callback_data=f"admin_orders_filter:{status}:0"
@@ -629,13 +627,17 @@ async def show_orders_list(event, status_filter: str = "all", page: int = 0, edi
             ])
     
     # Навигация
-    has_next = len(orders) > per_page
+    has_next = bool(orders) and (page + 1) * per_page < filtered_count
     nav_buttons = []
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=f"admin_orders_page:{status_filter}:{page-1}"))
+    if page > 0 and orders:
+        nav_buttons.append(InlineKeyboardButton(
+            text="⬅️", callback_data=prev_page_callback("admin_orders_page", page, orders, status_filter)
+        ))
     nav_buttons.append(InlineKeyboardButton(text="🔍 Поиск", callback_data="admin_search_order"))
     if has_next:
-        nav_buttons.append(InlineKeyboardButton(text="➡️", callback_data=f"admin_orders_page:{status_filter}:{page+1}"))
+        nav_buttons.append(InlineKeyboardButton(
+            text="➡️", callback_data=next_page_callback("admin_orders_page", page, orders, status_filter)
+        ))
     
     if nav_buttons:
         keyboard.append(nav_buttons)
@@ -663,11 +665,25 @@ async def admin_pause_order(call: CallbackQuery):
     """Приостановка заказа"""
     order_id = call.data.split(":")[1]
     
-    await update_order_status(order_id, "paused")
-    
     order = await get_order_by_id(order_id)
+    if not order:
+        await call.answer("Заказ не найден!", show_alert=True)
+        return
+    
     client = await get_user_by_id(order.user_id)
     
+    # Уведомление клиента ставится в outbox той же транзакцией
+    notifications = [outbox_message(
+        client.tg_id,
+        f"⏸️ <b>Ваш заказ {order_id} временно приостановлен</b>\n\n"
+        f"Работа по заказу будет возобновлена в ближайшее время.\n"
+        f"При возникновении вопросов обратитесь в поддержку."
+    )]
+    
+    if not await transition_order_status(order_id, PAUSED, call.from_user.id, outbox=notifications):
+        await call.answer("Заказ нельзя приостановить в текущем статусе!", show_alert=True)
+        return
+    
     await call.message.edit_text(
         f"⏸️ <b>Заказ {order_id} приостановлен</b>\n\n"
         f"Статус изменен на: <b>Приостановлен</b>\n"
@@ -676,18 +692,6 @@ async def admin_pause_order(call: CallbackQuery):
         reply_markup=admin_order_details_keyboard(order_id, "paused")
     )
     
-    # Уведомляем клиента
-    try:
-        await call.bot.send_message(
-            client.tg_id,
-            f"⏸️ <b>Ваш заказ {order_id} временно приостановлен</b>\n\n"
-            f"Работа по заказу будет возобновлена в ближайшее время.\n"
-            f"При возникновении вопросов обратитесь в поддержку.",
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить клиента {client.tg_id}: {e}")
-    
     logger.info(f"Админ @{call.from_user.username} приостановил заказ {order_id}")
     await call.answer("Заказ приостановлен!")
 
@@ -697,11 +701,25 @@ async def admin_resume_order(call: CallbackQuery):
     """Возобновление приостановленного заказа"""
     order_id = call.data.split(":")[1]
     
-    await update_order_status(order_id, "in_progress")
-    
     order = await get_order_by_id(order_id)
+    if not order:
+        await call.answer("Заказ не найден!", show_alert=True)
+        return
+    
     client = await get_user_by_id(order.user_id)
     
+    # Уведомление клиента ставится в outbox той же транзакцией
+    notifications = [outbox_message(
+        client.tg_id,
+        f"▶️ <b>Работа по заказу {order_id} возобновлена!</b>\n\n"
+        f"Исполнитель продолжает выполнение заказа.\n"
+        f"Следите за прогрессом в разделе \"Мои заказы\"."
+    )]
+    
+    if not await transition_order_status(order_id, IN_PROGRESS, call.from_user.id, expected=PAUSED, outbox=notifications):
+        await call.answer("Заказ не приостановлен!", show_alert=True)
+        return
+    
     await call.message.edit_text(
         f"▶️ <b>Заказ {order_id} возобновлен</b>\n\n"
         f"Статус изменен на: <b>В работе</b>\n"
@@ -710,18 +728,6 @@ async def admin_resume_order(call: CallbackQuery):
         reply_markup=admin_order_details_keyboard(order_id, "in_progress")
     )
     
-    # Уведомляем клиента
-    try:
-        await call.bot.send_message(
-            client.tg_id,
-            f"▶️ <b>Работа по заказу {order_id} возобновлена!</b>\n\n"
-            f"Исполнитель продолжает выполнение заказа.\n"
-            f"Следите за прогрессом в разделе \"Мои заказы\".",
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить клиента {client.tg_id}: {e}")
-    
     logger.info(f"Админ @{call.from_user.username} возобновил заказ {order_id}")
     await call.answer("Заказ возобновлен!")
 
@@ -830,13 +836,10 @@ async def admin_approve_completion(call: CallbackQuery):
         await call.answer("Заказ не найден!", show_alert=True)
         return
     
-    if order.status != "pending_review":
+    if order.status != PENDING_REVIEW:
         await call.answer("Заказ не ожидает проверки!", show_alert=True)
         return
     
-    # Обновляем статус заказа
-    await update_order_status(order_id, "completed")
-    
     # Получаем информацию о бустере и клиенте
     booster = await get_user_by_id(order.assigned_booster_id)
     client = await get_user_by_id(order.user_id)
@@ -871,8 +874,32 @@ async def admin_approve_completion(call: CallbackQuery):
             logger.warning(f"[BOOSTER PAYOUT] Unusually large USD commission: {booster_commission_local} USD for order {order_id}")
         booster_amount_usd = booster_commission_local
         conversion_note = ""
-    # Кредитуем только balance_usd
-    await update_booster_balance(order.assigned_booster_id, booster_amount_usd, currency="USD")
+    # Уведомления бустеру и клиенту ставятся в outbox той же транзакцией
+    notifications = [
+        outbox_message(
+            booster.tg_id,
+            f"🎉 <b>Ваш заказ {order_id} одобрен!</b>\n\n"
+            f"Заказ успешно завершен и проверен администрацией.\n"
+            f"💰 Вам начислено: <b>{booster_amount_usd:.2f} USD</b> ({booster_percent}%)\n\n"
+            f"Спасибо за качественную работу!"
+        ),
+        outbox_message(
+            client.tg_id,
+            f"🎉 <b>Ваш заказ {order_id} выполнен!</b>\n\n"
+            f"Заказ успешно завершен и проверен.\n"
+            f"🎁 Вам начислен кешбэк за заказ.\n\n"
+            f"Спасибо за использование наших услуг!\n"
+            f"Будем рады видеть вас снова!"
+        ),
+    ]
+    
+    # Завершаем заказ и кредитуем только balance_usd одной транзакцией:
+    # повторное нажатие или повторная доставка callback'а не начислит второй раз
+    if not await complete_order_with_payout(order_id, order.assigned_booster_id, booster_amount_usd,
+                                            callback_id=call.id, actor_tg_id=call.from_user.id,
+                                            outbox=notifications):
+        await call.answer("Заказ уже обработан!", show_alert=True)
+        return
     
     # TODO: Начисляем клиенту кешбэк (настройка в админ-панели)
     # cashback_percent = await get_setting("cashback_percent", 5)  # 5% по умолчанию
@@ -911,35 +938,6 @@ async def admin_approve_completion(call: CallbackQuery):
             reply_markup=reply_markup
         )
     
-    # Уведомляем бустера
-    try:
-        await call.bot.send_message(
-            booster.tg_id,
-            f"🎉 <b>Ваш заказ {order_id} одобрен!</b>\n\n"
-            f"Заказ успешно завершен и проверен администрацией.\n"
-            f"💰 Вам начислено: <b>{booster_amount_usd:.2f} USD</b> ({booster_percent}%)\n\n"
-            f"Спасибо за качественную работу!",
-            parse_mode="HTML"
-        )
-        logger.info(f"Бустер {booster.tg_id} уведомлен об одобрении заказа {order_id}")
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить бустера {booster.tg_id}: {e}")
-    
-    # Уведомляем клиента
-    try:
-        await call.bot.send_message(
-            client.tg_id,
-            f"🎉 <b>Ваш заказ {order_id} выполнен!</b>\n\n"
-            f"Заказ успешно завершен и проверен.\n"
-            f"🎁 Вам начислен кешбэк за заказ.\n\n"
-            f"Спасибо за использование наших услуг!\n"
-            f"Будем рады видеть вас снова!",
-            parse_mode="HTML"
-        )
-        logger.info(f"Клиент {client.tg_id} уведомлен о завершении заказа {order_id}")
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить клиента {client.tg_id}: {e}")
-    
     logger.info(f"Админ @{call.from_user.username} одобрил завершение заказа {order_id}")
     await call.answer("Заказ одобрен!")
 
@@ -978,17 +976,34 @@ async def admin_reject_order_completion(call: CallbackQuery):
         await call.answer("Заказ не найден!", show_alert=True)
         return
     
-    if order.status != "pending_review":
-        await call.answer("Заказ не на проверке!", show_alert=True)
-        return
-    
-    # Возвращаем статус заказа в работу
-    await update_order_status(order_id, "in_progress")
-    
     # Получаем информацию о клиенте и бустере
     client = await get_user_by_id(order.user_id)
     booster = await get_user_by_id(order.assigned_booster_id)
     
+    # Уведомления клиенту и бустеру ставятся в outbox той же транзакцией
+    notifications = [
+        outbox_message(
+            client.tg_id,
+            f"⚠️ <b>Заказ возвращен в работу</b>\n\n"
+            f"По заказу {order_id} требуются доработки.\n"
+            f"Исполнитель продолжит работу над заказом.\n\n"
+            f"Следите за прогрессом в разделе \"Мои заказы\"."
+        ),
+        outbox_message(
+            booster.tg_id,
+            f"⚠️ <b>Заказ требует доработки</b>\n\n"
+            f"Ваше выполнение заказа {order_id} требует доработки.\n"
+            f"Пожалуйста, продолжите работу над заказом.\n\n"
+            f"Свяжитесь с администратором для уточнений."
+        ),
+    ]
+    
+    # Возвращаем статус заказа в работу
+    if not await transition_order_status(order_id, IN_PROGRESS, call.from_user.id, expected=PENDING_REVIEW,
+                                         outbox=notifications):
+        await call.answer("Заказ не на проверке!", show_alert=True)
+        return
+    
     # Форматируем строки пользователей  
     client_str = f"@{client.username}" if client.username else f'<a href="tg://user?id={client.tg_id}">Связаться</a>'
     booster_str = f"@{booster.username}" if booster.username else f'<a href="tg://user?id={booster.tg_id}">Связаться</a>'
@@ -1005,33 +1020,5 @@ async def admin_reject_order_completion(call: CallbackQuery):
         ])
     )
     
-    # Уведомляем клиента
-    try:
-        await call.bot.send_message(
-            client.tg_id,
-            f"⚠️ <b>Заказ возвращен в работу</b>\n\n"
-            f"По заказу {order_id} требуются доработки.\n"
-            f"Исполнитель продолжит работу над заказом.\n\n"
-            f"Следите за прогрессом в разделе \"Мои заказы\".",
-            parse_mode="HTML"
-        )
-        logger.info(f"Клиент {client.tg_id} уведомлен о возврате заказа {order_id} в работу")
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить клиента {client.tg_id}: {e}")
-    
-    # Уведомляем бустера
-    try:
-        await call.bot.send_message(
-            booster.tg_id,
-            f"⚠️ <b>Заказ требует доработки</b>\n\n"
-            f"Ваше выполнение заказа {order_id} требует доработки.\n"
-            f"Пожалуйста, продолжите работу над заказом.\n\n"
-            f"Свяжитесь с администратором для уточнений.",
-            parse_mode="HTML"
-        )
-        logger.info(f"Бустер {booster.tg_id} уведомлен о возврате заказа {order_id} в работу")
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить бустера {booster.tg_id}: {e}")
-    
     logger.info(f"Завершение заказа {order_id} отклонено админом @{call.from_user.username}")
     await call.answer("Заказ возвращен в работу!")
@@ -1,4 +1,4 @@
-from app.database.crud import get_payment_request_by_id, update_payment_request_status, get_user_by_id, update_user_balance_by_region, get_user_by_tg_id, get_all_payment_requests
+from app.database.crud import get_payment_request_by_id, transition_payment_request_status, get_user_by_id, accept_payment_request, get_user_by_tg_id, count_payment_requests, get_payment_requests_page
 from aiogram import Router, F
 import logging
 from app.config import PAGE_SIZE
@@ -6,6 +6,7 @@ from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardBut
 from aiogram.fsm.context import FSMContext
 from app.utils.roles import admin_only
 from app.utils.user import format_user_profile
+from app.utils.pagination import parse_page_callback, next_page_callback, prev_page_callback
 from app.states.admin_states import SearchStates
 from app.keyboards.admin.payments import admin_topup_action_keyboard, back_to_payment_keyboard
 
@@ -38,8 +39,7 @@ def format_payment_request_text(payment_request, user):
 @admin_only
 async def admin_all_topup_requests(message: Message):
     logger.info(f"Админ @{message.from_user.username or 'без username'} открыл меню всех заявок на пополнение")
-    requests = await get_all_payment_requests()
-    if not requests:
+    if not await count_payment_requests():
         logger.info(f"Админ @{message.from_user.username or 'без username'}: нет заявок на пополнение")
         await message.answer("Нет заявок на пополнение.")
         return
@@ -65,10 +65,11 @@ async def admin_all_topup_requests(message: Message):
 @admin_only
 async def handle_payout_requests_menu(message: Message):
     """Обработчик кнопки 'Запросы выплат' в админ-меню"""
-    from app.database.crud import get_payout_requests
+    from app.database.crud import get_payout_requests, count_payout_requests
     from app.keyboards.admin.payout_keyboards import get_admin_payout_list_keyboard
+    from app.handlers.admin.payout_management import PAYOUT_REQUESTS_PER_PAGE
     
-    pending_requests = await get_payout_requests(status="pending", limit=10)
+    pending_requests = await get_payout_requests(status="pending", limit=PAYOUT_REQUESTS_PER_PAGE)
     
     if not pending_requests:
         text = "📋 <b>Запросы на выплату</b>\n\n"
@@ -81,14 +82,12 @@ async def handle_payout_requests_menu(message: Message):
         )
         return
         
-    text = f"📋 <b>Запросы на выплату ({len(pending_requests)})</b>\n\n"
+    total_pending = await count_payout_requests(status="pending")
+    text = f"📋 <b>Запросы на выплату ({total_pending})</b>\n\n"
     
     for req in pending_requests:
         from app.utils.currency import get_currency_info
-        from app.database.crud import get_booster_account_by_id
-        
-        # Получаем информацию о бустере
-        booster_account = await get_booster_account_by_id(req.booster_account_id)
+        booster_account = req.booster_account
         currency_info = get_currency_info(req.currency)
         
         text += f"🔸 Запрос #{req.id}\n"
@@ -100,7 +99,7 @@ async def handle_payout_requests_menu(message: Message):
     await message.answer(
         text,
         parse_mode="HTML",
-        reply_markup=get_admin_payout_list_keyboard(pending_requests)
+        reply_markup=get_admin_payout_list_keyboard(pending_requests, 0, PAYOUT_REQUESTS_PER_PAGE, total_pending)
     )
 
 @router.callback_query(F.data.startswith("filter_topups:"))
@@ -172,9 +171,11 @@ async def accept_payment(call: CallbackQuery):
         region_code = payment_request.region.lower()
     
     balance_field = f"balance_{region_code}"
-    await update_user_balance_by_region(user.id, balance_field, payment_request.amount)
-    
-    await update_payment_request_status(request_id, "accepted")
+    # Статус и баланс меняются одной транзакцией: повторный callback ничего не зачислит
+    if await accept_payment_request(request_id, balance_field, callback_id=call.id) is None:
+        logger.info(f"Админ @{call.from_user.username or 'без username'}: заявка ID {request_id} уже обработана")
+        await call.answer("Заявка уже обработана!", show_alert=True)
+        return
     logger.info(f"Админ @{call.from_user.username or 'без username'} принял заявку на пополнение ID {request_id}")
     await call.answer("Пополнение принято!")
     
@@ -207,7 +208,9 @@ async def reject_payment(call: CallbackQuery):
         logger.info(f"Админ @{call.from_user.username or 'без username'} попытался отклонить уже обработанную заявку ID {request_id}")
         await call.answer("Заявка уже обработана!", show_alert=True)
         return
-    await update_payment_request_status(request_id, "rejected")
+    if not await transition_payment_request_status(request_id, "pending", "rejected"):
+        await call.answer("Заявка уже обработана!", show_alert=True)
+        return
     user = await get_user_by_id(payment_request.user_id)
     logger.info(f"Админ @{call.from_user.username or 'без username'} отклонил заявку на пополнение ID {request_id}")
     await call.answer("Пополнение отклонено!")
@@ -286,17 +289,17 @@ async def back_to_payment(call: CallbackQuery):
 @router.callback_query(F.data.startswith("admin_requests_page:"))
 @admin_only
 async def admin_requests_page(call: CallbackQuery):
-    parts = call.data.split(":")
-    filter_status = parts[1]
-    page = int(parts[2])
+    cursor = parse_page_callback(call.data, extra_count=1, first_page=1)
+    filter_status = cursor.extra[0]
+    page = cursor.page
     logger.info(f"Админ @{call.from_user.username or 'без username'} переключил страницу заявок: статус={filter_status}, страница={page}")
-    await show_filtered_requests(call, filter_status, page)
+    await show_filtered_requests(call, filter_status, page, after_id=cursor.after_id, before_id=cursor.before_id)
 
-async def show_filtered_requests(call: CallbackQuery, filter_status: str, page: int = 1):
-    requests = await get_all_payment_requests()
-    filtered = [r for r in requests if r.status == filter_status]
-    total_pages = (len(filtered) + PAGE_SIZE - 1) // PAGE_SIZE
-    if not filtered:
+async def show_filtered_requests(call: CallbackQuery, filter_status: str, page: int = 1,
+                                 after_id: int = None, before_id: int = None):
+    total_count = await count_payment_requests(filter_status)
+    total_pages = (total_count + PAGE_SIZE - 1) // PAGE_SIZE
+    if not total_count:
         try:
             await call.message.edit_text("Нет заявок с таким статусом.")
         except Exception as e:
@@ -310,9 +313,10 @@ async def show_filtered_requests(call: CallbackQuery, filter_status: str, page:
         logger.info(f"Админ @{call.from_user.username or 'без username'} увидел пустой список заявок со статусом {filter_status}")
         await call.answer()
         return
-    start = (page - 1) * PAGE_SIZE
-    end = start + PAGE_SIZE
-    page_requests = filtered[start:end]
+    page = min(max(page, 1), total_pages)
+    page_requests = await get_payment_requests_page(
+        filter_status, limit=PAGE_SIZE, after_id=after_id, before_id=before_id
+    )
     text = f"<b>Заявки со статусом: {filter_status}</b>\nСтраница {page}/{total_pages}\nВыберите заявку для подробностей:"
     buttons = [
         [
@@ -325,10 +329,14 @@ async def show_filtered_requests(call: CallbackQuery, filter_status: str, page:
         ] for req in page_requests
     ]
     nav_buttons = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"admin_requests_page:{filter_status}:{page-1}"))
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton(text="➡️ Вперёд", callback_data=f"admin_requests_page:{filter_status}:{page+1}"))
+    if page > 1 and page_requests:
+        nav_buttons.append(InlineKeyboardButton(
+            text="⬅️ Назад", callback_data=prev_page_callback("admin_requests_page", page, page_requests, filter_status)
+        ))
+    if page < total_pages and page_requests:
+        nav_buttons.append(InlineKeyboardButton(
+            text="➡️ Вперёд", callback_data=next_page_callback("admin_requests_page", page, page_requests, filter_status)
+        ))
     if nav_buttons:
         buttons.append(nav_buttons)
     requests_keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -3,19 +3,26 @@ from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from app.utils.roles import admin_only
 from app.states.admin_states import AdminStates
+from app.utils.pagination import parse_page_callback
 import logging
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+PAYOUT_REQUESTS_PER_PAGE = 10
+PAYOUT_HISTORY_PER_PAGE = 20
+
 @router.callback_query(F.data == "admin_payout_requests")
 @admin_only
-async def show_payout_requests(call: CallbackQuery):
+async def show_payout_requests(call: CallbackQuery, page: int = 0, after_id: int = None, before_id: int = None):
     """Показать список запросов на выплату"""
-    from app.database.crud import get_payout_requests
+    from app.database.crud import get_payout_requests, count_payout_requests
     from app.keyboards.admin.payout_keyboards import get_admin_payout_list_keyboard
     
-    pending_requests = await get_payout_requests(status="pending", limit=10)
+    pending_requests = await get_payout_requests(
+        status="pending", limit=PAYOUT_REQUESTS_PER_PAGE, after_id=after_id, before_id=before_id
+    )
+    total_pending = await count_payout_requests(status="pending")
     
     if not pending_requests:
         from datetime import datetime
@@ -41,14 +48,12 @@ async def show_payout_requests(call: CallbackQuery):
         
     from datetime import datetime
     current_time = datetime.now().strftime('%H:%M:%S')
-    text = f"📋 <b>Запросы на выплату ({len(pending_requests)})</b>\n\n"
+    text = f"📋 <b>Запросы на выплату ({total_pending})</b>\n"
+    text += f"📄 Страница {page + 1}\n\n"
     
     for req in pending_requests:
         from app.utils.currency import get_currency_info
-        from app.database.crud import get_booster_account_by_id
-        
-        # Получаем информацию о бустере
-        booster_account = await get_booster_account_by_id(req.booster_account_id)
+        booster_account = req.booster_account
         currency_info = get_currency_info(req.currency)
         
         text += f"🔸 Запрос #{req.id}\n"
@@ -59,25 +64,34 @@ async def show_payout_requests(call: CallbackQuery):
     
     text += f"🕒 Обновлено: {current_time}"
     
+    keyboard = get_admin_payout_list_keyboard(pending_requests, page, PAYOUT_REQUESTS_PER_PAGE, total_pending)
     try:
         await call.message.edit_text(
             text,
             parse_mode="HTML",
-            reply_markup=get_admin_payout_list_keyboard(pending_requests)
+            reply_markup=keyboard
         )
     except Exception:
         # Если не удалось отредактировать, отправляем новое сообщение
         await call.message.answer(
             text,
             parse_mode="HTML",
-            reply_markup=get_admin_payout_list_keyboard(pending_requests)
+            reply_markup=keyboard
         )
 
+@router.callback_query(F.data.startswith("admin_payout_page:"))
+@admin_only
+async def paginate_payout_requests(call: CallbackQuery):
+    """Листание списка запросов на выплату"""
+    cursor = parse_page_callback(call.data)
+    await show_payout_requests(call, page=cursor.page, after_id=cursor.after_id, before_id=cursor.before_id)
+    await call.answer()
+
 @router.callback_query(F.data.startswith("admin_payout_view_"))
 @admin_only
 async def view_payout_request(call: CallbackQuery):
     """Подробный просмотр запроса на выплату"""
-    from app.database.crud import get_payout_request_by_id, get_booster_account_by_id
+    from app.database.crud import get_payout_request_by_id
     from app.keyboards.admin.payout_keyboards import get_admin_payout_detail_keyboard
     from app.utils.currency import get_currency_info
     
@@ -89,7 +103,7 @@ async def view_payout_request(call: CallbackQuery):
         return
         
     # Получаем информацию о бустере
-    booster_account = await get_booster_account_by_id(payout_request.booster_account_id)
+    booster_account = payout_request.booster_account
     currency_info = get_currency_info(payout_request.currency)
     
     text = f"📄 <b>Запрос на выплату #{payout_request.id}</b>\n\n"
@@ -128,8 +142,15 @@ async def approve_payout_request(call: CallbackQuery, state: FSMContext):
     """Одобрить запрос на выплату - требует загрузки чека"""
     from app.states.admin_states import AdminStates
     
+    from app.database.crud import get_payout_request_by_id
+    
     request_id = int(call.data.split("_")[3])
     
+    payout_request = await get_payout_request_by_id(request_id)
+    if not payout_request or payout_request.status != "pending":
+        await call.answer("Запрос уже обработан!", show_alert=True)
+        return
+    
     await call.message.edit_text(
         f"📄 <b>Подтверждение выплаты #{request_id}</b>\n\n"
         "Для завершения одобрения выплаты необходимо загрузить чек о переводе.\n\n"
@@ -144,7 +165,7 @@ async def approve_payout_request(call: CallbackQuery, state: FSMContext):
 @admin_only
 async def process_receipt_upload(message: Message, state: FSMContext):
     """Обработка загруженного чека выплаты"""
-    from app.database.crud import approve_payout_request, get_payout_request_by_id, get_user_by_id
+    from app.database.crud import approve_payout_request, get_payout_request_by_id
     from aiogram import Bot
     from app.config import BOT_TOKEN
     
@@ -174,12 +195,12 @@ async def process_receipt_upload(message: Message, state: FSMContext):
         
         # Отправляем уведомление бустеру
         try:
-            # Получаем данные бустера
-            from app.database.crud import get_booster_account_by_id
-            booster_account = await get_booster_account_by_id(payout_request.booster_account_id)
+            # Получаем данные бустера вместе с пользователем одним запросом
+            loaded_request = await get_payout_request_by_id(request_id)
+            booster_account = loaded_request.booster_account if loaded_request else None
             
             if booster_account:
-                user = await get_user_by_id(booster_account.user_id)
+                user = booster_account.user
                 if user:
                     bot = Bot(token=BOT_TOKEN)
                     
@@ -216,7 +237,7 @@ async def process_receipt_upload(message: Message, state: FSMContext):
         )
         
     else:
-        await message.answer("❌ Ошибка при одобрении запроса")
+        await message.answer("❌ Запрос уже обработан, не найден или на балансе бустера недостаточно средств")
         await state.clear()
 
 @router.callback_query(F.data.startswith("admin_reject_payout_"))
@@ -265,15 +286,17 @@ async def process_reject_comment(message: Message, state: FSMContext):
 
 @router.callback_query(F.data == "admin_payout_history")
 @admin_only
-async def show_payout_history(call: CallbackQuery):
+async def show_payout_history(call: CallbackQuery, page: int = 0, after_id: int = None, before_id: int = None):
     """Показать историю выплат"""
-    from app.database.crud import get_payout_requests
+    from app.database.crud import get_payout_requests, count_payout_requests
     from app.keyboards.admin.payout_keyboards import get_admin_payout_history_keyboard
     from datetime import datetime
     
-    # Получаем последние обработанные запросы
-    processed_requests = await get_payout_requests(status=None, limit=20)
-    processed_requests = [req for req in processed_requests if req.status != "pending"]
+    # Получаем страницу обработанных запросов
+    processed_requests = await get_payout_requests(
+        exclude_status="pending", limit=PAYOUT_HISTORY_PER_PAGE, after_id=after_id, before_id=before_id
+    )
+    total_processed = await count_payout_requests(exclude_status="pending")
     
     current_time = datetime.now().strftime('%H:%M:%S')
     
@@ -282,13 +305,12 @@ async def show_payout_history(call: CallbackQuery):
         text += f"История пуста.\n\n"
         text += f"🕒 Обновлено: {current_time}"
     else:
-        text = f"📚 <b>История выплат ({len(processed_requests)})</b>\n\n"
+        text = f"📚 <b>История выплат ({total_processed})</b>\n"
+        text += f"📄 Страница {page + 1}\n\n"
         
         for req in processed_requests:
             from app.utils.currency import get_currency_info
-            from app.database.crud import get_booster_account_by_id
-            
-            booster_account = await get_booster_account_by_id(req.booster_account_id)
+            booster_account = req.booster_account
             currency_info = get_currency_info(req.currency)
             
             status_emoji = {"approved": "✅", "rejected": "❌"}
@@ -305,20 +327,29 @@ async def show_payout_history(call: CallbackQuery):
         
         text += f"🕒 Обновлено: {current_time}"
 
+    keyboard = get_admin_payout_history_keyboard(processed_requests, page, PAYOUT_HISTORY_PER_PAGE, total_processed)
     try:
         await call.message.edit_text(
             text,
             parse_mode="HTML", 
-            reply_markup=get_admin_payout_history_keyboard()
+            reply_markup=keyboard
         )
     except Exception:
         # Если не удалось отредактировать, отправляем новое сообщение
         await call.message.answer(
             text,
             parse_mode="HTML", 
-            reply_markup=get_admin_payout_history_keyboard()
+            reply_markup=keyboard
         )
 
+@router.callback_query(F.data.startswith("admin_payout_history_page:"))
+@admin_only
+async def paginate_payout_history(call: CallbackQuery):
+    """Листание истории выплат"""
+    cursor = parse_page_callback(call.data)
+    await show_payout_history(call, page=cursor.page, after_id=cursor.after_id, before_id=cursor.before_id)
+    await call.answer()
+
 @router.callback_query(F.data == "admin_menu")
 @admin_only
 async def back_to_admin_menu(call: CallbackQuery):
@@ -564,6 +564,8 @@ async def settings_reset_all_process(call: CallbackQuery):
                 config["description"],
                 config["category"]
             )
+        # Перечитываем кэш целиком, чтобы в нём не осталось устаревших ключей
+        SettingsManager.invalidate_cache()
         
         logger.info(f"Админ @{call.from_user.username} сбросил все настройки к умолчанию")
         
@@ -16,6 +16,7 @@ from app.keyboards.booster.payout_keyboards import get_back_to_balance_keyboard
 from app.utils.currency import get_currency_info
 from app.states.booster_states import BoosterStates
 from app.database import crud
+from app.utils.pagination import parse_page_callback
 import logging
 
 router = Router()
@@ -25,10 +26,11 @@ logger = logging.getLogger(__name__)
 
 async def get_booster_data(user_id: int):
     """Получает данные бустера и пользователя"""
-    from app.database.crud import get_booster_account, get_user_by_tg_id
+    from app.database.crud import get_booster_account
+    from app.utils.user import get_current_user
     
     booster_account = await get_booster_account(user_id)
-    user = await get_user_by_tg_id(user_id)
+    user = await get_current_user(user_id)
     
     return booster_account, user
 
@@ -129,16 +131,16 @@ async def show_booster_balance(message: Message):
 @booster_only
 async def handle_exchange_rates(call: CallbackQuery):
     """Показать или обновить курсы валют"""
-    from app.utils.currency_converter import get_current_rates, converter
+    from app.utils.currency_converter import get_current_rates, refresh_current_rates
     from app.keyboards.booster.payout_keyboards import get_back_to_balance_keyboard
     
     is_refresh = call.data == "booster_refresh_rates"
     
     try:
         if is_refresh:
-            converter.cache = {}  # Очищаем кэш для принудительного обновления
-            
-        rates = await get_current_rates()
+            rates = await refresh_current_rates()
+        else:
+            rates = await get_current_rates()
         
         title = "🔄 <b>Курсы обновлены!</b>" if is_refresh else "📊 <b>Текущие курсы валют</b>"
         text = f"{title}\n\n"
@@ -380,16 +382,13 @@ async def confirm_payout_request(call: CallbackQuery, state: FSMContext):
         try:
             from app.utils.payments import notify_admins_about_payout_request
             from app.database.crud import get_booster_account_by_id
-            from aiogram import Bot
-            from app.config import BOT_TOKEN
             
             # Получаем данные аккаунта бустера
             booster_account = await get_booster_account_by_id(payout_request.booster_account_id)
             
             if booster_account:
-                bot = Bot(token=BOT_TOKEN)
-                await notify_admins_about_payout_request(bot, payout_request, booster_account)
-                await bot.session.close()
+                # Уведомление уходит в фоне через бота приложения
+                await notify_admins_about_payout_request(call.bot, payout_request, booster_account)
         except Exception as e:
             logger.error(f"Ошибка отправки уведомления админам: {e}")
         
@@ -421,17 +420,21 @@ async def show_my_payout_requests(call: CallbackQuery):
         logger.error(f"Ошибка при показе запросов на выплату: {e}")
         await call.answer("❌ Ошибка загрузки запросов", show_alert=True)
 
-@router.callback_query(F.data.startswith("payout_requests_page_"))
+@router.callback_query(F.data.startswith("payout_requests_page"))
 @booster_only
 async def show_payout_requests_page(call: CallbackQuery, page: int = None):
     """Показать страницу запросов на выплату"""
-    from app.keyboards.booster.payout_keyboards import get_payout_requests_list_keyboard
-    from app.database.crud import get_user_payout_requests
+    from app.keyboards.booster.payout_keyboards import get_payout_requests_list_keyboard, PAYOUT_REQUESTS_PER_PAGE
+    from app.database.crud import get_user_payout_requests, count_user_payout_requests
     
+    after_id = before_id = None
     if page is None:
-        page = int(call.data.split("_")[-1])
+        cursor = parse_page_callback(call.data)
+        page, after_id, before_id = cursor.page, cursor.after_id, cursor.before_id
     
-    requests = await get_user_payout_requests(call.from_user.id)
+    requests = await get_user_payout_requests(
+        call.from_user.id, limit=PAYOUT_REQUESTS_PER_PAGE, after_id=after_id, before_id=before_id
+    )
     
     if not requests:
         text = "📋 <b>Мои запросы на выплату</b>\n\n"
@@ -441,12 +444,12 @@ async def show_payout_requests_page(call: CallbackQuery, page: int = None):
         from app.keyboards.booster.payout_keyboards import get_my_requests_keyboard
         keyboard = get_my_requests_keyboard()
     else:
-        total_requests = len(requests)
+        total_requests = await count_user_payout_requests(call.from_user.id)
         text = f"📋 <b>Мои запросы на выплату</b>\n\n"
         text += f"📊 Всего запросов: {total_requests}\n"
         text += f"📄 Выберите запрос для просмотра:"
         
-        keyboard = get_payout_requests_list_keyboard(requests, page)
+        keyboard = get_payout_requests_list_keyboard(requests, page, total_count=total_requests)
     
     try:
         await call.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
@@ -553,10 +556,12 @@ async def view_payout_request_detail(call: CallbackQuery):
 @booster_only
 async def return_to_payout_list(call: CallbackQuery):
     """Возврат к списку запросов выплат"""
-    from app.keyboards.booster.payout_keyboards import get_payout_requests_list_keyboard, get_my_requests_keyboard
-    from app.database.crud import get_user_payout_requests
+    from app.keyboards.booster.payout_keyboards import (
+        get_payout_requests_list_keyboard, get_my_requests_keyboard, PAYOUT_REQUESTS_PER_PAGE
+    )
+    from app.database.crud import get_user_payout_requests, count_user_payout_requests
     
-    requests = await get_user_payout_requests(call.from_user.id)
+    requests = await get_user_payout_requests(call.from_user.id, limit=PAYOUT_REQUESTS_PER_PAGE)
     
     if not requests:
         text = "📋 <b>Мои запросы на выплату</b>\n\n"
@@ -564,11 +569,11 @@ async def return_to_payout_list(call: CallbackQuery):
         text += "💸 Создайте новый запрос, чтобы вывести заработанные средства."
         keyboard = get_my_requests_keyboard()
     else:
-        total_requests = len(requests)
+        total_requests = await count_user_payout_requests(call.from_user.id)
         text = f"📋 <b>Мои запросы на выплату</b>\n\n"
         text += f"📊 Всего запросов: {total_requests}\n"
         text += f"📄 Выберите запрос для просмотра:"
-        keyboard = get_payout_requests_list_keyboard(requests, page=0)
+        keyboard = get_payout_requests_list_keyboard(requests, page=0, total_count=total_requests)
     
     # Всегда удаляем предыдущее сообщение и отправляем новое
     try:
@@ -4,9 +4,13 @@ from aiogram.fsm.context import FSMContext
 from app.utils.roles import booster_only
 from app.states.booster_states import BoosterStates
 from app.database.crud import (
-    get_order_by_id, get_orders_by_booster, update_order_status, 
-    get_user_by_id, get_booster_account, get_user_by_tg_id, get_users_by_role
+    get_order_by_id, transition_order_status, get_user_by_id, get_booster_account,
+    count_booster_orders_by_status, get_booster_orders_page
 )
+from app.database.order_status import CONFIRMED, IN_PROGRESS, PENDING_REVIEW
+from app.utils.user import get_current_user
+from app.utils.notifications import notify_admins, with_retry
+from app.utils.pagination import parse_page_callback
 from app.keyboards.booster.order_management import (
     booster_order_details_keyboard, booster_work_progress_keyboard,
     booster_complete_order_keyboard, my_orders_list_keyboard
@@ -17,6 +21,10 @@ from datetime import datetime
 router = Router()
 logger = logging.getLogger(__name__)
 
+# Статусы, которые бустер видит в фильтре "активные"
+ACTIVE_BOOSTER_STATUSES = [CONFIRMED, IN_PROGRESS, PENDING_REVIEW]
+BOOSTER_ORDERS_PER_PAGE = 5
+
 def get_currency_for_order(order, user=None):
     """Получает валюту для заказа, определяя её по региону пользователя если нужно"""
     currency = order.currency
@@ -33,14 +41,7 @@ def get_currency_for_order(order, user=None):
     return currency
 
 async def send_admin_order_completion_notification(bot, order, booster_user, client, proof_message=None):
-    """Отправка уведомления админу о завершении заказа бустером"""
-    
-    # Получаем всех админов из базы данных
-    admins = await get_users_by_role("admin")
-    
-    if not admins:
-        logger.warning("Не найдено ни одного администратора в базе данных")
-        return
+    """Отправка уведомления админам о завершении заказа бустером (в фоне, без ожидания доставки)"""
     
     # Формируем текст уведомления
     service_names = {
@@ -110,57 +111,41 @@ async def send_admin_order_completion_notification(bot, order, booster_user, cli
         ]
     ])
     
-    # Отправляем всем админам из базы данных
-    sent_count = 0
-    for admin in admins:
-        try:
-            # Сначала отправляем основное уведомление
-            await bot.send_message(
-                chat_id=admin.tg_id,
-                text=text,
-                parse_mode="HTML",
-                reply_markup=admin_keyboard
-            )
-            
-            # Если есть доказательство (фото/медиа/текст), пересылаем его
-            if proof_message:
-                proof_text = f"📸 <b>Доказательство выполнения заказа {order.order_id}:</b>"
-                
-                # Проверяем тип контента и пересылаем соответственно
-                if proof_message.photo:
-                    await bot.send_photo(
-                        chat_id=admin.tg_id,
-                        photo=proof_message.photo[-1].file_id,
-                        caption=proof_text + (f"\n\n💬 <b>Комментарий:</b> {proof_message.caption}" if proof_message.caption else ""),
-                        parse_mode="HTML"
-                    )
-                elif proof_message.video:
-                    await bot.send_video(
-                        chat_id=admin.tg_id,
-                        video=proof_message.video.file_id,
-                        caption=proof_text + (f"\n\n💬 <b>Комментарий:</b> {proof_message.caption}" if proof_message.caption else ""),
-                        parse_mode="HTML"
-                    )
-                elif proof_message.document:
-                    await bot.send_document(
-                        chat_id=admin.tg_id,
-                        document=proof_message.document.file_id,
-                        caption=proof_text + (f"\n\n💬 <b>Комментарий:</b> {proof_message.caption}" if proof_message.caption else ""),
-                        parse_mode="HTML"
-                    )
-                elif proof_message.text:
-                    await bot.send_message(
-                        chat_id=admin.tg_id,
-                        text=proof_text + f"\n\n💬 <b>Текст доказательства:</b>\n{proof_message.text}",
-                        parse_mode="HTML"
-                    )
+    async def send(admin_id):
+        # Сначала отправляем основное уведомление
+        await with_retry(
+            bot.send_message,
+            chat_id=admin_id,
+            text=text,
+            parse_mode="HTML",
+            reply_markup=admin_keyboard
+        )
+        
+        # Если есть доказательство (фото/медиа/текст), пересылаем его
+        if proof_message:
+            proof_text = f"📸 <b>Доказательство выполнения заказа {order.order_id}:</b>"
+            caption = proof_text + (f"\n\n💬 <b>Комментарий:</b> {proof_message.caption}" if proof_message.caption else "")
             
-            logger.info(f"Уведомление о завершении заказа {order.order_id} отправлено админу @{admin.username} ({admin.tg_id})")
-            sent_count += 1
-        except Exception as e:
-            logger.error(f"Ошибка отправки уведомления админу @{admin.username} ({admin.tg_id}): {e}")
-    
-    logger.info(f"Уведомление о завершении заказа {order.order_id} отправлено {sent_count} из {len(admins)} админов")
+            # Проверяем тип контента и пересылаем соответственно
+            if proof_message.photo:
+                await with_retry(bot.send_photo, chat_id=admin_id, photo=proof_message.photo[-1].file_id,
+                                 caption=caption, parse_mode="HTML")
+            elif proof_message.video:
+                await with_retry(bot.send_video, chat_id=admin_id, video=proof_message.video.file_id,
+                                 caption=caption, parse_mode="HTML")
+            elif proof_message.document:
+                await with_retry(bot.send_document, chat_id=admin_id, document=proof_message.document.file_id,
+                                 caption=caption, parse_mode="HTML")
+            elif proof_message.text:
+                await with_retry(
+                    bot.send_message,
+                    chat_id=admin_id,
+                    text=proof_text + f"\n\n💬 <b>Текст доказательства:</b>\n{proof_message.text}",
+                    parse_mode="HTML"
+                )
+    
+    # Отправляем всем админам параллельно, бустер получает ответ сразу
+    notify_admins(send, f"завершение заказа {order.order_id}")
 
 # === ПРОСМОТР НАЗНАЧЕННЫХ ЗАКАЗОВ ===
 
@@ -175,17 +160,18 @@ async def show_booster_orders(message: Message):
         return
     
     # Получаем user_id по tg_id
-    user = await get_user_by_tg_id(message.from_user.id)
+    user = await get_current_user(message.from_user.id)
     if not user:
         await message.answer("❌ Пользователь не найден!")
         return
     
-    # Получаем заказы бустера - используем user.id из базы данных
-    orders = await get_orders_by_booster(user.id)
+    # Количество заказов бустера по статусам считаем в БД - используем user.id из базы данных
+    status_counts = await count_booster_orders_by_status(user.id)
+    total_orders = sum(status_counts.values())
     
-    logger.info(f"Бустер {message.from_user.id} (user_id={user.id}) запросил заказы. Найдено: {len(orders) if orders else 0} заказов")
+    logger.info(f"Бустер {message.from_user.id} (user_id={user.id}) запросил заказы. Найдено: {total_orders} заказов")
     
-    if not orders:
+    if not total_orders:
         await message.answer(
             "📦 <b>Мои заказы</b>\n\n"
             "У вас пока нет назначенных заказов.\n"
@@ -195,38 +181,50 @@ async def show_booster_orders(message: Message):
         return
     
     # Показываем активные заказы по умолчанию
-    await show_filtered_orders(message, orders, show_active_only=True, page=0, edit_message=False)
+    await show_filtered_orders(message, user.id, show_active_only=True, page=0, status_counts=status_counts, edit_message=False)
 
-async def show_filtered_orders(message_or_call, orders, show_active_only=True, page=0, edit_message=True):
-    """Показывает отфильтрованный список заказов"""
+async def show_filtered_orders(message_or_call, booster_id, show_active_only=True, page=0,
+                               after_id=None, before_id=None, status_counts=None, edit_message=True):
+    """Показывает отфильтрованный список заказов (одна страница из БД)"""
+    if status_counts is None:
+        status_counts = await count_booster_orders_by_status(booster_id)
+    
     # Фильтруем заказы
     if show_active_only:
-        filtered_orders = [o for o in orders if o.status in ["confirmed", "in_progress", "pending_review"]]
+        statuses = ACTIVE_BOOSTER_STATUSES
         filter_name = "активные"
     else:
-        filtered_orders = orders
+        statuses = None
         filter_name = "все"
     
-    # Группируем заказы по статусам для статистики
-    pending_orders = [o for o in filtered_orders if o.status == "confirmed"]
-    in_progress_orders = [o for o in filtered_orders if o.status == "in_progress"]
-    pending_review_orders = [o for o in filtered_orders if o.status == "pending_review"]
-    completed_orders = [o for o in filtered_orders if o.status == "completed"]
+    total_filtered = sum(
+        count for status, count in status_counts.items()
+        if statuses is None or status in statuses
+    )
+    page_orders = await get_booster_orders_page(
+        booster_id, statuses, limit=BOOSTER_ORDERS_PER_PAGE, after_id=after_id, before_id=before_id
+    )
+    
+    # Статистика по статусам
+    pending_count = status_counts.get("confirmed", 0)
+    in_progress_count = status_counts.get("in_progress", 0)
+    pending_review_count = status_counts.get("pending_review", 0)
+    completed_count = status_counts.get("completed", 0)
     
     text = f"📦 <b>Мои заказы ({filter_name})</b>\n\n"
     
-    if filtered_orders:
-        text += f"Всего {filter_name}: <b>{len(filtered_orders)}</b>\n\n"
+    if total_filtered:
+        text += f"Всего {filter_name}: <b>{total_filtered}</b>\n\n"
         
         status_text = ""
-        if pending_orders:
-            status_text += f"⏳ <b>Ожидают начала:</b> {len(pending_orders)}\n"
-        if in_progress_orders:
-            status_text += f"🚀 <b>В работе:</b> {len(in_progress_orders)}\n"
-        if pending_review_orders:
-            status_text += f"📋 <b>На проверке:</b> {len(pending_review_orders)}\n"
-        if completed_orders and not show_active_only:
-            status_text += f"✅ <b>Завершенных:</b> {len(completed_orders)}\n"
+        if pending_count:
+            status_text += f"⏳ <b>Ожидают начала:</b> {pending_count}\n"
+        if in_progress_count:
+            status_text += f"🚀 <b>В работе:</b> {in_progress_count}\n"
+        if pending_review_count:
+            status_text += f"📋 <b>На проверке:</b> {pending_review_count}\n"
+        if completed_count and not show_active_only:
+            status_text += f"✅ <b>Завершенных:</b> {completed_count}\n"
         
         if status_text:
             text += f"{status_text}\n"
@@ -240,7 +238,7 @@ async def show_filtered_orders(message_or_call, orders, show_active_only=True, p
             text += "У вас пока нет заказов.\n"
             text += "Ожидайте назначения новых заказов от администрации."
     
-    keyboard = my_orders_list_keyboard(orders, show_active_only, page)
+    keyboard = my_orders_list_keyboard(page_orders, show_active_only, page, BOOSTER_ORDERS_PER_PAGE, total_filtered)
     
     if edit_message and hasattr(message_or_call, 'message'):
         try:
@@ -266,15 +264,15 @@ async def booster_refresh_orders(call: CallbackQuery):
         return
     
     # Получаем user_id по tg_id
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not user:
         await call.answer("❌ Пользователь не найден!", show_alert=True)
         return
     
-    # Получаем заказы бустера - используем user.id из базы данных
-    orders = await get_orders_by_booster(user.id)
+    # Количество заказов бустера - используем user.id из базы данных
+    status_counts = await count_booster_orders_by_status(user.id)
     
-    if not orders:
+    if not status_counts:
         await call.message.edit_text(
             "📦 <b>Мои заказы</b>\n\n"
             "У вас пока нет назначенных заказов.\n"
@@ -285,7 +283,7 @@ async def booster_refresh_orders(call: CallbackQuery):
         return
     
     # Показываем активные заказы по умолчанию
-    await show_filtered_orders(call, orders, show_active_only=True, page=0, edit_message=True)
+    await show_filtered_orders(call, user.id, show_active_only=True, page=0, status_counts=status_counts, edit_message=True)
     await call.answer("Список заказов обновлен!")
 
 # === ФИЛЬТРАЦИЯ И ПАГИНАЦИЯ ЗАКАЗОВ ===
@@ -295,39 +293,34 @@ async def booster_refresh_orders(call: CallbackQuery):
 async def filter_booster_orders(call: CallbackQuery):
     """Фильтрация заказов бустера"""
     _, filter_type, page_str = call.data.split(":")
-    page = int(page_str)
     
     # Получаем user_id по tg_id
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not user:
         await call.answer("❌ Пользователь не найден!", show_alert=True)
         return
     
-    # Получаем заказы бустера
-    orders = await get_orders_by_booster(user.id)
-    
+    # Смена фильтра всегда начинается с первой страницы
     show_active_only = filter_type == "active"
-    await show_filtered_orders(call, orders, show_active_only, page, edit_message=True)
+    await show_filtered_orders(call, user.id, show_active_only, page=0, edit_message=True)
     await call.answer()
 
 @router.callback_query(F.data.startswith("booster_orders_page:"))
 @booster_only
 async def paginate_booster_orders(call: CallbackQuery):
     """Пагинация заказов бустера"""
-    _, show_active_str, page_str = call.data.split(":")
-    show_active_only = show_active_str == "True"
-    page = int(page_str)
+    # Формат: booster_orders_page:<активные>:<страница>:<n|p>:<id заказа-курсора>
+    cursor = parse_page_callback(call.data, extra_count=1)
+    show_active_only = cursor.extra[0] == "True"
     
     # Получаем user_id по tg_id
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not user:
         await call.answer("❌ Пользователь не найден!", show_alert=True)
         return
     
-    # Получаем заказы бустера
-    orders = await get_orders_by_booster(user.id)
-    
-    await show_filtered_orders(call, orders, show_active_only, page, edit_message=True)
+    await show_filtered_orders(call, user.id, show_active_only, cursor.page,
+                               after_id=cursor.after_id, before_id=cursor.before_id, edit_message=True)
     await call.answer()
 
 # === ДЕТАЛЬНЫЙ ПРОСМОТР ЗАКАЗА ===
@@ -345,7 +338,7 @@ async def booster_order_details(call: CallbackQuery):
     
     # Проверяем, что заказ назначен этому бустеру - сравниваем с user_id из БД
     booster_account = await get_booster_account(call.from_user.id)
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not booster_account or not user or order.assigned_booster_id != user.id:
         await call.answer("Этот заказ не назначен вам!", show_alert=True)
         return
@@ -471,18 +464,16 @@ async def booster_start_work(call: CallbackQuery):
     
     # Проверяем, что заказ назначен этому бустеру - сравниваем с user_id из БД
     booster_account = await get_booster_account(call.from_user.id)
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not booster_account or not user or order.assigned_booster_id != user.id:
         await call.answer("Этот заказ не назначен вам!", show_alert=True)
         return
     
-    if order.status != "confirmed":
+    # Обновляем статус заказа
+    if not await transition_order_status(order_id, IN_PROGRESS, call.from_user.id, expected=CONFIRMED):
         await call.answer("Заказ нельзя взять в работу в текущем статусе!", show_alert=True)
         return
     
-    # Обновляем статус заказа
-    await update_order_status(order_id, "in_progress")
-    
     client = await get_user_by_id(order.user_id)
     
     await call.message.edit_text(
@@ -525,7 +516,7 @@ async def booster_take_account(call: CallbackQuery):
     
     # Проверяем, что заказ назначен этому бустеру - сравниваем с user_id из БД
     booster_account = await get_booster_account(call.from_user.id)
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not booster_account or not user or order.assigned_booster_id != user.id:
         await call.answer("Этот заказ не назначен вам!", show_alert=True)
         return
@@ -578,7 +569,7 @@ async def booster_leave_account(call: CallbackQuery):
     
     # Проверяем, что заказ назначен этому бустеру - сравниваем с user_id из БД
     booster_account = await get_booster_account(call.from_user.id)
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not booster_account or not user or order.assigned_booster_id != user.id:
         await call.answer("Этот заказ не назначен вам!", show_alert=True)
         return
@@ -625,7 +616,7 @@ async def booster_complete_order(call: CallbackQuery, state: FSMContext):
     
     # Проверяем, что заказ назначен этому бустеру - сравниваем с user_id из БД
     booster_account = await get_booster_account(call.from_user.id)
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not booster_account or not user or order.assigned_booster_id != user.id:
         await call.answer("Этот заказ не назначен вам!", show_alert=True)
         return
@@ -673,10 +664,13 @@ async def process_completion_proof(message: Message, state: FSMContext):
         return
     
     # Обновляем статус заказа на "ожидает проверки"
-    await update_order_status(order_id, "pending_review")
+    if not await transition_order_status(order_id, PENDING_REVIEW, message.from_user.id):
+        await message.answer("❌ Заказ нельзя отправить на проверку в текущем статусе!")
+        await state.clear()
+        return
     
     client = await get_user_by_id(order.user_id)
-    booster_user = await get_user_by_tg_id(message.from_user.id)
+    booster_user = await get_current_user(message.from_user.id)
     
     await message.answer(
         f"✅ <b>Доказательство получено!</b>\n\n"
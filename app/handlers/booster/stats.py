@@ -10,7 +10,8 @@ logger = logging.getLogger(__name__)
 @booster_only
 async def show_booster_stats(message: Message):
     """Показать статистику бустера"""
-    from app.database.crud import get_booster_account, get_orders_by_booster, get_user_by_tg_id
+    from app.database.crud import get_booster_account, get_booster_order_stats
+    from app.utils.user import get_current_user
     from app.utils.currency_converter import converter
     
     booster_account = await get_booster_account(message.from_user.id)
@@ -18,10 +19,11 @@ async def show_booster_stats(message: Message):
         await message.answer("❌ Аккаунт бустера не найден!")
         return
     
-    orders = await get_orders_by_booster(booster_account.id)
+    # Заказы назначаются на users.id бустера, считаем статистику в БД
+    stats = await get_booster_order_stats(booster_account.user_id)
     
     # Получаем пользователя для определения валюты
-    user = await get_user_by_tg_id(message.from_user.id)
+    user = await get_current_user(message.from_user.id)
     region_currencies = {
         "🇰🇬 КР": "сом",
         "🇰🇿 КЗ": "тенге", 
@@ -33,20 +35,31 @@ async def show_booster_stats(message: Message):
     from app.utils.settings import get_booster_income_percent
     booster_percent = await get_booster_income_percent()
     
-    total_orders = len(orders)
-    completed_orders = len([o for o in orders if o.status == "completed"])
-    in_progress_orders = len([o for o in orders if o.status in ["confirmed", "in_progress", "pending_review"]])
-    total_earned = sum([o.total_cost * (booster_percent / 100) for o in orders if o.status == "completed"])
+    by_status = stats["by_status"]
+    total_orders = sum(by_status.values())
+    completed_orders = by_status.get("completed", 0)
+    in_progress_orders = sum(by_status.get(status, 0) for status in ["confirmed", "in_progress", "pending_review"])
     
-    # Конвертируем заработанную сумму в доллары
-    currency_codes = {"сом": "KGS", "тенге": "KZT", "руб.": "RUB"}
-    from_currency = currency_codes.get(currency, "RUB")
+    # Заработок по валютам заказов (у старых заказов валюта могла не сохраниться)
+    earned_by_currency = {}
+    for order_currency, total in stats["completed_by_currency"].items():
+        order_currency = order_currency if order_currency and order_currency != "None" else currency
+        earned_by_currency[order_currency] = earned_by_currency.get(order_currency, 0) + total * (booster_percent / 100)
     
+    # Конвертируем заработанную сумму в доллары
     try:
-        total_earned_usd = await converter.convert_currency(total_earned, from_currency, "USD")
-        earned_text = f"💰 <b>Заработано:</b> {total_earned:.0f} {currency} (~${total_earned_usd:.2f})"
+        total_earned_usd = 0
+        for order_currency, earned in earned_by_currency.items():
+            total_earned_usd += await converter.convert_currency(earned, order_currency, "USD")
+        usd_text = f" (~${total_earned_usd:.2f})"
     except:
-        earned_text = f"💰 <b>Заработано:</b> {total_earned:.0f} {currency}"
+        usd_text = ""
+    
+    if not earned_by_currency:
+        earned_text = f"💰 <b>Заработано:</b> 0 {currency}"
+    else:
+        earned_parts = ", ".join(f"{earned:.0f} {order_currency}" for order_currency, earned in earned_by_currency.items())
+        earned_text = f"💰 <b>Заработано:</b> {earned_parts}{usd_text}"
     
     await message.answer(
         f"📊 <b>Ваша статистика</b>\n\n"
@@ -10,9 +10,9 @@ from app.keyboards.admin.admin_menu import admin_menu_keyboard
 from app.database.crud import (
     add_user,
     update_user_region,
-    get_user_by_tg_id,
     get_user_by_id,
 )
+from app.utils.user import get_current_user
 from app.states.user_states import RegionStates
 from app.config import BOT_TOKEN
 
@@ -31,7 +31,7 @@ async def cmd_start(message: Message, state: FSMContext):
         except ValueError:
             referrer_id = None
 
-    user = await get_user_by_tg_id(message.from_user.id)
+    user = await get_current_user(message.from_user.id)
     if user:
         logger.info(
             f"@{message.from_user.username} (id={message.from_user.id}) повторно использовал /start"
@@ -98,7 +98,7 @@ async def choose_region(message: Message, state: FSMContext):
 
 @router.message()
 async def unknown_message(message: Message):
-    user = await get_user_by_tg_id(message.from_user.id)
+    user = await get_current_user(message.from_user.id)
     if user:
         if user.role == "admin":
             menu = admin_menu_keyboard()
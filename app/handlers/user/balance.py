@@ -1,7 +1,9 @@
 import logging
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from app.database.crud import get_user_by_tg_id, create_payment_request, get_payment_requests_by_user, get_payment_request_by_id
+from app.database.crud import create_payment_request, get_payment_request_by_id, count_payment_requests, get_payment_requests_page
+from app.utils.user import get_current_user
+from app.utils.pagination import parse_page_callback, next_page_callback, prev_page_callback
 from app.keyboards.user.balance import user_balance_keyboard
 from aiogram.fsm.context import FSMContext
 from app.utils.currency import get_currency, get_active_balance
@@ -28,10 +30,10 @@ def get_history_keyboard(requests, page, total_pages):
         ] for req in requests
     ]
     nav_buttons = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"user_history_page:{page-1}"))
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton(text="➡️ Вперёд", callback_data=f"user_history_page:{page+1}"))
+    if page > 1 and requests:
+        nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=prev_page_callback("user_history_page", page, requests)))
+    if page < total_pages and requests:
+        nav_buttons.append(InlineKeyboardButton(text="➡️ Вперёд", callback_data=next_page_callback("user_history_page", page, requests)))
     if nav_buttons:
         buttons.append(nav_buttons)
     buttons.append([InlineKeyboardButton(text="⬅️ В меню баланса", callback_data="user_balance_back")])
@@ -40,7 +42,7 @@ def get_history_keyboard(requests, page, total_pages):
 @router.message(F.text == "💰 Баланс")
 async def user_balance(message: Message):
     logger.info(f"Пользователь @{message.from_user.username or 'без username'} открыл экран Баланс")
-    user = await get_user_by_tg_id(message.from_user.id)
+    user = await get_current_user(message.from_user.id)
     if not user:
         logger.info(f"Пользователь @{message.from_user.username or 'без username'} не найден")
         await message.answer("Профиль не найден. Напишите команду /start для регистрации.")
@@ -57,7 +59,7 @@ async def user_balance(message: Message):
 @router.callback_query(F.data == "user_topup")
 async def start_topup(call: CallbackQuery, state: FSMContext):
     logger.info(f"Пользователь @{call.from_user.username or 'без username'} начал пополнение баланса")
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     
     # Получаем минимальные суммы из настроек по региону
     if user.region == "🇰🇬 КР":
@@ -129,7 +131,7 @@ async def topup_receipt(message: Message, state: FSMContext):
         await message.answer("Пожалуйста, отправьте скриншот чека (фото).", reply_markup=keyboard)
         return
     file_id = message.photo[-1].file_id
-    user = await get_user_by_tg_id(message.from_user.id)
+    user = await get_current_user(message.from_user.id)
     payment_request = await create_payment_request(
         user_id=user.id,
         region=user.region,
@@ -142,12 +144,22 @@ async def topup_receipt(message: Message, state: FSMContext):
     await state.clear()
     logger.info(f"Пользователь @{message.from_user.username or 'без username'} отправил заявку на пополнение")
 
+async def get_history_page(user, page=1, after_id=None, before_id=None):
+    """Страница истории пополнений пользователя в текущем регионе и число страниц"""
+    total = await count_payment_requests(user_id=user.id, region=user.region)
+    total_pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+    requests = await get_payment_requests_page(
+        user_id=user.id, region=user.region, limit=PAGE_SIZE, after_id=after_id, before_id=before_id
+    ) if total else []
+    return requests, total_pages
+
 @router.callback_query(F.data == "user_history")
 async def user_topup_history(call: CallbackQuery):
     logger.info(f"Пользователь @{call.from_user.username or 'без username'} открыл историю пополнений")
-    user = await get_user_by_tg_id(call.from_user.id)
-    all_requests = [req for req in await get_payment_requests_by_user(user.id) if req.region == user.region]
-    if not all_requests:
+    user = await get_current_user(call.from_user.id)
+    page = 1
+    requests, total_pages = await get_history_page(user, page)
+    if not requests:
         logger.info(f"Пользователь @{call.from_user.username or 'без username'} не имеет заявок на пополнение")
         keyboard = InlineKeyboardMarkup(
             inline_keyboard=[
@@ -157,9 +169,6 @@ async def user_topup_history(call: CallbackQuery):
         await call.message.edit_text("У вас нет заявок на пополнение в этом регионе.", reply_markup=keyboard)
         await call.answer()
         return
-    page = 1
-    total_pages = (len(all_requests) + PAGE_SIZE - 1) // PAGE_SIZE
-    requests = all_requests[(page-1)*PAGE_SIZE : page*PAGE_SIZE]
     text = "<b>История пополнений:</b>\nВыберите заявку для подробностей:"
     keyboard = get_history_keyboard(requests, page, total_pages)
     await call.message.delete()
@@ -169,12 +178,11 @@ async def user_topup_history(call: CallbackQuery):
 
 @router.callback_query(F.data.startswith("user_history_page:"))
 async def user_topup_history_page(call: CallbackQuery):
-    page = int(call.data.split(":")[1])
+    cursor = parse_page_callback(call.data, first_page=1)
+    page = cursor.page
     logger.info(f"Пользователь @{call.from_user.username or 'без username'} переключил страницу истории: {page}")
-    user = await get_user_by_tg_id(call.from_user.id)
-    all_requests = [req for req in await get_payment_requests_by_user(user.id) if req.region == user.region]
-    total_pages = (len(all_requests) + PAGE_SIZE - 1) // PAGE_SIZE
-    requests = all_requests[(page-1)*PAGE_SIZE : page*PAGE_SIZE]
+    user = await get_current_user(call.from_user.id)
+    requests, total_pages = await get_history_page(user, page, after_id=cursor.after_id, before_id=cursor.before_id)
     text = "<b>История пополнений:</b>\nВыберите заявку для подробностей:"
     keyboard = get_history_keyboard(requests, page, total_pages)
     await call.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
@@ -223,16 +231,14 @@ async def user_topup_info(call: CallbackQuery):
 @router.callback_query(F.data == "user_history_back")
 async def user_history_back(call: CallbackQuery):
     logger.info(f"Пользователь @{call.from_user.username or 'без username'} вернулся к истории пополнений")
-    user = await get_user_by_tg_id(call.from_user.id)
-    all_requests = [req for req in await get_payment_requests_by_user(user.id) if req.region == user.region]
-    if not all_requests:
+    user = await get_current_user(call.from_user.id)
+    page = 1
+    requests, total_pages = await get_history_page(user, page)
+    if not requests:
         logger.info(f"Пользователь @{call.from_user.username or 'без username'} не имеет заявок на пополнение")
         await call.message.edit_text("У вас нет заявок на пополнение в этом регионе.")
         await call.answer()
         return
-    page = 1
-    total_pages = (len(all_requests) + PAGE_SIZE - 1) // PAGE_SIZE
-    requests = all_requests[(page-1)*PAGE_SIZE : page*PAGE_SIZE]
     text = "<b>История пополнений:</b>\nВыберите заявку для подробностей:"
     keyboard = get_history_keyboard(requests, page, total_pages)
     await call.message.delete()
@@ -244,7 +250,7 @@ async def user_history_back(call: CallbackQuery):
 async def user_balance_back(call: CallbackQuery, state: FSMContext):
     await state.clear()
     logger.info(f"Пользователь @{call.from_user.username or 'без username'} вернулся в меню баланса")
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     balance, bonus, currency = get_active_balance(user)
     text = (
         f"{user.region} Кошелёк\n\n"
@@ -1,7 +1,9 @@
 from aiogram import Router, F
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
-from app.database.crud import check_and_activate_promo, get_user_by_tg_id, delete_expired_promocodes
-from app.utils.referral import get_referral_link, get_referrals_count
+from app.database.crud import check_and_activate_promo, delete_expired_promocodes
+from app.utils.user import get_current_user
+from app.utils.referral import get_referral_link, get_referrals_count, get_recent_referrals
+from app.database.crud import get_referral_bonus_summary
 from app.database.models import BonusHistory
 from app.database.db import AsyncSessionLocal
 from sqlalchemy.future import select
@@ -17,7 +19,8 @@ BONUS_PAGE_SIZE = 10
 logger = logging.getLogger(__name__)
 
 async def get_bonuses_text_and_keyboard(user):
-    referrals = await get_referrals_count(user.id)
+    referrals_count = await get_referrals_count(user.id)
+    referrals = await get_recent_referrals(user.id)
     ref_link = get_referral_link(user)
 
     # Суммируем бонусы
@@ -44,14 +47,7 @@ async def get_bonuses_text_and_keyboard(user):
         )
         history = result.scalars().all()
 
-        result_all = await session.execute(
-            select(BonusHistory)
-            .where(BonusHistory.user_id == user.id, BonusHistory.source == "Реферал")
-        )
-        all_ref_bonuses = result_all.scalars().all()
-        total_ref_bonus = sum(b.amount for b in all_ref_bonuses)
-        referrals_with_bonus = [b.comment for b in all_ref_bonuses if b.comment]
-        referrals_with_topup = len(referrals_with_bonus)
+    total_ref_bonus, referrals_with_topup = await get_referral_bonus_summary(user.id)
 
     # История бонусов (оформление)
     history_text = ""
@@ -64,6 +60,8 @@ async def get_bonuses_text_and_keyboard(user):
     # Подробная статистика по рефералам
     if referrals:
         referrals_text = "\n\n<b>Ваши приглашённые:</b>"
+        if referrals_count > len(referrals):
+            referrals_text += f" <i>(последние {len(referrals)} из {referrals_count})</i>"
         for r in referrals:
             reg_date = r.created_at.strftime('%d.%m.%Y')
             username = f"@{r.username}" if r.username else f"<a href='tg://user?id={r.tg_id}'>Пользователь</a>"
@@ -76,7 +74,7 @@ async def get_bonuses_text_and_keyboard(user):
         f"Бонусный баланс: <b>{bonus:.2f} {currency}</b>\n"
         f"Всего заработано бонусов за рефералов: <b>{total_ref_bonus:.2f} {currency}</b>\n"
         f"Рефералов с пополнением: <b>{referrals_with_topup}</b>\n"
-        f"Пригласито друзей: <b>{len(referrals)}</b>\n"
+        f"Пригласито друзей: <b>{referrals_count}</b>\n"
         f"Ваша реферальная ссылка:\n<code>{ref_link}</code>"
         f"\n\n👥 <i>Пригласите друга по ссылке и получите бонус за его первое пополнение!</i>"
         f"{referrals_text}"
@@ -101,7 +99,7 @@ async def get_bonuses_text_and_keyboard(user):
 @router.message(F.text == "🎁 Бонусы и рефералы")
 async def bonuses_and_referrals(message: Message):
     logger.info(f"Пользователь @{message.from_user.username} открыл меню бонусов и рефералов")
-    user = await get_user_by_tg_id(message.from_user.id)
+    user = await get_current_user(message.from_user.id)
     if not user:
         await message.answer("Профиль не найден. Напишите /start для регистрации.")
         return
@@ -111,7 +109,7 @@ async def bonuses_and_referrals(message: Message):
 @router.callback_query(F.data == "show_bonus_history")
 async def show_bonus_history(call: CallbackQuery):
     logger.info(f"Пользователь @{call.from_user.username} открыл всю историю бонусов")
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not user:
         await call.message.answer("Профиль не найден. Напишите /start для регистрации.")
         return
@@ -155,7 +153,7 @@ async def back_to_bonuses(call: CallbackQuery):
     except Exception:
         pass
 
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not user:
         await call.message.answer("Профиль не найден. Напишите /start для регистрации.")
         return
@@ -189,7 +187,7 @@ def filter_keyboard(current_filter, page, total_count):
 @router.callback_query(F.data.startswith("bonus_history"))
 async def bonus_history_paginated(call: CallbackQuery):
     logger.info(f"Пользователь @{call.from_user.username} листает историю бонусов: фильтр {call.data}")
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not user:
         await call.message.answer("Профиль не найден. Напишите /start для регистрации.")
         return
@@ -260,7 +258,7 @@ async def process_promo_code(message: Message, state: FSMContext):
     await delete_expired_promocodes()
 
     code = message.text.strip().upper()
-    user = await get_user_by_tg_id(message.from_user.id)
+    user = await get_current_user(message.from_user.id)
     if not user:
         await message.answer("Профиль не найден. Напишите /start для регистрации.")
         await state.clear()
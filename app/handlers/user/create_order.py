@@ -9,7 +9,9 @@ from app.keyboards.user.order_keyboards import (
     edit_order_keyboard
 )
 from app.config import MAIN_RANKS, RANK_GRADATIONS, RANKS
-from app.database.crud import get_user_by_tg_id, create_order, get_user_by_id, get_users_by_role, update_user_balance_by_region, apply_user_discount, use_user_bonus
+from app.database.crud import get_user_by_id, checkout_order
+from app.utils.user import get_current_user
+from app.utils.notifications import notify_admins, with_retry
 from app.utils.price_calculator import (
     calculate_regular_rank_cost, calculate_mythic_cost, calculate_total_order_cost
 )
@@ -208,7 +210,7 @@ async def start_order_creation(message: Message, state: FSMContext):
     """Начало создания заказа"""
     logger.info(f"Пользователь @{message.from_user.username} начал создание заказа")
     
-    user = await get_user_by_tg_id(message.from_user.id)
+    user = await get_current_user(message.from_user.id)
     if not user:
         await message.answer("Профиль не найден. Напишите /start для регистрации.")
         return
@@ -1275,70 +1277,39 @@ async def confirm_payment(call: CallbackQuery, state: FSMContext, bot: Bot):
         await call.answer("Пользователь не найден", show_alert=True)
         return
     
-    try:
-        # Обрабатываем скидку если есть
-        if discount_percent > 0:
-            await apply_user_discount(user_id)
-        
-        # Обрабатываем оплату в зависимости от метода
-        if payment_method == "balance":
-            # Полная оплата с баланса
-            balance_field = get_balance_field_from_region(region)
-            await update_user_balance_by_region(user_id, balance_field, -final_cost)
-            payment_desc = f"Оплачено с баланса: {final_cost:.0f} {currency}"
-            
-        elif payment_method == "bonus":
-            # Полная оплата бонусами
-            success, message = await use_user_bonus(user_id, final_cost, currency)
-            if not success:
-                await call.answer(f"Ошибка оплаты: {message}", show_alert=True)
-                return
-            payment_desc = f"Оплачено бонусами: {final_cost:.0f} {currency}"
-            
-        elif payment_method == "mixed":
-            # Смешанная оплата
-            bonus_amount = data.get("bonus_amount", 0)
-            balance_amount = data.get("balance_amount", 0)
-            
-            # Списываем бонусы
-            success, message = await use_user_bonus(user_id, bonus_amount, currency)
-            if not success:
-                await call.answer(f"Ошибка списания бонусов: {message}", show_alert=True)
-                return
-            
-            # Списываем с баланса
-            balance_field = get_balance_field_from_region(region)
-            await update_user_balance_by_region(user_id, balance_field, -balance_amount)
+    # Суммы списания в зависимости от метода
+    if payment_method == "balance":
+        # Полная оплата с баланса
+        bonus_amount, balance_amount = 0, final_cost
+        payment_desc = f"Оплачено с баланса: {final_cost:.0f} {currency}"
+    elif payment_method == "bonus":
+        # Полная оплата бонусами
+        bonus_amount, balance_amount = final_cost, 0
+        payment_desc = f"Оплачено бонусами: {final_cost:.0f} {currency}"
+    elif payment_method in ("mixed", "partial_bonus"):
+        # Смешанная или частичная оплата бонусами
+        bonus_amount = data.get("bonus_amount", 0)
+        balance_amount = data.get("balance_amount", 0)
+        if bonus_amount > 0 and balance_amount > 0:
             payment_desc = f"Оплачено: {bonus_amount:.0f} {currency} бонусами + {balance_amount:.0f} {currency} с баланса"
-            
-        elif payment_method == "partial_bonus":
-            # Частичная оплата бонусами
-            bonus_amount = data.get("bonus_amount", 0)
-            balance_amount = data.get("balance_amount", 0)
-            
-            if bonus_amount > 0:
-                success, message = await use_user_bonus(user_id, bonus_amount, currency)
-                if not success:
-                    await call.answer(f"Ошибка списания бонусов: {message}", show_alert=True)
-                    return
-            
-            if balance_amount > 0:
-                balance_field = get_balance_field_from_region(region)
-                await update_user_balance_by_region(user_id, balance_field, -balance_amount)
-            
-            if bonus_amount > 0 and balance_amount > 0:
-                payment_desc = f"Оплачено: {bonus_amount:.0f} {currency} бонусами + {balance_amount:.0f} {currency} с баланса"
-            elif bonus_amount > 0:
-                payment_desc = f"Оплачено бонусами: {bonus_amount:.0f} {currency}"
-            else:
-                payment_desc = f"Оплачено с баланса: {balance_amount:.0f} {currency}"
-        
+        elif bonus_amount > 0:
+            payment_desc = f"Оплачено бонусами: {bonus_amount:.0f} {currency}"
+        else:
+            payment_desc = f"Оплачено с баланса: {balance_amount:.0f} {currency}"
+    else:
+        await call.answer("Неизвестный способ оплаты", show_alert=True)
+        return
+    
+    # Токен оформления выдается при выборе способа оплаты; повторное нажатие не создаст второй заказ
+    checkout_token = data.get("checkout_token") or uuid.uuid4().hex
+    
+    try:
         # Подготавливаем данные для создания заказа
         order_data = {
-            "order_id": str(uuid.uuid4())[:8].upper(),
             "user_id": user_id,
             "service_type": data.get("service_type"),
             "boost_type": data.get("boost_type"),
+            "region": region,
             "current_rank": data.get("current_rank"),
             "target_rank": data.get("target_rank"),
             "current_mythic_stars": data.get("current_mythic_stars"),
@@ -1352,18 +1323,27 @@ async def confirm_payment(call: CallbackQuery, state: FSMContext, bot: Bot):
             "game_password": data.get("game_password"),
             "preferred_time": data.get("preferred_time"),
             "contact_info": data.get("contact_info"),
-            "account_data": data.get("account_data"),
             "details": data.get("details"),
             "total_cost": final_cost,
             "currency": currency,
-            "status": "pending"
         }
         
-        # Сохраняем заказ в базу
-        order = await create_order(order_data)
+        # Скидка, бонусы, баланс и заказ — одна транзакция
+        order, created, error_message = await checkout_order(
+            checkout_token, order_data, get_balance_field_from_region(region),
+            balance_amount=balance_amount, bonus_amount=bonus_amount, reset_discount=discount_percent > 0
+        )
         
         if not order:
-            raise Exception("Не удалось создать заказ в базе данных")
+            await call.answer(f"Ошибка оплаты: {error_message}", show_alert=True)
+            return
+        
+        if not created:
+            # Повторное подтверждение того же оформления
+            logger.info(f"Повторное подтверждение оплаты заказа {order.order_id} пользователем @{call.from_user.username}")
+            await state.clear()
+            await call.answer("Заказ уже создан!")
+            return
         
         # Отправляем уведомление админу
         await send_admin_notification(bot, order, user)
@@ -1391,23 +1371,13 @@ async def confirm_payment(call: CallbackQuery, state: FSMContext, bot: Bot):
         logger.info(f"Заказ {order.order_id} создан пользователем @{call.from_user.username} с оплатой {payment_method}")
         
     except Exception as e:
-        logger.error(f"Ошибка создания заказа: {e}")
-        
-        # Пытаемся вернуть средства при ошибке
-        try:
-            if payment_method == "balance":
-                balance_field = get_balance_field_from_region(region)
-                await update_user_balance_by_region(user_id, balance_field, final_cost)
-            elif payment_method in ["bonus", "mixed", "partial_bonus"]:
-                # Для бонусов возврат сложнее, но можно добавить логику восстановления
-                pass
-        except Exception as refund_error:
-            logger.error(f"Ошибка возврата средств: {refund_error}")
+        # Заказ уже сохранен и оплачен, ошибка возникла при уведомлениях
+        logger.error(f"Ошибка после создания заказа: {e}")
         
         await call.message.edit_text(
-            "❌ <b>Ошибка создания заказа</b>\n\n"
-            "Попробуйте позже или обратитесь к администратору.\n"
-            "При ошибке оплаты средства будут возвращены.",
+            "✅ <b>Заказ создан</b>\n\n"
+            "Не удалось показать подробности.\n"
+            "📦 Посмотреть заказ можно в разделе «Мои заказы»",
             parse_mode="HTML"
         )
     
@@ -1424,14 +1394,7 @@ async def confirm_order(call: CallbackQuery, state: FSMContext):
     await choose_payment_method(call, state)
 
 async def send_admin_notification(bot: Bot, order, user):
-    """Отправка уведомления админу о новом заказе"""
-    
-    # Получаем всех админов из базы данных
-    admins = await get_users_by_role("admin")
-    
-    if not admins:
-        logger.warning("Не найдено ни одного администратора в базе данных")
-        return
+    """Отправка уведомления админам о новом заказе (в фоне, без ожидания доставки)"""
     
     # Формируем текст уведомления
     service_names = {
@@ -1493,22 +1456,17 @@ async def send_admin_notification(bot: Bot, order, user):
     from app.keyboards.admin.order_management import admin_order_notification_keyboard
     admin_keyboard = admin_order_notification_keyboard(order.order_id)
     
-    # Отправляем всем админам из базы данных
-    sent_count = 0
-    for admin in admins:
-        try:
-            await bot.send_message(
-                chat_id=admin.tg_id,
-                text=text,
-                parse_mode="HTML",
-                reply_markup=admin_keyboard
-            )
-            logger.info(f"Уведомление о заказе {order.order_id} отправлено админу @{admin.username} ({admin.tg_id})")
-            sent_count += 1
-        except Exception as e:
-            logger.error(f"Ошибка отправки уведомления админу @{admin.username} ({admin.tg_id}): {e}")
+    async def send(admin_id):
+        await with_retry(
+            bot.send_message,
+            chat_id=admin_id,
+            text=text,
+            parse_mode="HTML",
+            reply_markup=admin_keyboard
+        )
     
-    logger.info(f"Уведомление о заказе {order.order_id} отправлено {sent_count} из {len(admins)} админов")
+    # Отправляем всем админам параллельно, клиент получает ответ сразу
+    notify_admins(send, f"новый заказ {order.order_id}")
 
 # Добавляем обработчики кнопок "Назад"
 @router.callback_query(F.data == "back_to_catalog")
@@ -1,7 +1,9 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from app.database.crud import get_user_by_tg_id, get_user_orders, get_orders_count, get_order_by_id
+from app.database.crud import get_user_orders, get_orders_count, get_order_by_id
+from app.utils.user import get_current_user
 from app.config import PAGE_SIZE
+from app.utils.pagination import parse_page_callback, next_page_callback, prev_page_callback
 import logging
 
 router = Router()
@@ -12,7 +14,7 @@ async def show_my_orders(message: Message):
     """Показать заказы пользователя"""
     logger.info(f"Пользователь @{message.from_user.username} открыл свои заказы")
     
-    user = await get_user_by_tg_id(message.from_user.id)
+    user = await get_current_user(message.from_user.id)
     if not user:
         await message.answer("Профиль не найден. Напишите /start для регистрации.")
         return
@@ -53,7 +55,7 @@ async def show_order_detail(call: CallbackQuery):
         return
     
     # Проверяем, что заказ принадлежит пользователю
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not user or order.user_id != user.id:
         await call.answer("Доступ запрещен!", show_alert=True)
         return
@@ -74,7 +76,7 @@ async def back_to_orders(call: CallbackQuery):
     """Возврат к списку заказов"""
     logger.info(f"Пользователь @{call.from_user.username} вернулся к списку заказов")
     
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not user:
         await call.answer("Профиль не найден!", show_alert=True)
         return
@@ -99,14 +101,15 @@ async def back_to_orders(call: CallbackQuery):
 @router.callback_query(F.data.startswith("orders_page:"))
 async def orders_pagination(call: CallbackQuery):
     """Пагинация заказов"""
-    page = int(call.data.split(":")[1])
+    cursor = parse_page_callback(call.data)
+    page = cursor.page
     
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     if not user:
         await call.answer("Профиль не найден!", show_alert=True)
         return
     
-    orders = await get_user_orders(user.id, limit=PAGE_SIZE, offset=page * PAGE_SIZE)
+    orders = await get_user_orders(user.id, limit=PAGE_SIZE, after_id=cursor.after_id, before_id=cursor.before_id)
     total_orders = await get_orders_count(user.id)
     
     text = f"📦 <b>Ваши заказы</b> ({total_orders})\n\n"
@@ -159,11 +162,11 @@ def create_orders_keyboard(orders, page: int, total_orders: int):
     
     # Пагинация
     nav_buttons = []
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=f"orders_page:{page-1}"))
+    if page > 0 and orders:
+        nav_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=prev_page_callback("orders_page", page, orders)))
     
-    if (page + 1) * PAGE_SIZE < total_orders:
-        nav_buttons.append(InlineKeyboardButton(text="➡️", callback_data=f"orders_page:{page+1}"))
+    if orders and (page + 1) * PAGE_SIZE < total_orders:
+        nav_buttons.append(InlineKeyboardButton(text="➡️", callback_data=next_page_callback("orders_page", page, orders)))
     
     if nav_buttons:
         keyboard.append(nav_buttons)
@@ -12,6 +12,7 @@ from app.database.crud import (
     get_user_bonus_balance, use_user_bonus
 )
 import logging
+import uuid
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -81,8 +82,9 @@ async def choose_payment_method(call: CallbackQuery, state: FSMContext):
     user_balance = get_user_balance_by_region(user, region)
     bonus_balance = await get_user_bonus_balance(user_id, currency)
     
-    # Сохраняем данные об оплате
+    # Сохраняем данные об оплате; токен оформления общий для всех повторных подтверждений
     await state.update_data(
+        checkout_token=data.get("checkout_token") or uuid.uuid4().hex,
         final_cost=final_cost,
         original_cost=base_cost,
         currency=currency,
@@ -3,6 +3,7 @@ from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from app.database.crud import get_user_by_tg_id, update_user_region
+from app.utils.user import get_current_user
 from app.keyboards.user.profile import user_profile_keyboard
 from app.utils.currency import get_active_balance
 from app.states.user_states import RegionStates
@@ -39,7 +40,7 @@ async def get_profile_text(user, balance, bonus, currency):
         f"Баланс: {balance:.2f} {currency}\n"
         f"Бонусный баланс: {bonus:.2f} {currency}\n"
         f"Дата регистрации: {reg_date.strftime('%d.%m.%Y %H:%M') if reg_date else '—'}"
-        f"\n👥 Приглашено друзей: {len(referrals)}"
+        f"\n👥 Приглашено друзей: {referrals}"
         f"\n🔗 Ваша ссылка: {ref_link}"
     )
 
@@ -47,7 +48,7 @@ async def get_profile_text(user, balance, bonus, currency):
 @router.message(F.text == "👤 Профиль")
 async def user_profile(message: Message):
     logger.info(f"Пользователь @{message.from_user.username} открыл профиль")
-    user = await get_user_by_tg_id(message.from_user.id)
+    user = await get_current_user(message.from_user.id)
     if not user:
         logger.warning(f"Профиль не найден для пользователя {message.from_user.id}")
         await message.answer("Профиль не найден. Напишите команду /start для регистрации." )
@@ -77,7 +78,7 @@ async def user_change_region(call: CallbackQuery, state: FSMContext):
 async def set_user_region(call: CallbackQuery, state: FSMContext):
     """Устанавливает новый регион (балансы не конвертируются, у каждого региона свой счет)."""
     new_region = call.data.split(":", 1)[1]
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     old_region = user.region
     logger.info(f"Пользователь @{call.from_user.username} меняет регион с {old_region} на {new_region}")
     if old_region == new_region:
@@ -103,7 +104,7 @@ async def set_user_region(call: CallbackQuery, state: FSMContext):
 async def profile_cancel(call: CallbackQuery, state: FSMContext):
     """Отмена смены региона — возврат к профилю."""
     logger.info(f"Пользователь @{call.from_user.username} отменил смену региона")
-    user = await get_user_by_tg_id(call.from_user.id)
+    user = await get_current_user(call.from_user.id)
     balance, bonus, currency = get_active_balance(user)
     text = await get_profile_text(user, balance, bonus, currency)
     await call.message.edit_text(text, parse_mode="HTML", reply_markup=user_profile_keyboard())
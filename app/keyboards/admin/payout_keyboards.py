@@ -1,6 +1,18 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from app.utils.pagination import next_page_callback, prev_page_callback
 
-def get_admin_payout_list_keyboard(requests):
+def payout_pagination_row(prefix, requests, page, per_page, total_count):
+    """Кнопки листания списка выплат с курсорами по id крайних запросов страницы"""
+    row = []
+    if not requests:
+        return row
+    if page > 0:
+        row.append(InlineKeyboardButton(text="◀️", callback_data=prev_page_callback(prefix, page, requests)))
+    if total_count is not None and (page + 1) * per_page < total_count:
+        row.append(InlineKeyboardButton(text="▶️", callback_data=next_page_callback(prefix, page, requests)))
+    return row
+
+def get_admin_payout_list_keyboard(requests, page=0, per_page=10, total_count=None):
     """Клавиатура для списка запросов на выплату"""
     keyboard = []
     
@@ -13,6 +25,10 @@ def get_admin_payout_list_keyboard(requests):
             )
         ])
     
+    pagination_row = payout_pagination_row("admin_payout_page", requests, page, per_page, total_count)
+    if pagination_row:
+        keyboard.append(pagination_row)
+    
     # Кнопки управления
     keyboard.extend([
         [
@@ -45,9 +61,10 @@ def get_admin_payout_detail_keyboard(request_id, status):
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def get_admin_payout_history_keyboard():
+def get_admin_payout_history_keyboard(requests=None, page=0, per_page=20, total_count=None):
     """Клавиатура для истории выплат"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+    pagination_row = payout_pagination_row("admin_payout_history_page", requests, page, per_page, total_count)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=([pagination_row] if pagination_row else []) + [
         [
             InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_payout_history"),
             InlineKeyboardButton(text="📋 Текущие", callback_data="admin_payout_requests")
@@ -1,4 +1,5 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from app.utils.pagination import next_page_callback, prev_page_callback
 
 def promo_type_keyboard():
     return InlineKeyboardMarkup(
@@ -67,11 +68,11 @@ def promo_list_keyboard(promos, page, total_pages):
         for p in promos
     ]
     nav_buttons = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=f"promo_page:{page-1}"))
+    if page > 1 and promos:
+        nav_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=prev_page_callback("promo_page", page, promos)))
     nav_buttons.append(InlineKeyboardButton(text=f"{page}/{total_pages}", callback_data="promo_page:cur"))
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton(text="➡️", callback_data=f"promo_page:{page+1}"))
+    if page < total_pages and promos:
+        nav_buttons.append(InlineKeyboardButton(text="➡️", callback_data=next_page_callback("promo_page", page, promos)))
     if nav_buttons:
         keyboard.append(nav_buttons)
     keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="promo_menu")])
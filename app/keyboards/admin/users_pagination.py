@@ -1,4 +1,5 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from app.utils.pagination import next_page_callback, prev_page_callback
 
 def users_pagination_keyboard(users, page: int, total_pages: int):
     keyboard = []
@@ -6,11 +7,11 @@ def users_pagination_keyboard(users, page: int, total_pages: int):
         btn_text = f"{'@' + user.username if user.username else 'Без username'} | {user.region or '—'} | {user.role}"
         keyboard.append([InlineKeyboardButton(text=btn_text, callback_data=f"user_info:{user.tg_id}")])
     nav_buttons = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"users_page:{page-1}"))
+    if page > 1 and users:
+        nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=prev_page_callback("users_page", page, users)))
     nav_buttons.append(InlineKeyboardButton(text="🔍 Поиск", callback_data="users_search"))
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton(text="Вперёд ➡️", callback_data=f"users_page:{page+1}"))
+    if page < total_pages and users:
+        nav_buttons.append(InlineKeyboardButton(text="Вперёд ➡️", callback_data=next_page_callback("users_page", page, users)))
     keyboard.append(nav_buttons)
     keyboard.append([InlineKeyboardButton(text="📢 Рассылка всем", callback_data="users_broadcast")])
     keyboard.append([InlineKeyboardButton(text="📢 Рассылка бустерам", callback_data="boosters_broadcast")])
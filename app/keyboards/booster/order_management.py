@@ -1,7 +1,11 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from app.utils.pagination import next_page_callback, prev_page_callback
 
-def my_orders_list_keyboard(orders, show_active_only=True, page=0, per_page=5):
-    """Клавиатура со списком заказов бустера с фильтрацией и пагинацией"""
+def my_orders_list_keyboard(orders, show_active_only=True, page=0, per_page=5, total_count=None):
+    """Клавиатура со списком заказов бустера с фильтрацией и пагинацией.
+    
+    orders — уже выбранная из БД страница, total_count — число заказов в фильтре.
+    """
     keyboard = []
     
     # Группируем заказы по статусам
@@ -12,19 +16,11 @@ def my_orders_list_keyboard(orders, show_active_only=True, page=0, per_page=5):
         "completed": "✅"
     }
     
-    # Фильтруем заказы
-    if show_active_only:
-        filtered_orders = [o for o in orders if o.status in ["confirmed", "in_progress", "pending_review"]]
-    else:
-        filtered_orders = orders
-    
-    # Пагинация
-    start_idx = page * per_page
-    end_idx = start_idx + per_page
-    page_orders = filtered_orders[start_idx:end_idx]
+    if total_count is None:
+        total_count = len(orders)
     
     # Добавляем заказы
-    for order in page_orders:
+    for order in orders:
         status_emoji = status_groups.get(order.status, "❓")
         service_name = {
             "regular_boost": "Обычный буст",
@@ -42,25 +38,25 @@ def my_orders_list_keyboard(orders, show_active_only=True, page=0, per_page=5):
     # Кнопки навигации
     nav_buttons = []
     
-    # Кнопки пагинации
-    if len(filtered_orders) > per_page:
+    # Кнопки пагинации: курсор — id первого/последнего заказа на странице
+    if total_count > per_page and orders:
         pagination_row = []
         
         # Кнопка "назад"
         if page > 0:
             pagination_row.append(
-                InlineKeyboardButton(text="⬅️", callback_data=f"booster_orders_page:{show_active_only}:{page-1}")
+                InlineKeyboardButton(text="⬅️", callback_data=prev_page_callback("booster_orders_page", page, orders, show_active_only))
             )
         
         # Индикатор страницы
         pagination_row.append(
-            InlineKeyboardButton(text=f"{page+1}/{(len(filtered_orders)-1)//per_page + 1}", callback_data="noop")
+            InlineKeyboardButton(text=f"{page+1}/{(total_count-1)//per_page + 1}", callback_data="noop")
         )
         
         # Кнопка "вперед"
-        if end_idx < len(filtered_orders):
+        if (page + 1) * per_page < total_count:
             pagination_row.append(
-                InlineKeyboardButton(text="➡️", callback_data=f"booster_orders_page:{show_active_only}:{page+1}")
+                InlineKeyboardButton(text="➡️", callback_data=next_page_callback("booster_orders_page", page, orders, show_active_only))
             )
         
         if pagination_row:
@@ -1,6 +1,10 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from app.utils.pagination import next_page_callback, prev_page_callback
 from app.utils.currency import get_currency_info
 
+# Запросов выплат на одной странице списка
+PAYOUT_REQUESTS_PER_PAGE = 5
+
 def get_payout_currency_keyboard():
     """Клавиатура выбора валюты для выплаты"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -67,17 +71,17 @@ def get_back_to_balance_keyboard():
     ])
     return keyboard
 
-def get_payout_requests_list_keyboard(requests, page=0, per_page=5):
-    """Клавиатура со списком запросов выплат с пагинацией"""
-    buttons = []
+def get_payout_requests_list_keyboard(requests, page=0, per_page=PAYOUT_REQUESTS_PER_PAGE, total_count=None):
+    """Клавиатура со списком запросов выплат с пагинацией.
     
-    # Вычисляем диапазон для текущей страницы
-    start_idx = page * per_page
-    end_idx = start_idx + per_page
-    page_requests = requests[start_idx:end_idx]
+    requests — уже выбранная из БД страница, total_count — общее число запросов.
+    """
+    buttons = []
+    if total_count is None:
+        total_count = len(requests)
     
     # Добавляем кнопки для запросов на текущей странице
-    for req in page_requests:
+    for req in requests:
         status_emoji = {
             "pending": "⏳",
             "approved": "✅", 
@@ -96,20 +100,20 @@ def get_payout_requests_list_keyboard(requests, page=0, per_page=5):
     
     # Пагинация
     pagination_row = []
-    total_pages = (len(requests) + per_page - 1) // per_page
+    total_pages = max(1, (total_count + per_page - 1) // per_page)
     
-    if page > 0:
+    if page > 0 and requests:
         pagination_row.append(
-            InlineKeyboardButton(text="◀️", callback_data=f"payout_requests_page_{page-1}")
+            InlineKeyboardButton(text="◀️", callback_data=prev_page_callback("payout_requests_page", page, requests))
         )
     
     pagination_row.append(
         InlineKeyboardButton(text=f"{page+1}/{total_pages}", callback_data="noop")
     )
     
-    if page < total_pages - 1:
+    if page < total_pages - 1 and requests:
         pagination_row.append(
-            InlineKeyboardButton(text="▶️", callback_data=f"payout_requests_page_{page+1}")
+            InlineKeyboardButton(text="▶️", callback_data=next_page_callback("payout_requests_page", page, requests))
         )
     
     if pagination_row:
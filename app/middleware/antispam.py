@@ -1,19 +1,15 @@
-import time
 from aiogram import BaseMiddleware
 from aiogram.types import Message
+from app.utils.shared_state import get_shared_state
 
 class AntiSpamMiddleware(BaseMiddleware):
     def __init__(self, rate_limit: float = 1.0):
         super().__init__()
         self.rate_limit = rate_limit
-        self.last_message = {}
 
     async def __call__(self, handler, event: Message, data):
-        user_id = event.from_user.id
-        now = time.time()
-        last = self.last_message.get(user_id, 0)
-        if now - last < self.rate_limit:
+        # Метка общая для всех процессов бота и сама истекает через rate_limit
+        if not await get_shared_state().claim(f"antispam:{event.from_user.id}", self.rate_limit):
             await event.answer("⏳ Не спамьте! Подождите немного.")
             return
-        self.last_message[user_id] = now
-        return await handler(event, data)
\ No newline at end of file
+        return await handler(event, data)
@@ -1,12 +1,32 @@
 import logging
 from aiogram import BaseMiddleware
-from app.database.crud import update_user_username
+from app.database.crud import get_user_by_tg_id, update_user_username, set_users_bot_blocked
+from app.utils.user import set_current_user, reset_current_user
 
 logger = logging.getLogger(__name__)
 
 class UserUpdateMiddleware(BaseMiddleware):
+    """Загружает пользователя один раз на апдейт и кладет его в data["db_user"]"""
+    
     async def __call__(self, handler, event, data):
-        user = event.from_user
-        if user:
-            await update_user_username(user.id, user.username or "")
-        return await handler(event, data)
\ No newline at end of file
+        tg_user = event.from_user
+        if not tg_user:
+            return await handler(event, data)
+        
+        user = await get_user_by_tg_id(tg_user.id)
+        username = tg_user.username or ""
+        # Пишем в БД только если username действительно изменился
+        if user and user.username != username:
+            await update_user_username(tg_user.id, username)
+            user.username = username
+        # Пользователь снова пишет боту — значит разблокировал, возвращаем его в рассылки
+        if user and user.bot_blocked:
+            await set_users_bot_blocked([tg_user.id], blocked=False)
+            user.bot_blocked = False
+        
+        data["db_user"] = user
+        token = set_current_user(tg_user.id, user)
+        try:
+            return await handler(event, data)
+        finally:
+            reset_current_user(token)
@@ -1,14 +1,38 @@
-import shutil
+import asyncio
+import os
+import sqlite3
 import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from aiogram import Bot
 from aiogram.types.input_file import FSInputFile
-from app.config import DB_PATH, BACKUP_PATH
+from app.config import BACKUP_PATH
+from app.database.db import get_sqlite_path
 from app.utils.settings import SettingsManager
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _copy_database(db_path: str):
+    # sqlite3.connect создал бы пустую базу на месте отсутствующей и молча забэкапил ее
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Файл базы данных из DATABASE_URL не найден: {db_path}")
+    # В режиме WAL часть данных лежит в -wal файле, поэтому копируем через backup API SQLite
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(BACKUP_PATH)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
 
 async def send_db_backup(bot: Bot):
-    # Копируем базу, чтобы не было блокировки
-    shutil.copy(DB_PATH, BACKUP_PATH)
+    db_path = get_sqlite_path()
+    if db_path is None:
+        # Серверные СУБД бэкапятся своими средствами (pg_dump и т.п.)
+        logger.info("Бэкап файлом пропущен: база данных не файл SQLite")
+        return
+    # Копируем базу в отдельном потоке, чтобы не блокировать бота
+    await asyncio.to_thread(_copy_database, db_path)
     input_file = FSInputFile(BACKUP_PATH)
     now = datetime.datetime.now().strftime("%d.%m.%Y %H:%M")
     caption = f"Автоматический бэкап базы данных\nДата: {now}"
@@ -17,10 +41,13 @@ async def send_db_backup(bot: Bot):
     group_id = await SettingsManager.get_setting("GROUP_ID")
     await bot.send_document(chat_id=group_id, document=input_file, caption=caption)
 
-async def setup_backup_scheduler(bot: Bot):
+async def setup_backup_scheduler(bot: Bot, backup: bool = True):
     scheduler = AsyncIOScheduler()
     
-    # Получаем час для бэкапа из настроек
-    backup_hour = await SettingsManager.get_setting("BACKUP_HOUR")
-    scheduler.add_job(send_db_backup, "cron", hour=backup_hour, args=[bot])
-    scheduler.start()
\ No newline at end of file
+    # В режиме нескольких процессов бэкап отправляет только основной
+    if backup:
+        # Получаем час для бэкапа из настроек
+        backup_hour = await SettingsManager.get_setting("BACKUP_HOUR")
+        scheduler.add_job(send_db_backup, "cron", hour=backup_hour, args=[bot])
+    scheduler.start()
+    return scheduler
\ No newline at end of file
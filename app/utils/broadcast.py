@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from app.config import (
+    BROADCAST_CHUNK_SIZE,
+    BROADCAST_CONCURRENCY,
+    BROADCAST_POLL_INTERVAL,
+    BROADCAST_PROGRESS_INTERVAL,
+    BROADCAST_RATE
+)
+from app.utils.shared_state import get_shared_state
+from app.database.crud import (
+    get_broadcast,
+    get_broadcast_recipients,
+    get_running_broadcasts,
+    save_broadcast_progress,
+    set_users_bot_blocked
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_SEND_ATTEMPTS = 3
+
+DELIVERED = "delivered"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+class TokenBucket:
+    """Ограничитель частоты: в среднем rate запросов в секунду, всплеск до capacity"""
+
+    def __init__(self, rate: float, capacity: float = None, name: str = None):
+        self.rate = rate
+        self.name = name  # Если задано, лимит общий для всех процессов бота
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Telegram ответил RetryAfter: останавливаем все отправки на seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._updated = self._paused_until
+        self._tokens = 0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+            if self.name:
+                await get_shared_state().throttle(self.name, self.rate)
+
+# Общий лимит бота: одновременные рассылки делят его между собой
+telegram_limiter = TokenBucket(BROADCAST_RATE, name="telegram")
+
+_tasks: Dict[int, asyncio.Task] = {}
+_owner = True  # В режиме нескольких процессов рассылки ведет только основной
+
+def start_broadcast(bot: Bot, broadcast_id: int) -> Optional[asyncio.Task]:
+    """Запускает рассылку фоновой задачей, хендлер админа не ждет ее окончания.
+
+    В воркере, который не ведет рассылки, ничего не делает: рассылка уже
+    записана в БД со статусом running, и ее подхватит основной процесс.
+    """
+    if not _owner:
+        return None
+    task = _tasks.get(broadcast_id)
+    if task and not task.done():
+        return task
+    task = asyncio.create_task(_run_broadcast(bot, broadcast_id), name=f"broadcast-{broadcast_id}")
+    _tasks[broadcast_id] = task
+    task.add_done_callback(lambda _: _tasks.pop(broadcast_id, None))
+    return task
+
+async def resume_broadcasts(bot: Bot) -> None:
+    """Запускает рассылки в статусе running, которые этот процесс еще не ведет:
+    прерванные перезапуском (с сохраненного чекпоинта) и созданные другими воркерами"""
+    for broadcast in await get_running_broadcasts():
+        task = _tasks.get(broadcast.id)
+        if task and not task.done():
+            continue
+        logger.info(f"[BROADCAST] Продолжаем рассылку {broadcast.id} после users.id={broadcast.last_user_id}")
+        start_broadcast(bot, broadcast.id)
+
+async def setup_broadcasts(scheduler, bot: Bot, owner: bool = True) -> None:
+    """Делает процесс владельцем рассылок: продолжает прерванные (в том числе
+    после перезапуска этого процесса) и подхватывает созданные другими воркерами"""
+    global _owner
+    _owner = owner
+    if not owner:
+        return
+    await resume_broadcasts(bot)
+    scheduler.add_job(
+        resume_broadcasts,
+        "interval",
+        seconds=BROADCAST_POLL_INTERVAL,
+        args=[bot],
+        id="broadcast_resume",
+        replace_existing=True,
+    )
+
+async def _send(bot: Bot, broadcast, tg_id: int) -> str:
+    for attempt in range(1, MAX_SEND_ATTEMPTS + 1):
+        await telegram_limiter.acquire()
+        try:
+            if broadcast.photo_file_id:
+                await bot.send_photo(tg_id, photo=broadcast.photo_file_id, caption=broadcast.text)
+            else:
+                await bot.send_message(tg_id, broadcast.text)
+            return DELIVERED
+        except TelegramRetryAfter as e:
+            logger.warning(f"[BROADCAST] RetryAfter {e.retry_after} сек (попытка {attempt}) для {tg_id}")
+            telegram_limiter.pause(e.retry_after)
+        except TelegramForbiddenError:
+            return BLOCKED
+        except TelegramBadRequest as e:
+            logger.info(f"[BROADCAST] Не доставлено {tg_id}: {e}")
+            return FAILED
+        except Exception as e:
+            logger.warning(f"[BROADCAST] Ошибка отправки {tg_id}: {e}")
+            return FAILED
+    return FAILED
+
+def _progress_text(broadcast, counters: Dict[str, int], status: str) -> str:
+    audience = "бустерам" if broadcast.role == "booster" else "всем пользователям"
+    if status == "completed":
+        header = f"✅ Рассылка {audience} завершена!"
+    elif status == "cancelled":
+        header = f"⏹ Рассылка {audience} остановлена."
+    else:
+        header = f"📢 Рассылка {audience} идёт..."
+    processed = sum(counters.values())
+    return (
+        f"{header}\n"
+        f"Доставлено: {counters[DELIVERED]}\n"
+        f"Не доставлено: {counters[FAILED]}\n"
+        f"Заблокировали бота: {counters[BLOCKED]}\n"
+        f"Обработано: {processed} из {broadcast.total}"
+    )
+
+async def _show_progress(bot: Bot, broadcast, counters: Dict[str, int], status: str = "running") -> None:
+    if not broadcast.progress_message_id:
+        return
+    if status == "running":
+        button = InlineKeyboardButton(text="⏹ Остановить", callback_data=f"broadcast_stop:{broadcast.id}")
+    else:
+        button = InlineKeyboardButton(text="⬅️ Назад к списку", callback_data="users_page:1")
+    await telegram_limiter.acquire()
+    try:
+        await bot.edit_message_text(
+            _progress_text(broadcast, counters, status),
+            chat_id=broadcast.progress_chat_id,
+            message_id=broadcast.progress_message_id,
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[button]])
+        )
+    except Exception as e:
+        logger.debug(f"[BROADCAST] Не удалось обновить прогресс рассылки {broadcast.id}: {e}")
+
+async def _run_broadcast(bot: Bot, broadcast_id: int) -> None:
+    broadcast = await get_broadcast(broadcast_id)
+    if not broadcast or broadcast.status != "running":
+        return
+    counters = {
+        DELIVERED: broadcast.delivered or 0,
+        FAILED: broadcast.failed or 0,
+        BLOCKED: broadcast.blocked or 0,
+    }
+    last_user_id = broadcast.last_user_id or 0
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+    async def send_one(tg_id: int) -> str:
+        async with semaphore:
+            return await _send(bot, broadcast, tg_id)
+
+    await _show_progress(bot, broadcast, counters)
+    last_progress = time.monotonic()
+    try:
+        while True:
+            recipients = await get_broadcast_recipients(
+                broadcast.role, last_user_id, BROADCAST_CHUNK_SIZE, exclude_tg_id=broadcast.admin_tg_id
+            )
+            if not recipients:
+                break
+            results = await asyncio.gather(*(send_one(recipient.tg_id) for recipient in recipients))
+            for result in results:
+                counters[result] += 1
+            await set_users_bot_blocked(
+                recipient.tg_id for recipient, result in zip(recipients, results) if result == BLOCKED
+            )
+            last_user_id = recipients[-1].id
+
+            # Чекпоинт после каждой пачки: после перезапуска продолжим со следующего получателя
+            if not await save_broadcast_progress(broadcast.id, last_user_id, **counters):
+                logger.info(f"[BROADCAST] Рассылка {broadcast.id} остановлена админом")
+                await _show_progress(bot, broadcast, counters, "cancelled")
+                return
+            if time.monotonic() - last_progress >= BROADCAST_PROGRESS_INTERVAL:
+                await _show_progress(bot, broadcast, counters)
+                last_progress = time.monotonic()
+
+        await save_broadcast_progress(broadcast.id, last_user_id, status="completed", **counters)
+        await _show_progress(bot, broadcast, counters, "completed")
+        logger.info(
+            f"[BROADCAST] Рассылка {broadcast.id} завершена: доставлено {counters[DELIVERED]}, "
+            f"не доставлено {counters[FAILED]}, заблокировали {counters[BLOCKED]}"
+        )
+    except Exception as e:
+        # Рассылка остается running и продолжится с чекпоинта при следующем запуске
+        logger.error(f"[BROADCAST] Рассылка {broadcast.id} прервана: {e}")
@@ -1,19 +1,101 @@
 import aiohttp
 import asyncio
 import logging
+from abc import ABC, abstractmethod
 from typing import Dict, Optional
 from datetime import datetime, timedelta
-import json
+from sqlalchemy import select
+from app.database.db import AsyncSessionLocal
+from app.database.models import CurrencyRate
+from app.utils.shared_state import get_shared_state
 
 logger = logging.getLogger(__name__)
 
+# Курсы относительно USD (fallback если API не работает)
+FALLBACK_USD_RATES = {
+    "USD": 1.0,
+    "KGS": 84.0,   # 1 USD = 84 сом
+    "KZT": 460.0,  # 1 USD = 460 тенге
+    "RUB": 95.0,   # 1 USD = 95 рублей
+}
+
+SUPPORTED_CODES = ["KGS", "KZT", "RUB", "USD"]
+
+class RateProvider(ABC):
+    """Источник курсов валют относительно USD"""
+    
+    @abstractmethod
+    async def fetch_usd_rates(self) -> Dict[str, float]:
+        """Возвращает таблицу {код валюты: сколько единиц за 1 USD}"""
+    
+    async def close(self):
+        """Освобождает ресурсы провайдера"""
+
+class ExchangeRateApiProvider(RateProvider):
+    """Курсы с exchangerate-api.com через одну общую HTTP сессию"""
+    
+    url = "https://api.exchangerate-api.com/v4/latest/USD"
+    
+    def __init__(self, timeout: float = 10):
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Сессия создается лениво и живет все время работы бота
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        return self._session
+    
+    async def fetch_usd_rates(self) -> Dict[str, float]:
+        async with self._get_session().get(self.url) as response:
+            response.raise_for_status()
+            data = await response.json()
+        
+        rates = data.get('rates', {})
+        usd_rates = {"USD": 1.0}
+        for code in SUPPORTED_CODES:
+            if code != "USD":
+                usd_rates[code] = rates.get(code) or FALLBACK_USD_RATES[code]
+        return usd_rates
+    
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+class StaticRateProvider(RateProvider):
+    """Локальный провайдер с фиксированными курсами (для тестов и офлайн режима)"""
+    
+    def __init__(self, usd_rates: Dict[str, float] = None):
+        self.usd_rates = dict(usd_rates or FALLBACK_USD_RATES)
+        self.calls = 0
+    
+    async def fetch_usd_rates(self) -> Dict[str, float]:
+        self.calls += 1
+        return dict(self.usd_rates)
+
+def build_cross_rates(usd_rates: Dict[str, float]) -> Dict[str, float]:
+    """Строит кросс-курсы вида "KGS_to_KZT" из таблицы курсов к USD"""
+    return {
+        f"{from_code}_to_{to_code}": usd_rates[to_code] / usd_rates[from_code]
+        for from_code in usd_rates
+        for to_code in usd_rates
+        if from_code != to_code
+    }
+
 class CurrencyConverter:
     """Конвертер валют с кэшированием курсов"""
     
-    def __init__(self):
+    def __init__(self, provider: RateProvider = None):
+        self.provider = provider or ExchangeRateApiProvider()
         self.cache = {}
+        self.usd_rates = {}
         self.cache_duration = timedelta(hours=1)  # Обновляем курсы каждый час
+        self.refresh_interval = timedelta(minutes=45)  # Фоновое обновление до истечения кэша
+        self.retry_interval = timedelta(minutes=5)  # Повтор запроса после ошибки API
         self.last_update = None
+        self.last_attempt = None
+        self._refresh_task: Optional[asyncio.Task] = None
         
         # Соответствие валют к их кодам
         self.currency_codes = {
@@ -22,148 +104,146 @@ class CurrencyConverter:
             "руб.": "RUB",
             "USD": "USD"
         }
-        
-        # Базовые курсы (fallback если API не работает)
-        self.fallback_rates = {
-            "KGS_to_KZT": 5.5,  # 1 сом = 5.5 тенге
-            "KGS_to_RUB": 1.1,  # 1 сом = 1.1 рубля
-            "KZT_to_RUB": 0.22, # 1 тенге = 0.22 рубля
-        }
+    
+    def set_provider(self, provider: RateProvider):
+        """Подменяет источник курсов и сбрасывает кэш"""
+        self.provider = provider
+        self.cache = {}
+        self.usd_rates = {}
+        self.last_update = None
+        self.last_attempt = None
     
     async def get_exchange_rates(self) -> Dict[str, float]:
-        """Получает актуальные курсы валют через API"""
+        """Получает актуальные курсы валют через провайдера"""
+        self.last_attempt = datetime.now()
         try:
-            # Используем бесплатный API exchangerate-api.com
-            async with aiohttp.ClientSession() as session:
-                # Получаем курсы относительно USD
-                url = "https://api.exchangerate-api.com/v4/latest/USD"
-                async with session.get(url, timeout=10) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        rates = data.get('rates', {})
-                        
-                        # Извлекаем нужные курсы
-                        usd_to_kgs = rates.get('KGS', 84.0)  # Примерный курс
-                        usd_to_kzt = rates.get('KZT', 460.0)  # Примерный курс
-                        usd_to_rub = rates.get('RUB', 95.0)   # Примерный курс
-                        
-                        # Вычисляем кросс-курсы
-                        exchange_rates = {
-                            "KGS_to_KZT": usd_to_kzt / usd_to_kgs,
-                            "KGS_to_RUB": usd_to_rub / usd_to_kgs,
-                            "KZT_to_RUB": usd_to_rub / usd_to_kzt,
-                            "KZT_to_KGS": usd_to_kgs / usd_to_kzt,
-                            "RUB_to_KGS": usd_to_kgs / usd_to_rub,
-                            "RUB_to_KZT": usd_to_kzt / usd_to_rub,
-                        }
-                        
-                        logger.info("Курсы валют успешно обновлены через API")
-                        self.cache = exchange_rates
-                        self.last_update = datetime.now()
-                        return exchange_rates
-                        
+            usd_rates = await self.provider.fetch_usd_rates()
+            self.usd_rates = usd_rates
+            self.cache = build_cross_rates(usd_rates)
+            self.last_update = datetime.now()
+            logger.info("Курсы валют успешно обновлены через API")
+            await self.save_rates()
+            return self.cache
         except Exception as e:
             logger.warning(f"Ошибка получения курсов через API: {e}")
         
-        # Если API недоступен, используем fallback курсы
+        # Последние полученные курсы лучше резервных
+        if self.cache:
+            return self.cache
+        
         logger.info("Используются резервные курсы валют")
-        return {
-            **self.fallback_rates,
-            "KZT_to_KGS": 1 / self.fallback_rates["KGS_to_KZT"],
-            "RUB_to_KGS": 1 / self.fallback_rates["KGS_to_RUB"],
-            "RUB_to_KZT": 1 / self.fallback_rates["KZT_to_RUB"],
-        }
+        self.usd_rates = dict(FALLBACK_USD_RATES)
+        self.cache = build_cross_rates(self.usd_rates)
+        return self.cache
+    
+    async def save_rates(self):
+        """Сохраняет последние полученные курсы в БД"""
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(select(CurrencyRate))
+                stored = {rate.code: rate for rate in result.scalars().all()}
+                for code, value in self.usd_rates.items():
+                    if code == "USD":
+                        continue
+                    if code in stored:
+                        stored[code].rate = value
+                        stored[code].updated_at = self.last_update
+                    else:
+                        session.add(CurrencyRate(code=code, rate=value, updated_at=self.last_update))
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Ошибка сохранения курсов валют: {e}")
+    
+    async def load_rates(self) -> bool:
+        """Загружает сохраненные курсы из БД, чтобы не стартовать с резервных"""
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(select(CurrencyRate))
+                stored = result.scalars().all()
+        except Exception as e:
+            logger.error(f"Ошибка загрузки курсов валют: {e}")
+            return False
+        
+        usd_rates = {"USD": 1.0, **{rate.code: rate.rate for rate in stored}}
+        if not all(code in usd_rates for code in SUPPORTED_CODES):
+            return False
+        
+        self.usd_rates = usd_rates
+        self.cache = build_cross_rates(usd_rates)
+        last_update = min(rate.updated_at for rate in stored)
+        if last_update.tzinfo is not None:
+            last_update = last_update.astimezone().replace(tzinfo=None)
+        self.last_update = last_update
+        logger.info(f"Загружены сохраненные курсы валют от {self.last_update:%d.%m.%Y %H:%M}")
+        return True
+    
+    async def refresh_rates(self) -> Dict[str, float]:
+        """Обновляет курсы; параллельные вызовы ждут один общий запрос"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self.get_exchange_rates())
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(self._refresh_task)
+    
+    async def refresh_if_due(self):
+        """Обновляет курсы, если они старше refresh_interval (для планировщика)"""
+        now = datetime.now()
+        if self.last_update and now - self.last_update < self.refresh_interval:
+            return
+        if self.last_attempt and now - self.last_attempt < self.retry_interval:
+            return
+        # Другой процесс бота мог уже обновить курсы в БД
+        await self.load_rates()
+        if self.last_update and now - self.last_update < self.refresh_interval:
+            return
+        # В API ходит один процесс, остальные подхватят курсы из БД
+        if not await get_shared_state().claim("currency_refresh", self.retry_interval.total_seconds()):
+            return
+        await self.refresh_rates()
     
     async def is_cache_valid(self) -> bool:
         """Проверяет актуальность кэша курсов"""
-        if not self.last_update or not self.cache:
+        if not self.cache:
             return False
-        return datetime.now() - self.last_update < self.cache_duration
+        now = datetime.now()
+        if self.last_update and now - self.last_update < self.cache_duration:
+            return True
+        # После неудачного запроса не долбим API на каждой конвертации
+        return bool(self.last_attempt and now - self.last_attempt < self.retry_interval)
     
     async def get_cached_rates(self) -> Dict[str, float]:
-        """Получает курсы из кэша или обновляет их"""
-        if not await self.is_cache_valid():
-            self.cache = await self.get_exchange_rates()
+        """Получает курсы из кэша, устаревший кэш обновляется в фоне"""
+        if not self.cache:
+            # Холодный старт: ждать приходится только здесь
+            await self.refresh_rates()
+        elif not await self.is_cache_valid():
+            # Отдаем последние известные курсы, не дожидаясь API
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.ensure_future(self.get_exchange_rates())
         return self.cache
     
+    def get_currency_code(self, currency: str) -> Optional[str]:
+        """Возвращает код валюты по коду или названию"""
+        if currency in SUPPORTED_CODES:
+            return currency
+        return self.currency_codes.get(currency)
+    
     async def convert_currency(self, amount: float, from_currency: str, to_currency: str) -> float:
         """Конвертирует сумму из одной валюты в другую"""
         if from_currency == to_currency:
             return amount
         
-        # Проверяем, являются ли входные параметры уже кодами валют или названиями
-        valid_codes = ["KGS", "KZT", "RUB", "USD"]
+        from_code = self.get_currency_code(from_currency)
+        to_code = self.get_currency_code(to_currency)
         
-        # Если переданы коды валют, используем их напрямую
-        if from_currency in valid_codes and to_currency in valid_codes:
-            from_code = from_currency
-            to_code = to_currency
-        else:
-            # Иначе получаем коды валют из названий
-            from_code = self.currency_codes.get(from_currency)
-            to_code = self.currency_codes.get(to_currency)
-            
-            if not from_code or not to_code:
-                logger.error(f"Неизвестная валюта: {from_currency} -> {to_currency}")
-                return amount
+        if not from_code or not to_code:
+            logger.error(f"Неизвестная валюта: {from_currency} -> {to_currency}")
+            return amount
+        
+        if from_code == to_code:
+            return amount
         
         try:
-            # Если одна из валют USD, используем курсы из API
-            if from_code == "USD":
-                # USD -> другая валюта
-                # Получаем актуальные курсы через API
-                async with aiohttp.ClientSession() as session:
-                    url = "https://api.exchangerate-api.com/v4/latest/USD"
-                    async with session.get(url, timeout=10) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            rates = data.get('rates', {})
-                            rate = rates.get(to_code)
-                            if rate:
-                                converted_amount = amount * rate
-                                logger.info(f"Конвертация: {amount} USD = {converted_amount:.2f} {to_currency} (курс: {rate:.4f})")
-                                return round(converted_amount, 2)
-                
-                # Если API недоступен, используем fallback курсы
-                fallback_rates = {
-                    "KGS": 84.0,  # 1 USD = 84 сом
-                    "KZT": 460.0,  # 1 USD = 460 тенге  
-                    "RUB": 95.0    # 1 USD = 95 рублей
-                }
-                rate = fallback_rates.get(to_code, 1.0)
-                converted_amount = amount * rate
-                logger.info(f"Конвертация (fallback): {amount} USD = {converted_amount:.2f} {to_currency} (курс: {rate:.4f})")
-                return round(converted_amount, 2)
-                
-            elif to_code == "USD":
-                # Другая валюта -> USD
-                async with aiohttp.ClientSession() as session:
-                    url = "https://api.exchangerate-api.com/v4/latest/USD"
-                    async with session.get(url, timeout=10) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            rates = data.get('rates', {})
-                            rate = rates.get(from_code)
-                            if rate:
-                                converted_amount = amount / rate
-                                logger.info(f"Конвертация: {amount} {from_currency} = {converted_amount:.2f} USD (курс: {rate:.4f})")
-                                return round(converted_amount, 2)
-                
-                # Если API недоступен, используем fallback курсы
-                fallback_rates = {
-                    "KGS": 84.0,  # 84 сом = 1 USD
-                    "KZT": 460.0,  # 460 тенге = 1 USD
-                    "RUB": 95.0    # 95 рублей = 1 USD
-                }
-                rate = fallback_rates.get(from_code, 1.0)
-                converted_amount = amount / rate
-                logger.info(f"Конвертация (fallback): {amount} {from_currency} = {converted_amount:.2f} USD (курс: {rate:.4f})")
-                return round(converted_amount, 2)
-            
-            # Получаем актуальные курсы для конвертации между локальными валютами
             rates = await self.get_cached_rates()
-            
-            # Формируем ключ для поиска курса между локальными валютами
             rate_key = f"{from_code}_to_{to_code}"
             
             if rate_key in rates:
@@ -186,6 +266,10 @@ class CurrencyConverter:
             "руб.": "🇷🇺"
         }
         return symbols.get(currency, "💰")
+    
+    async def close(self):
+        """Закрывает HTTP сессию провайдера"""
+        await self.provider.close()
 
 # Глобальный экземпляр конвертера
 converter = CurrencyConverter()
@@ -204,3 +288,21 @@ async def convert_booster_balance(amount: float, from_currency: str, to_currency
 async def get_current_rates() -> Dict[str, float]:
     """Получает текущие курсы валют"""
     return await converter.get_cached_rates()
+
+async def refresh_current_rates() -> Dict[str, float]:
+    """Принудительно обновляет курсы валют"""
+    return await converter.refresh_rates()
+
+async def setup_rates_refresh_job(scheduler):
+    """Подгружает курсы из БД и ставит их фоновое обновление в планировщик"""
+    await converter.load_rates()
+    scheduler.add_job(
+        converter.refresh_if_due,
+        "interval",
+        seconds=converter.retry_interval.total_seconds(),
+        next_run_time=datetime.now(),
+        id="currency_rates_refresh",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
@@ -0,0 +1,107 @@
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from app.config import FSM_STATE_TTL, FSM_STORAGE, FSM_SWEEP_BATCH, FSM_SWEEP_INTERVAL, REDIS_URL
+from app.database.crud import delete_expired_fsm_records, get_fsm_record, save_fsm_record
+
+logger = logging.getLogger(__name__)
+
+def _encode(value: Any) -> Any:
+    # Мастер промокодов кладет в данные datetime
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в данные FSM")
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+def dumps_data(data: Dict[str, Any]) -> str:
+    """Компактный JSON данных FSM: без пробелов, кириллица без \\u-экранирования"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_encode)
+
+def loads_data(raw: str) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_decode)
+
+def _make_key(key: StorageKey) -> str:
+    parts = [key.bot_id, key.chat_id, key.user_id]
+    if key.thread_id:
+        parts.append(key.thread_id)
+    parts.append(key.destiny)
+    return ":".join(map(str, parts))
+
+class DatabaseStorage(BaseStorage):
+    """FSM в таблице fsm_states основной БД: диалоги переживают перезапуск,
+    простаивающие дольше ttl секунд считаются истекшими"""
+
+    def __init__(self, ttl: int = FSM_STATE_TTL):
+        self.ttl = ttl
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        if isinstance(state, State):
+            state = state.state
+        await save_fsm_record(_make_key(key), self.ttl, state=state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await get_fsm_record(_make_key(key), self.ttl)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await save_fsm_record(_make_key(key), self.ttl, data=dumps_data(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await get_fsm_record(_make_key(key), self.ttl)
+        if not record or not record.data:
+            return {}
+        return loads_data(record.data)
+
+    async def close(self) -> None:
+        pass
+
+    async def sweep(self) -> int:
+        """Удаляет брошенные диалоги (Redis истекает их сам по TTL ключей)"""
+        deleted = await delete_expired_fsm_records(self.ttl, FSM_SWEEP_BATCH)
+        if deleted:
+            logger.info(f"[FSM] Удалено брошенных диалогов: {deleted}")
+        return deleted
+
+def _redis_storage() -> BaseStorage:
+    # Импорт здесь: пакет redis нужен только этому бэкенду.
+    # Подходит любой сервер с протоколом Redis, в том числе локальный для отладки
+    from aiogram.fsm.storage.redis import RedisStorage
+    ttl = FSM_STATE_TTL or None
+    return RedisStorage.from_url(
+        REDIS_URL,
+        state_ttl=ttl,
+        data_ttl=ttl,
+        json_dumps=dumps_data,
+        json_loads=loads_data,
+    )
+
+def create_fsm_storage(backend: str = FSM_STORAGE) -> BaseStorage:
+    if backend == "redis":
+        return _redis_storage()
+    if backend == "memory":
+        return MemoryStorage()
+    return DatabaseStorage()
+
+async def setup_fsm_storage(scheduler) -> BaseStorage:
+    """Создает хранилище FSM из конфига и ставит очистку брошенных диалогов в планировщик"""
+    storage = create_fsm_storage()
+    if isinstance(storage, DatabaseStorage) and storage.ttl:
+        scheduler.add_job(
+            storage.sweep,
+            "interval",
+            seconds=FSM_SWEEP_INTERVAL,
+            id="fsm_sweep",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+    logger.info(f"[FSM] Хранилище состояний: {type(storage).__name__}")
+    return storage
@@ -2,11 +2,12 @@ import logging
 import os
 from logging.handlers import RotatingFileHandler
 
-def setup_logging():
+def setup_logging(name: str = "bot"):
+    # У каждого процесса свой файл: ротация одного файла из нескольких процессов ломается
     log_dir = "logs"
     os.makedirs(log_dir, exist_ok=True)
     file_handler = RotatingFileHandler(
-        f"{log_dir}/bot.log",
+        f"{log_dir}/{name}.log",
         maxBytes=5*1024*1024,  
         backupCount=5,       # Хранить до 5 файлов: bot.log, bot.log.1, ...
         encoding="utf-8"
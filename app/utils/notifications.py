@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Set
+from aiogram.exceptions import TelegramRetryAfter
+from app.config import NOTIFY_CONCURRENCY, NOTIFY_MAX_ATTEMPTS
+from app.database.crud import get_admins
+
+logger = logging.getLogger(__name__)
+
+# Ссылки на фоновые задачи, чтобы их не собрал сборщик мусора до завершения
+_pending: Set[asyncio.Task] = set()
+
+async def with_retry(method, *args, **kwargs):
+    """Вызывает метод Bot API, при RetryAfter ждет указанное время и повторяет"""
+    for attempt in range(1, NOTIFY_MAX_ATTEMPTS + 1):
+        try:
+            return await method(*args, **kwargs)
+        except TelegramRetryAfter as e:
+            if attempt == NOTIFY_MAX_ATTEMPTS:
+                raise
+            logger.warning(f"[NOTIFY] RetryAfter {e.retry_after} сек, попытка {attempt}")
+            await asyncio.sleep(e.retry_after)
+
+async def _fan_out_to_admins(send: Callable[[int], Awaitable], description: str) -> int:
+    admin_ids = await get_admins()
+    if not admin_ids:
+        logger.warning("Не найдено ни одного администратора в базе данных")
+        return 0
+    semaphore = asyncio.Semaphore(NOTIFY_CONCURRENCY)
+
+    async def deliver(chat_id: int) -> bool:
+        async with semaphore:
+            try:
+                await send(chat_id)
+                return True
+            except Exception as e:
+                logger.error(f"[NOTIFY] Ошибка отправки уведомления ({description}) админу {chat_id}: {e}")
+                return False
+
+    results = await asyncio.gather(*(deliver(chat_id) for chat_id in admin_ids))
+    sent_count = sum(results)
+    logger.info(f"[NOTIFY] Уведомление ({description}) отправлено {sent_count} из {len(admin_ids)} админов")
+    return sent_count
+
+def notify_admins(send: Callable[[int], Awaitable], description: str) -> asyncio.Task:
+    """Отправляет уведомление всем админам в фоне, не задерживая ответ пользователю.
+
+    send(chat_id) — корутина, отправляющая уведомление одному админу
+    (вызовы Bot API внутри нее оборачиваются в with_retry).
+    """
+    task = asyncio.create_task(_fan_out_to_admins(send, description))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+    return task
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import List
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+from app.config import (
+    OUTBOX_BACKOFF_BASE,
+    OUTBOX_BACKOFF_MAX,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_LEASE_SECONDS,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_WORKERS
+)
+from app.database.crud import (
+    claim_outbox_batch,
+    mark_outbox_failed,
+    mark_outbox_sent,
+    purge_sent_outbox,
+    set_users_bot_blocked
+)
+from app.utils.broadcast import telegram_limiter
+
+logger = logging.getLogger(__name__)
+
+def outbox_message(chat_id: int, text: str, reply_markup: InlineKeyboardMarkup = None,
+                   parse_mode: str = "HTML") -> dict:
+    """Сообщение для outbox (передается в crud-функции параметром outbox)"""
+    return {
+        "chat_id": chat_id,
+        "text": text,
+        "parse_mode": parse_mode,
+        "reply_markup": reply_markup.model_dump_json(exclude_none=True) if reply_markup else None,
+    }
+
+def _backoff(attempts: int) -> float:
+    return min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+
+async def _send(bot: Bot, message) -> bool:
+    """Отправляет одно сообщение из outbox. True — доставлено"""
+    await telegram_limiter.acquire()
+    try:
+        await bot.send_message(
+            message.chat_id,
+            message.text,
+            parse_mode=message.parse_mode,
+            reply_markup=InlineKeyboardMarkup.model_validate_json(message.reply_markup) if message.reply_markup else None
+        )
+        return True
+    except TelegramRetryAfter as e:
+        telegram_limiter.pause(e.retry_after)
+        await mark_outbox_failed(message.id, str(e), retry_in=e.retry_after)
+    except TelegramForbiddenError as e:
+        # Пользователь заблокировал бота — повторять бессмысленно
+        await set_users_bot_blocked([message.chat_id])
+        await mark_outbox_failed(message.id, str(e))
+    except TelegramBadRequest as e:
+        await mark_outbox_failed(message.id, str(e))
+    except Exception as e:
+        retry_in = _backoff(message.attempts) if message.attempts < OUTBOX_MAX_ATTEMPTS else None
+        await mark_outbox_failed(message.id, str(e), retry_in=retry_in)
+    logger.warning(f"[OUTBOX] Сообщение {message.id} для {message.chat_id} не отправлено (попытка {message.attempts})")
+    return False
+
+async def _worker(bot: Bot, number: int) -> None:
+    while True:
+        try:
+            batch = await claim_outbox_batch(OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS)
+            if not batch:
+                await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+                continue
+            # В пачке не больше одного сообщения на чат, их можно слать параллельно
+            results = await asyncio.gather(*(_send(bot, message) for message in batch))
+            await mark_outbox_sent([message.id for message, sent in zip(batch, results) if sent])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[OUTBOX] Ошибка воркера {number}: {e}")
+            await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+def start_outbox_workers(bot: Bot) -> List[asyncio.Task]:
+    return [
+        asyncio.create_task(_worker(bot, number), name=f"outbox-worker-{number}")
+        for number in range(1, OUTBOX_WORKERS + 1)
+    ]
+
+async def setup_outbox(scheduler, bot: Bot) -> List[asyncio.Task]:
+    """Запускает воркеры outbox и ежедневную очистку отправленных сообщений"""
+    scheduler.add_job(
+        purge_sent_outbox,
+        "cron",
+        hour=4,
+        id="outbox_purge",
+        replace_existing=True,
+    )
+    return start_outbox_workers(bot)
@@ -0,0 +1,40 @@
+from typing import List, NamedTuple, Optional
+
+# Telegram ограничивает callback_data 64 байтами
+CALLBACK_DATA_LIMIT = 64
+
+class PageCursor(NamedTuple):
+    extra: List[str]
+    page: int
+    after_id: Optional[int]
+    before_id: Optional[int]
+
+def page_callback(prefix: str, page: int, direction: str, cursor_id: int, *extra) -> str:
+    """callback_data кнопки пагинации: <prefix>[:<extra>...]:<страница>:<n|p>:<id курсора>"""
+    data = ":".join([prefix, *map(str, extra), str(page), direction, str(cursor_id)])
+    if len(data.encode("utf-8")) > CALLBACK_DATA_LIMIT:
+        raise ValueError(f"callback_data длиннее {CALLBACK_DATA_LIMIT} байт: {data}")
+    return data
+
+def next_page_callback(prefix: str, page: int, items, *extra) -> str:
+    """Кнопка "вперед": курсор — последний элемент текущей страницы"""
+    return page_callback(prefix, page + 1, "n", items[-1].id, *extra)
+
+def prev_page_callback(prefix: str, page: int, items, *extra) -> str:
+    """Кнопка "назад": курсор — первый элемент текущей страницы"""
+    return page_callback(prefix, page - 1, "p", items[0].id, *extra)
+
+def parse_page_callback(data: str, extra_count: int = 0, first_page: int = 0) -> PageCursor:
+    """Разбирает callback_data из page_callback.
+
+    Кнопки без курсора (старый формат "<prefix>:<страница>") открывают первую страницу.
+    """
+    parts = data.split(":")
+    extra = parts[1:1 + extra_count]
+    rest = parts[1 + extra_count:]
+    if len(rest) == 3 and rest[1] in ("n", "p") and rest[0].isdigit() and rest[2].isdigit():
+        page, direction, cursor_id = int(rest[0]), rest[1], int(rest[2])
+        if direction == "n":
+            return PageCursor(extra, page, cursor_id, None)
+        return PageCursor(extra, page, None, cursor_id)
+    return PageCursor(extra, first_page, None, None)
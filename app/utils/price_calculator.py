@@ -1,18 +1,20 @@
+import logging
+from typing import Dict, List, Optional
 from app.config import REGION_CURRENCIES, RANKS
 from app.utils.settings import SettingsManager
 
-async def get_mythic_price(stars, region):
-    """Возвращает цену за звезду в зависимости от количества звезд"""
-    rank_prices = await SettingsManager.get_setting("RANK_PRICES")
-    
-    if stars <= 25:
-        return rank_prices[region]["Мифик0-25"]
-    elif stars <= 50:
-        return rank_prices[region]["Мифик25-50"]
-    elif stars <= 100:
-        return rank_prices[region]["Мифик50-100"]
-    else:
-        return rank_prices[region]["Мифик100+"]
+logger = logging.getLogger(__name__)
+
+# Границы ценовых диапазонов Мифика: (последняя звезда диапазона, ключ цены)
+MYTHIC_TIERS = [
+    (25, "Мифик0-25"),
+    (50, "Мифик25-50"),
+    (100, "Мифик50-100"),
+    (None, "Мифик100+"),
+]
+
+# Индекс ранга в RANKS, чтобы не искать его через list.index
+RANK_INDEX = {rank: i for i, rank in enumerate(RANKS)}
 
 def get_rank_type(rank):
     """Определяет тип ранга для расчета цены"""
@@ -33,41 +35,98 @@ def get_rank_type(rank):
     else:
         return "Воин"
 
-async def calculate_regular_rank_cost(current_rank, target_rank, region):
-    """Рассчитывает стоимость буста обычных рангов"""
-    rank_prices = await SettingsManager.get_setting("RANK_PRICES")
-    current_index = RANKS.index(current_rank)
-    target_index = RANKS.index(target_rank)
+RANK_TYPES = [get_rank_type(rank) for rank in RANKS]
+
+class PricingEngine:
+    """Скомпилированные таблицы цен для расчета стоимости за O(1)"""
+    
+    def __init__(self, rank_prices: Dict[str, Dict[str, int]]):
+        self.source = rank_prices
+        # Накопленная стоимость перехода от RANKS[0] до RANKS[i] по регионам
+        self.rank_prefix: Dict[str, List[float]] = {}
+        # Цены звезды и накопленная стоимость на границах диапазонов Мифика
+        self.mythic_tier_prices: Dict[str, List[float]] = {}
+        self.mythic_prefix: Dict[str, List[float]] = {}
+        
+        for region, prices in rank_prices.items():
+            try:
+                prefix = [0]
+                for rank_type in RANK_TYPES[1:]:
+                    prefix.append(prefix[-1] + prices[rank_type])
+                self.rank_prefix[region] = prefix
+                
+                tier_prices = [prices[key] for _, key in MYTHIC_TIERS]
+                tier_prefix = [0]
+                lower = 0
+                for (upper, _), price in zip(MYTHIC_TIERS[:-1], tier_prices):
+                    tier_prefix.append(tier_prefix[-1] + (upper - lower) * price)
+                    lower = upper
+                self.mythic_tier_prices[region] = tier_prices
+                self.mythic_prefix[region] = tier_prefix
+            except KeyError as e:
+                # Неполные цены региона: расчет для него упадет с KeyError, как и раньше
+                logger.error(f"Неполные цены для региона {region}: нет ключа {e}")
+    
+    def rank_cost(self, current_rank: str, target_rank: str, region: str) -> float:
+        """Стоимость перехода между обычными рангами"""
+        current_index = RANK_INDEX[current_rank]
+        target_index = RANK_INDEX[target_rank]
+        if target_index <= current_index:
+            return 0
+        
+        prefix = self.rank_prefix[region]
+        return prefix[target_index] - prefix[current_index]
     
-    total_cost = 0
+    def mythic_stars_cost(self, stars: int, region: str) -> float:
+        """Стоимость звезд Мифика с 1 по stars включительно"""
+        if stars <= 0:
+            return 0
+        
+        tier_prices = self.mythic_tier_prices[region]
+        tier_prefix = self.mythic_prefix[region]
+        
+        lower = 0
+        for i, (upper, _) in enumerate(MYTHIC_TIERS):
+            if upper is None or stars <= upper:
+                return tier_prefix[i] + (stars - lower) * tier_prices[i]
+            lower = upper
     
-    # ✅ ИСПРАВЛЕНО: считаем переходы между рангами, а не умножаем на звезды
-    for i in range(current_index, target_index):
-        rank = RANKS[i + 1]  # Следующий ранг
-        rank_type = get_rank_type(rank)
-        price_per_rank = rank_prices[region][rank_type]
-        total_cost += price_per_rank
+    def mythic_cost(self, current_stars: int, target_stars: int, region: str) -> float:
+        """Стоимость буста звезд Мифика от current_stars до target_stars"""
+        if target_stars <= current_stars:
+            return 0
+        return self.mythic_stars_cost(target_stars, region) - self.mythic_stars_cost(current_stars, region)
     
-    return total_cost
+    def mythic_price(self, stars: int, region: str) -> float:
+        """Цена одной звезды в зависимости от количества звезд"""
+        for upper, key in MYTHIC_TIERS:
+            if upper is None or stars <= upper:
+                return self.source[region][key]
+
+_pricing_engine: Optional[PricingEngine] = None
+
+async def get_pricing_engine() -> PricingEngine:
+    """Возвращает движок цен, пересобирая его только при изменении RANK_PRICES"""
+    global _pricing_engine
+    rank_prices = await SettingsManager.get_setting("RANK_PRICES")
+    if _pricing_engine is None or _pricing_engine.source != rank_prices:
+        _pricing_engine = PricingEngine(rank_prices)
+    return _pricing_engine
+
+async def get_mythic_price(stars, region):
+    """Возвращает цену за звезду в зависимости от количества звезд"""
+    engine = await get_pricing_engine()
+    return engine.mythic_price(stars, region)
+
+async def calculate_regular_rank_cost(current_rank, target_rank, region):
+    """Рассчитывает стоимость буста обычных рангов"""
+    engine = await get_pricing_engine()
+    return engine.rank_cost(current_rank, target_rank, region)
 
 async def calculate_mythic_cost(current_stars, target_stars, region):
     """Рассчитывает стоимость буста Мифик звезд с учетом ценовых диапазонов"""
-    rank_prices = await SettingsManager.get_setting("RANK_PRICES")
-    total_cost = 0
-    
-    for star in range(current_stars + 1, target_stars + 1):
-        if star <= 25:
-            price = rank_prices[region]["Мифик0-25"]
-        elif star <= 50:
-            price = rank_prices[region]["Мифик25-50"]
-        elif star <= 100:
-            price = rank_prices[region]["Мифик50-100"]
-        else:
-            price = rank_prices[region]["Мифик100+"]
-        
-        total_cost += price
-    
-    return total_cost
+    engine = await get_pricing_engine()
+    return engine.mythic_cost(current_stars, target_stars, region)
 
 async def calculate_total_order_cost(base_cost, boost_type, region):
     """Рассчитывает финальную стоимость заказа с множителями"""
@@ -76,4 +135,4 @@ async def calculate_total_order_cost(base_cost, boost_type, region):
     total_cost = base_cost * multiplier
     currency = REGION_CURRENCIES[region]
     
-    return total_cost, currency
\ No newline at end of file
+    return total_cost, currency
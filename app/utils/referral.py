@@ -1,11 +1,12 @@
-from app.database.models import User
-from sqlalchemy.future import select
-from app.database.db import AsyncSessionLocal
+from app.database.crud import count_referrals, get_referrals
+
+REFERRALS_LIST_LIMIT = 10
 
 async def get_referrals_count(user_id):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).where(User.referrer_id == user_id))
-        return result.scalars().all()
+    return await count_referrals(user_id)
+
+async def get_recent_referrals(user_id, limit=REFERRALS_LIST_LIMIT):
+    return await get_referrals(user_id, limit)
 
 def get_referral_link(user):
     return f"https://t.me/Rich_boostBot?start=ref{user.id}"  # Используй user.id!
\ No newline at end of file
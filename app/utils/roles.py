@@ -1,11 +1,12 @@
 from functools import wraps
-from app.database.crud import get_user_by_tg_id
+from app.utils.user import get_current_user
 
 def role_required(role: str):
     def decorator(handler):
         @wraps(handler)
         async def wrapper(message, *args, **kwargs):
-            user = await get_user_by_tg_id(message.from_user.id)
+            # Пользователь уже загружен middleware, повторного запроса в БД нет
+            user = await get_current_user(message.from_user.id)
             if not user or user.role != role:
                 await message.answer(
                     f"⛔️ У вас нет доступа к этой функции.\n"
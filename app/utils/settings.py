@@ -1,12 +1,40 @@
+import asyncio
+import copy
 import json
 import logging
+import time
 from typing import Any, Dict, Optional
 from sqlalchemy import select
 from app.database.db import AsyncSessionLocal
 from app.database.models import BotSettings
+from app.utils.shared_state import on_invalidation, publish_invalidation
 
 logger = logging.getLogger(__name__)
 
+# Время жизни кэша настроек (сек). Все изменения через set_setting
+# попадают в кэш сразу, TTL страхует от правок БД в обход бота.
+SETTINGS_CACHE_TTL = 300
+
+# Кэш настроек процесса: ключ -> уже декодированное значение
+_settings_cache: Dict[str, Any] = {}
+_settings_cache_loaded_at: Optional[float] = None
+_settings_cache_lock = asyncio.Lock()
+_settings_cache_stats = {"hits": 0, "misses": 0, "reloads": 0}
+
+def _decode_value(value: str) -> Any:
+    """Декодирует значение настройки из JSON строки"""
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        # Если не JSON, возвращаем как строку
+        return value
+
+def _is_cache_fresh() -> bool:
+    return (
+        _settings_cache_loaded_at is not None
+        and time.monotonic() - _settings_cache_loaded_at < SETTINGS_CACHE_TTL
+    )
+
 # Настройки по умолчанию
 DEFAULT_SETTINGS = {
     # Бэкап
@@ -120,28 +148,51 @@ DEFAULT_SETTINGS = {
 class SettingsManager:
     """Менеджер настроек бота"""
     
+    @staticmethod
+    async def load_cache() -> None:
+        """Загрузить все настройки из БД в кэш одним запросом"""
+        global _settings_cache, _settings_cache_loaded_at
+        async with _settings_cache_lock:
+            # Пока ждали блокировку, кэш мог обновить другой запрос
+            if _is_cache_fresh():
+                return
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(select(BotSettings.key, BotSettings.value))
+                _settings_cache = {key: _decode_value(value) for key, value in result.all()}
+            _settings_cache_loaded_at = time.monotonic()
+            _settings_cache_stats["reloads"] += 1
+            logger.info(f"Кэш настроек загружен: {len(_settings_cache)} ключей")
+    
+    @staticmethod
+    def invalidate_cache() -> None:
+        """Сбросить кэш настроек, следующее чтение перечитает БД"""
+        global _settings_cache_loaded_at
+        _settings_cache_loaded_at = None
+    
+    @staticmethod
+    def get_cache_stats() -> Dict[str, int]:
+        """Статистика кэша настроек"""
+        return {**_settings_cache_stats, "size": len(_settings_cache)}
+    
     @staticmethod
     async def get_setting(key: str, default_value: Any = None) -> Any:
         """Получить значение настройки"""
         try:
-            async with AsyncSessionLocal() as session:
-                result = await session.execute(
-                    select(BotSettings).where(BotSettings.key == key)
-                )
-                setting = result.scalar_one_or_none()
-                
-                if setting:
-                    try:
-                        return json.loads(setting.value)
-                    except json.JSONDecodeError:
-                        # Если не JSON, возвращаем как строку
-                        return setting.value
-                
-                # Если настройка не найдена, возвращаем значение по умолчанию
-                if key in DEFAULT_SETTINGS:
-                    return DEFAULT_SETTINGS[key]["value"]
-                
-                return default_value
+            if _is_cache_fresh():
+                _settings_cache_stats["hits"] += 1
+            else:
+                _settings_cache_stats["misses"] += 1
+                await SettingsManager.load_cache()
+            
+            if key in _settings_cache:
+                # Копия, чтобы вызывающий код не мог изменить кэш
+                return copy.deepcopy(_settings_cache[key])
+            
+            # Если настройка не найдена, возвращаем значение по умолчанию
+            if key in DEFAULT_SETTINGS:
+                return copy.deepcopy(DEFAULT_SETTINGS[key]["value"])
+            
+            return default_value
                 
         except Exception as e:
             logger.error(f"Ошибка получения настройки {key}: {e}")
@@ -179,6 +230,9 @@ class SettingsManager:
                     session.add(setting)
                 
                 await session.commit()
+                # Write-through: обновляем кэш тем же значением, что записали в БД
+                _settings_cache[key] = _decode_value(value_str)
+                publish_invalidation("settings")
                 logger.info(f"Настройка {key} обновлена: {value}")
                 return True
                 
@@ -198,14 +252,7 @@ class SettingsManager:
                 result = await session.execute(query)
                 settings = result.scalars().all()
                 
-                settings_dict = {}
-                for setting in settings:
-                    try:
-                        settings_dict[setting.key] = json.loads(setting.value)
-                    except json.JSONDecodeError:
-                        settings_dict[setting.key] = setting.value
-                
-                return settings_dict
+                return {setting.key: _decode_value(setting.value) for setting in settings}
                 
         except Exception as e:
             logger.error(f"Ошибка получения настроек: {e}")
@@ -215,10 +262,11 @@ class SettingsManager:
     async def initialize_default_settings():
         """Инициализировать настройки по умолчанию"""
         try:
+            # Загружаем все настройки одним запросом при старте
+            await SettingsManager.load_cache()
             for key, config in DEFAULT_SETTINGS.items():
                 # Проверяем, существует ли настройка
-                current_value = await SettingsManager.get_setting(key)
-                if current_value is None:
+                if key not in _settings_cache:
                     await SettingsManager.set_setting(
                         key,
                         config["value"],
@@ -267,3 +315,6 @@ async def get_rank_prices() -> Dict[str, Dict[str, int]]:
 async def get_booster_income_percent() -> int:
     """Получить процент дохода бустеров от заказа"""
     return await SettingsManager.get_setting("BOOSTER_INCOME_PERCENT", DEFAULT_SETTINGS["BOOSTER_INCOME_PERCENT"]["value"])
+
+# Настройку изменили в другом процессе: перечитаем БД при следующем обращении
+on_invalidation("settings", SettingsManager.invalidate_cache)
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Set
+from app.config import REDIS_URL, SHARED_STATE
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache_invalidation"
+_ORIGIN = uuid.uuid4().hex  # Свои сообщения об инвалидации процесс пропускает
+
+class MemorySharedState:
+    """Общее состояние в памяти: бот работает одним процессом"""
+
+    shared = False
+    PURGE_INTERVAL = 60
+
+    def __init__(self):
+        self._claims: Dict[str, float] = {}
+        self._purged_at = time.monotonic()
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        """Занимает key на ttl секунд. False — ключ уже занят"""
+        now = time.monotonic()
+        if now - self._purged_at > self.PURGE_INTERVAL:
+            # Истекшие ключи выбрасываем, чтобы словарь не рос с каждым новым пользователем
+            self._claims = {key: expires for key, expires in self._claims.items() if expires > now}
+            self._purged_at = now
+        if self._claims.get(key, 0) > now:
+            return False
+        self._claims[key] = now + ttl
+        return True
+
+    async def throttle(self, name: str, rate: float) -> None:
+        """Общий на все процессы лимит запросов в секунду. В одном процессе
+        частоту уже держит локальный TokenBucket"""
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        """Сообщение остальным процессам бота; в одном процессе их нет"""
+
+    async def subscribe(self, channel: str, callback: Callable[[Dict[str, Any]], None]) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+class RedisSharedState:
+    """Общее состояние в Redis: несколько процессов бота (см. app.utils.supervisor)"""
+
+    shared = True
+    PREFIX = "boost:"
+
+    def __init__(self, url: str = REDIS_URL):
+        # Импорт здесь: пакет redis нужен только этому бэкенду
+        from redis.asyncio import Redis
+        self.redis = Redis.from_url(url)
+        self._listeners: List[asyncio.Task] = []
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        return bool(await self.redis.set(self.PREFIX + key, 1, nx=True, px=max(1, int(ttl * 1000))))
+
+    async def throttle(self, name: str, rate: float) -> None:
+        # Счетчик запросов в текущей секунде, общий для всех процессов
+        while True:
+            now = time.time()
+            window = int(now)
+            key = f"{self.PREFIX}rate:{name}:{window}"
+            count = await self.redis.incr(key)
+            if count == 1:
+                await self.redis.expire(key, 2)
+            if count <= rate:
+                return
+            await asyncio.sleep(window + 1 - now)
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        await self.redis.publish(self.PREFIX + channel, json.dumps(message))
+
+    async def subscribe(self, channel: str, callback: Callable[[Dict[str, Any]], None]) -> None:
+        task = asyncio.create_task(self._listen(self.PREFIX + channel, callback), name=f"subscribe-{channel}")
+        self._listeners.append(task)
+
+    async def _listen(self, channel: str, callback: Callable[[Dict[str, Any]], None]) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            callback(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[SHARED] Подписка на {channel} прервана: {e}")
+                await asyncio.sleep(1)
+
+    async def close(self) -> None:
+        for task in self._listeners:
+            task.cancel()
+        await self.redis.close()
+
+_state = MemorySharedState()
+_invalidation_handlers: Dict[str, Callable[..., None]] = {}
+_pending: Set[asyncio.Task] = set()
+
+def get_shared_state():
+    return _state
+
+def on_invalidation(kind: str, handler: Callable[..., None]) -> None:
+    """Регистрирует локальный сброс кэша, который вызывается по сообщению из другого процесса"""
+    _invalidation_handlers[kind] = handler
+
+def publish_invalidation(kind: str, **ids) -> None:
+    """Сообщает остальным процессам, что кэш kind устарел (вызывается после commit)"""
+    if not _state.shared:
+        return
+    task = asyncio.get_running_loop().create_task(_state.publish(INVALIDATION_CHANNEL, {"kind": kind, "origin": _ORIGIN, **ids}))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+def _apply_invalidation(message: Dict[str, Any]) -> None:
+    if message.pop("origin", None) == _ORIGIN:
+        return
+    handler = _invalidation_handlers.get(message.pop("kind", None))
+    if handler:
+        handler(**message)
+
+async def setup_shared_state(backend: str = SHARED_STATE):
+    """Выбирает бэкенд общего состояния и подписывает кэши процесса на инвалидации"""
+    global _state
+    if backend == "redis":
+        _state = RedisSharedState()
+    await _state.subscribe(INVALIDATION_CHANNEL, _apply_invalidation)
+    logger.info(f"[SHARED] Общее состояние: {type(_state).__name__}")
+    return _state
@@ -0,0 +1,129 @@
+import asyncio
+import hmac
+import json
+import logging
+import multiprocessing
+import secrets
+from typing import Any, Callable, Dict, List, Optional
+from aiohttp import ClientError, ClientSession, web
+from app.config import (
+    BOT_WORKERS,
+    SHARED_STATE,
+    WEBHOOK_DRAIN_TIMEOUT,
+    WEBHOOK_HOST,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WORKER_BASE_PORT
+)
+from app.utils.webhook import SECRET_HEADER
+
+logger = logging.getLogger(__name__)
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """from_user.id апдейта любого типа (message, callback_query, poll_answer, ...)"""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+        # Посты каналов и опросы без автора: раскладываем по чату
+        chat = event.get("chat")
+        return chat["id"] if chat else None
+    return None
+
+def shard_for(update: Dict[str, Any], workers: int) -> int:
+    """Номер воркера для апдейта: все апдейты одного пользователя попадают в один процесс"""
+    user_id = update_user_id(update)
+    return abs(user_id) % workers if user_id else 0
+
+class Supervisor:
+    """Принимает вебхук Telegram и раздает апдейты процессам-воркерам по from_user.id.
+
+    Воркер i — обычный бот в webhook-режиме на 127.0.0.1:WORKER_BASE_PORT+i,
+    принимающий апдейты только с секретом супервизора. Упавшие воркеры перезапускаются.
+    """
+
+    def __init__(self, worker_main: Callable[[int, str], None], workers: int = BOT_WORKERS):
+        self.worker_main = worker_main
+        self.workers = workers
+        self.worker_secret = secrets.token_urlsafe(32)
+        self._secret = WEBHOOK_SECRET.encode()
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[multiprocessing.Process] = []
+        self._session: Optional[ClientSession] = None
+        self._accepting = True
+
+    def _spawn(self, shard: int) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=self.worker_main,
+            args=(shard, self.worker_secret),
+            name=f"bot-worker-{shard}",
+        )
+        process.start()
+        return process
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), self._secret):
+            return web.Response(status=401)
+        if not self._accepting:
+            return web.Response(status=503)
+        body = await request.read()
+        shard = shard_for(json.loads(body), self.workers)
+        try:
+            async with self._session.post(
+                f"http://127.0.0.1:{WORKER_BASE_PORT + shard}{WEBHOOK_PATH}",
+                data=body,
+                headers={SECRET_HEADER: self.worker_secret, "Content-Type": "application/json"},
+            ) as response:
+                # Воркер отвечает, когда занял слот обработки: его backpressure доходит до Telegram
+                return web.Response(status=response.status)
+        except ClientError as e:
+            # Воркер еще стартует или перезапускается: Telegram повторит доставку
+            logger.warning(f"[SUPERVISOR] Воркер {shard} недоступен: {e}")
+            return web.Response(status=503)
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(1)
+            for shard, process in enumerate(self._processes):
+                if not process.is_alive():
+                    logger.error(f"[SUPERVISOR] Воркер {shard} завершился с кодом {process.exitcode}, перезапускаем")
+                    self._processes[shard] = self._spawn(shard)
+
+    def _stop_workers(self) -> None:
+        # SIGTERM: воркер дожидается принятых апдейтов (см. WebhookHandler.drain)
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join(WEBHOOK_DRAIN_TIMEOUT + 5)
+            if process.is_alive():
+                process.kill()
+
+    async def run(self) -> None:
+        if not WEBHOOK_SECRET:
+            raise RuntimeError("Для нескольких процессов нужен BOT_MODE=webhook и WEBHOOK_SECRET")
+        if SHARED_STATE != "redis":
+            logger.warning(
+                "[SUPERVISOR] SHARED_STATE=memory: антиспам и лимит Bot API считаются в каждом воркере "
+                "отдельно, кэши других воркеров устаревают до истечения TTL"
+            )
+        self._processes = [self._spawn(shard) for shard in range(self.workers)]
+        self._session = ClientSession()
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        logger.info(f"[SUPERVISOR] Воркеров: {self.workers}, слушаем {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        watcher = asyncio.create_task(self._watch())
+        try:
+            await asyncio.Event().wait()
+        finally:
+            watcher.cancel()
+            self._accepting = False
+            await asyncio.to_thread(self._stop_workers)
+            await runner.cleanup()
+            await self._session.close()
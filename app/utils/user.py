@@ -1,5 +1,26 @@
+from contextvars import ContextVar
+from typing import Optional
+from app.database.crud import get_user_by_tg_id
+from app.database.models import User
 from app.utils.currency import get_active_balance
 
+# Пользователь текущего апдейта: {tg_id: User или None}, заполняется UserUpdateMiddleware
+_current_user: ContextVar[Optional[dict]] = ContextVar("current_user", default=None)
+
+def set_current_user(tg_id: int, user: Optional[User]):
+    """Запоминает пользователя текущего апдейта, возвращает токен для сброса"""
+    return _current_user.set({tg_id: user})
+
+def reset_current_user(token):
+    _current_user.reset(token)
+
+async def get_current_user(tg_id: int) -> Optional[User]:
+    """Пользователь из контекста апдейта; вне middleware — запрос в БД"""
+    current = _current_user.get()
+    if current is not None and tg_id in current:
+        return current[tg_id]
+    return await get_user_by_tg_id(tg_id)
+
 def format_user_profile(user) -> str:
     balance, bonus, currency = get_active_balance(user)
     date_str = user.created_at.strftime('%d.%m.%Y %H:%M') if user.created_at else '—'
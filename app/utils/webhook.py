@@ -0,0 +1,127 @@
+import asyncio
+import hmac
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from app.config import (
+    WEBHOOK_BASE_URL,
+    WEBHOOK_CONCURRENCY,
+    WEBHOOK_DRAIN_TIMEOUT,
+    WEBHOOK_HOST,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+class WebhookHandler:
+    """Принимает апдейты от Telegram и обрабатывает их в фоне, не больше concurrency одновременно"""
+
+    def __init__(self, dp: Dispatcher, bot: Bot, secret_token: str = WEBHOOK_SECRET,
+                 concurrency: int = WEBHOOK_CONCURRENCY, latency_window: int = 10000):
+        self.dp = dp
+        self.bot = bot
+        self._secret = secret_token.encode()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._accepting = True
+        self.processed = 0
+        self.latencies = deque(maxlen=latency_window)  # Сек от получения апдейта до конца обработки
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), self._secret):
+            return web.Response(status=401)
+        if not self._accepting:
+            # Бот останавливается: Telegram повторит доставку после перезапуска
+            return web.Response(status=503)
+        update = await request.json()
+        received = time.monotonic()
+
+        # Слот занимаем до ответа: при перегрузке Telegram придержит следующие апдейты у себя
+        await self._slots.acquire()
+        if not self._accepting:
+            self._slots.release()
+            return web.Response(status=503)
+        task = asyncio.create_task(self._process(update, received))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: Dict[str, Any], received: float) -> None:
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        except Exception as e:
+            logger.error(f"[WEBHOOK] Ошибка обработки апдейта {update.get('update_id')}: {e}")
+        finally:
+            self._slots.release()
+            self.processed += 1
+            self.latencies.append(time.monotonic() - received)
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    async def drain(self, timeout: Optional[float] = WEBHOOK_DRAIN_TIMEOUT) -> None:
+        """Перестает принимать апдейты и дожидается уже принятых"""
+        self._accepting = False
+        if self._tasks:
+            logger.info(f"[WEBHOOK] Ожидание {len(self._tasks)} апдейтов в обработке")
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"[WEBHOOK] Не дождались {len(pending)} апдейтов за {timeout} сек")
+        logger.info(
+            f"[WEBHOOK] Обработано апдейтов: {self.processed}, "
+            f"p99 обработки: {self.percentile(0.99) * 1000:.0f} мс"
+        )
+
+async def set_bot_webhook(bot: Bot, allowed_updates: List[str]) -> None:
+    # Накопившиеся за время остановки апдейты не сбрасываем: Telegram доставит их сюда
+    await bot.set_webhook(
+        WEBHOOK_BASE_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=allowed_updates,
+        drop_pending_updates=False,
+    )
+
+def create_webhook_app(handler: WebhookHandler, path: str = WEBHOOK_PATH) -> web.Application:
+    app = web.Application()
+    app.router.add_post(path, handler.handle)
+    return app
+
+async def run_webhook(dp: Dispatcher, bot: Bot, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT,
+                      secret_token: str = WEBHOOK_SECRET, register: bool = True) -> None:
+    """Webhook-режим: aiohttp-сервер принимает апдейты вместо цикла getUpdates.
+
+    Воркер супервизора слушает локальный порт со своим секретом, а вебхук
+    в Telegram регистрирует только один из них (register=True).
+    """
+    if not WEBHOOK_BASE_URL or not WEBHOOK_SECRET:
+        raise RuntimeError("Для BOT_MODE=webhook нужны WEBHOOK_BASE_URL и WEBHOOK_SECRET")
+    handler = WebhookHandler(dp, bot, secret_token=secret_token)
+    runner = web.AppRunner(create_webhook_app(handler))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    await dp.emit_startup(bot=bot)
+
+    if register:
+        await set_bot_webhook(bot, dp.resolve_used_update_types())
+    logger.info(f"[WEBHOOK] Слушаем {host}:{port}{WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await handler.drain()
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
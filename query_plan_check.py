@@ -0,0 +1,174 @@
+"""Проверка планов горячих запросов CRUD на SQLite.
+
+Создает временную SQLite базу через init_db, вызывает функции из
+app.database.crud и перехватывает SQL, который они реально отправляют в базу.
+Для каждого запроса выполняется EXPLAIN QUERY PLAN; проверка падает, если в плане
+есть полный проход по таблице (SCAN <таблица> без USING INDEX).
+
+    python query_plan_check.py
+    python query_plan_check.py --verbose
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+
+# Проход по индексу или по первичному ключу в порядке rowid — не полный просмотр таблицы
+SCAN_RE = re.compile(r"\bSCAN (\w+)(.*)")
+INDEXED_SCAN_RE = re.compile(r"USING (COVERING )?INDEX|USING INTEGER PRIMARY KEY")
+
+failures = []
+
+def configure() -> None:
+    # Конфиг читается при импорте app, поэтому окружение задаем до него
+    path = os.path.join(tempfile.mkdtemp(prefix="query_plan_"), "plans.db")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    os.environ.setdefault("TOKEN", "123456:PLANS")
+
+def full_scans(plan, allowed=()) -> list:
+    """Таблицы, которые план просматривает целиком"""
+    scans = []
+    for detail in plan:
+        match = SCAN_RE.search(detail)
+        if match and not INDEXED_SCAN_RE.search(match.group(2)) and match.group(1) not in allowed:
+            scans.append(match.group(1))
+    return scans
+
+async def run(args) -> None:
+    from sqlalchemy import event, select, update
+    from app.database import crud
+    from app.database.db import AsyncSessionLocal, engine
+    from app.database.models import (
+        BoosterAccount,
+        BoosterPayoutRequest,
+        Order,
+        OutboxMessage,
+        PaymentRequest,
+        PromoCode,
+        User
+    )
+
+    await crud.init_db()
+
+    # Немного данных, чтобы функции прошли свои ветки до конца, а курсоры указывали на строки
+    await crud.add_user(1001, "plan_referrer", region="🇷🇺 РУ")
+    referrer = await crud.get_user_by_tg_id(1001)
+    await crud.add_user(1002, "plan_user", region="🇷🇺 РУ", role="booster", referrer_id=referrer.id)
+    user = await crud.get_user_by_tg_id(1002)
+    async with AsyncSessionLocal() as session:
+        await crud.create_booster_account(user.id, "plan_user", session)
+    async with AsyncSessionLocal() as session:
+        await session.execute(update(User).where(User.id == user.id).values(balance_ru=1000, bonus_ru=1000))
+        account = (await session.execute(
+            select(BoosterAccount).where(BoosterAccount.user_id == user.id)
+        )).scalar_one()
+        account.balance_ru = 1000
+        order = Order(order_id="#Z0001", user_id=user.id, assigned_booster_id=user.id, status="in_progress")
+        payment = PaymentRequest(user_id=user.id, region="🇷🇺 РУ", amount=100, status="pending")
+        payout = BoosterPayoutRequest(booster_account_id=account.id, amount=10, currency="ru",
+                                      payment_details="plan", status="pending")
+        session.add_all([
+            order, payment, payout,
+            PromoCode(code="PLAN", type="discount", value=5),
+            OutboxMessage(chat_id=user.tg_id, text="plan"),
+        ])
+        await session.commit()
+
+    # Горячие запросы: списки с keyset пагинацией, счетчики, денежные операции.
+    # allow — таблицы, полный просмотр которых ожидаем, с причиной
+    cases = [
+        ("get_user_by_tg_id", lambda: crud.get_user_by_tg_id(999999)),
+        ("get_user_orders", lambda: crud.get_user_orders(user.id)),
+        ("get_user_orders после курсора", lambda: crud.get_user_orders(user.id, after_id=order.id)),
+        ("get_user_orders перед курсором", lambda: crud.get_user_orders(user.id, before_id=order.id)),
+        ("get_all_orders", lambda: crud.get_all_orders()),
+        ("get_all_orders по статусу", lambda: crud.get_all_orders("in_progress", after_id=order.id)),
+        ("get_orders_page_with_users", lambda: crud.get_orders_page_with_users("pending", after_id=order.id)),
+        ("get_booster_orders_page", lambda: crud.get_booster_orders_page(user.id, after_id=order.id)),
+        ("get_booster_orders_page по статусам",
+         lambda: crud.get_booster_orders_page(user.id, ["in_progress", "paused"], after_id=order.id)),
+        ("get_orders_by_booster", lambda: crud.get_orders_by_booster(user.id)),
+        ("count_booster_orders_by_status", lambda: crud.count_booster_orders_by_status(user.id)),
+        ("count_orders_by_status", lambda: crud.count_orders_by_status("pending")),
+        ("get_orders_count", lambda: crud.get_orders_count(user.id)),
+        ("get_order_by_id", lambda: crud.get_order_by_id("#Z0001")),
+        ("get_payment_requests_page пользователя",
+         lambda: crud.get_payment_requests_page(user_id=user.id, region="🇷🇺 РУ", after_id=payment.id)),
+        ("get_payment_requests_page по статусу",
+         lambda: crud.get_payment_requests_page(status="pending", after_id=payment.id)),
+        ("count_payment_requests", lambda: crud.count_payment_requests(user_id=user.id, region="🇷🇺 РУ")),
+        ("get_payment_requests_by_user", lambda: crud.get_payment_requests_by_user(user.id)),
+        ("get_payout_requests по статусу", lambda: crud.get_payout_requests("pending", after_id=payout.id)),
+        ("count_payout_requests", lambda: crud.count_payout_requests("pending")),
+        ("get_user_payout_requests", lambda: crud.get_user_payout_requests(user.tg_id, after_id=payout.id)),
+        ("count_user_payout_requests", lambda: crud.count_user_payout_requests(user.tg_id)),
+        ("count_referrals", lambda: crud.count_referrals(referrer.id)),
+        ("get_referrals", lambda: crud.get_referrals(referrer.id)),
+        ("get_referral_bonus_summary", lambda: crud.get_referral_bonus_summary(referrer.id)),
+        ("check_and_activate_promo", lambda: crud.check_and_activate_promo(user.id, "PLAN")),
+        ("checkout_order", lambda: crud.checkout_order(
+            "plan-checkout", {"user_id": user.id, "currency": "руб.", "total_cost": 2}, "balance_ru",
+            balance_amount=1, bonus_amount=1)),
+        ("accept_payment_request", lambda: crud.accept_payment_request(payment.id, "balance_ru")),
+        ("approve_payout_request", lambda: crud.approve_payout_request(payout.id, "plan")),
+        ("transition_order_status", lambda: crud.transition_order_status("#Z0001", "paused", expected="in_progress")),
+        ("get_broadcast_recipients", lambda: crud.get_broadcast_recipients("booster", after_id=0)),
+        ("claim_outbox_batch", lambda: crud.claim_outbox_batch(10, 30)),
+        ("get_users_page", lambda: crud.get_users_page(),
+         {"users": "первая страница идет по первичному ключу и обрывается на LIMIT"}),
+    ]
+
+    captured = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # Сами EXPLAIN QUERY PLAN сюда не попадают: они начинаются с EXPLAIN
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            captured.append((statement, parameters))
+
+    checked = 0
+    for case in cases:
+        name, call = case[0], case[1]
+        allowed = case[2] if len(case) > 2 else {}
+        captured.clear()
+        await call()
+        statements = list(captured)
+        if not statements:
+            print(f"FAIL {name}: не выполнил ни одного запроса")
+            failures.append(name)
+            continue
+        for statement, parameters in statements:
+            async with engine.connect() as conn:
+                rows = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)).all()
+            plan = [row[-1] for row in rows]
+            scans = full_scans(plan, allowed)
+            checked += 1
+            sql = " ".join(statement.split())
+            print(f"{'OK  ' if not scans else 'FAIL'} {name}: {sql[:100]}{'...' if len(sql) > 100 else ''}")
+            if scans or args.verbose:
+                for detail in plan:
+                    print(f"       {detail}")
+                for table, reason in allowed.items():
+                    print(f"       допускается SCAN {table}: {reason}")
+            if scans:
+                failures.append(f"{name}: SCAN {', '.join(scans)}")
+
+    print(f"\nПроверено запросов: {checked}")
+    await engine.dispose()
+    await crud.bot.session.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Проверка планов горячих запросов CRUD на SQLite")
+    parser.add_argument("--verbose", action="store_true", help="Печатать план каждого запроса")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    configure()
+    asyncio.run(run(arguments))
+    print(f"{'Полных просмотров таблиц нет' if not failures else f'Провалено: {len(failures)}'}")
+    for failure in failures:
+        print(f"  {failure}")
+    sys.exit(1 if failures else 0)
@@ -1,8 +1,10 @@
 import asyncio
 import os
 import logging
+import signal
+from typing import Optional
 from aiogram import Bot, Dispatcher
-from app.config import BOT_TOKEN
+from app.config import BOT_TOKEN, BOT_MODE, BOT_WORKERS, WORKER_BASE_PORT
 from app.handlers.common import router as common_router
 from app.handlers.admin import router as admin_router
 from app.handlers.admin.currency_admin import router as currency_admin_router
@@ -15,36 +17,95 @@ from app.middleware.ban_check import BanCheckMiddleware
 from app.middleware.antispam import AntiSpamMiddleware
 from app.utils.logger import setup_logging
 from app.utils.backup import setup_backup_scheduler 
+from app.utils.currency_converter import converter, setup_rates_refresh_job
+from app.utils.broadcast import setup_broadcasts
+from app.utils.outbox import setup_outbox
+from app.utils.fsm_storage import setup_fsm_storage
+from app.utils.webhook import run_webhook
+from app.utils.shared_state import get_shared_state, setup_shared_state
+from app.utils.supervisor import Supervisor
 
 logging.getLogger("aiogram.event").setLevel(logging.WARNING)
 
 def clear_console():
     os.system('cls' if os.name == 'nt' else 'clear')
 
-async def main():
-    setup_logging()
+def show_banner():
     clear_console()
     print("=" * 40)
     print("🚀 Boost Bot запущен!")
     print("Для остановки нажмите Ctrl+C")
     print("=" * 40)
-    await init_db()
+
+async def main(shard: Optional[int] = None, worker_secret: str = None):
+    """Запуск бота. shard задан — процесс является воркером супервизора"""
+    # Фоновые задачи на всю БД (бэкап, outbox, рассылки) выполняет один процесс
+    primary = shard is None or shard == 0
+    if shard is None:
+        setup_logging()
+        show_banner()
+        await init_db()
+    else:
+        setup_logging(f"worker-{shard}")
+    await setup_shared_state()
     bot = Bot(token=BOT_TOKEN, parse_mode="HTML")
-    await setup_backup_scheduler(bot)
-    dp = Dispatcher()
+    scheduler = await setup_backup_scheduler(bot, backup=primary)
+    await setup_rates_refresh_job(scheduler)
+    outbox_workers = await setup_outbox(scheduler, bot) if primary else []
+    # Рассылки, созданные админами в любом воркере, ведет основной процесс, в том числе после его перезапуска
+    await setup_broadcasts(scheduler, bot, owner=primary)
+    # Диалоги (мастер заказа и т.п.) хранятся вне процесса и переживают перезапуск
+    dp = Dispatcher(storage=await setup_fsm_storage(scheduler))
     dp.include_router(admin_router)
     dp.include_router(currency_admin_router)
     dp.include_router(payout_admin_router)
     dp.include_router(user_router)
     dp.include_router(booster_router)
     dp.include_router(common_router)
-    dp.message.middleware(UserUpdateMiddleware())
+    # Пользователь загружается один раз на апдейт и переиспользуется фильтрами ролей и хендлерами
+    dp.message.outer_middleware(UserUpdateMiddleware())
+    dp.callback_query.outer_middleware(UserUpdateMiddleware())
     dp.message.middleware(BanCheckMiddleware())
     dp.message.middleware(AntiSpamMiddleware(rate_limit=1.0))
-    await dp.start_polling(bot, skip_updates=True)
+    try:
+        if shard is not None:
+            await run_webhook(dp, bot, host="127.0.0.1", port=WORKER_BASE_PORT + shard,
+                              secret_token=worker_secret, register=primary)
+        elif BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            # После webhook-режима getUpdates не работает, пока вебхук не снят
+            await bot.delete_webhook()
+            await dp.start_polling(bot, skip_updates=True)
+    finally:
+        for worker in outbox_workers:
+            worker.cancel()
+        await converter.close()
+        await get_shared_state().close()
+
+def run_worker(shard: int, worker_secret: str):
+    """Точка входа процесса-воркера (запускает супервизор)"""
+    # Ctrl+C в консоли получают все процессы, воркеры останавливает супервизор через SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(main(shard, worker_secret))
+    except KeyboardInterrupt:
+        pass
+
+async def supervise():
+    """Несколько процессов: этот принимает вебхук, апдейты обрабатывают воркеры"""
+    setup_logging("supervisor")
+    show_banner()
+    await init_db()
+    await Supervisor(run_worker).run()
 
 if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
     try:
-        asyncio.run(main())
+        if BOT_MODE == "webhook" and BOT_WORKERS > 1:
+            asyncio.run(supervise())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         print("\nБот остановлен пользователем (Ctrl+C)")
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""Бенчмарк конкурентной записи в SQLite: до и после настройки движка.
+
+"До" — движок create_async_engine без настроек: журнал отката, synchronous=FULL,
+новое соединение на каждую сессию. "После" — фабрика app.database.db.create_engine
+с WAL, synchronous=NORMAL, busy_timeout и пулом соединений. Каждый движок
+получает свой временный файл (режим WAL сохраняется в файле базы).
+
+Писатели параллельно проводят транзакции «начислить бонус + запись в историю»,
+читатели в это время считают историю. Печатается пропускная способность записи,
+число ошибок "database is locked" и проверяется, что ни одна запись не потерялась.
+
+    python sqlite_write_benchmark.py --writers 50 --ops 20 --readers 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+failures = []
+
+def configure() -> str:
+    # Конфиг читается при импорте app, поэтому окружение задаем до него
+    directory = tempfile.mkdtemp(prefix="sqlite_write_")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(directory, 'after.db')}"
+    os.environ.setdefault("TOKEN", "123456:WRITES")
+    return directory
+
+async def workload(engine, args) -> dict:
+    from sqlalchemy import func, insert, select, update
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    from app.database.models import Base, BonusHistory, User
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        result = await conn.execute(
+            insert(User).returning(User.id),
+            [{"tg_id": n + 1, "username": f"writer{n}", "bonus_ru": 0} for n in range(args.writers)]
+        )
+        user_ids = result.scalars().all()
+    Session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    stats = {"committed": 0, "locked": 0, "reads": 0, "read_errors": 0}
+    writing = asyncio.Event()
+
+    async def writer(user_id: int) -> None:
+        for _ in range(args.ops):
+            try:
+                async with Session() as session:
+                    await session.execute(
+                        update(User).where(User.id == user_id).values(bonus_ru=User.bonus_ru + 1)
+                    )
+                    session.add(BonusHistory(user_id=user_id, amount=1, source="Бенчмарк"))
+                    await session.commit()
+                stats["committed"] += 1
+            except OperationalError:
+                stats["locked"] += 1
+
+    async def reader() -> None:
+        while not writing.is_set():
+            try:
+                async with Session() as session:
+                    await session.execute(select(func.count()).select_from(BonusHistory))
+                stats["reads"] += 1
+            except OperationalError:
+                stats["read_errors"] += 1
+            await asyncio.sleep(0)
+
+    readers = [asyncio.create_task(reader()) for _ in range(args.readers)]
+    started = time.monotonic()
+    await asyncio.gather(*(writer(user_id) for user_id in user_ids))
+    stats["elapsed"] = time.monotonic() - started
+    writing.set()
+    await asyncio.gather(*readers)
+
+    async with Session() as session:
+        stats["bonus"] = (await session.execute(select(func.coalesce(func.sum(User.bonus_ru), 0)))).scalar_one()
+        stats["history"] = (await session.execute(select(func.count()).select_from(BonusHistory))).scalar_one()
+    await engine.dispose()
+    return stats
+
+def report(label: str, stats: dict) -> None:
+    print(f"\n[{label}]")
+    print(f"  транзакций записи: {stats['committed']} за {stats['elapsed']:.2f} сек — "
+          f"{stats['committed'] / stats['elapsed']:.0f} в секунду")
+    print(f"  ошибок блокировки: запись {stats['locked']}, чтение {stats['read_errors']}; чтений {stats['reads']}")
+    consistent = stats["bonus"] == stats["committed"] == stats["history"]
+    print(f"  {'OK  ' if consistent else 'FAIL'} начислено {stats['bonus']:.0f}, "
+          f"записей в истории {stats['history']}, подтверждено {stats['committed']}")
+    if not consistent:
+        failures.append(f"{label}: потерянные или лишние записи")
+
+async def run(args, directory: str) -> None:
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.database.db import create_engine
+
+    total = args.writers * args.ops
+    print(f"{args.writers} писателей × {args.ops} транзакций, {args.readers} читателей")
+
+    before = await workload(create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'before.db')}"), args)
+    report("до: настройки по умолчанию", before)
+    after = await workload(create_engine(os.environ["DATABASE_URL"]), args)
+    report("после: create_engine", after)
+
+    if after["committed"] != total:
+        failures.append(f"после: подтверждено {after['committed']} из {total}")
+    speedup = (after["committed"] / after["elapsed"]) / max(before["committed"] / before["elapsed"], 1e-9)
+    print(f"\nЗапись быстрее в {speedup:.1f} раза, ошибок блокировки {before['locked']} → {after['locked']}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарк конкурентной записи в SQLite до и после настройки движка")
+    parser.add_argument("--writers", type=int, default=50, help="Параллельных писателей")
+    parser.add_argument("--ops", type=int, default=20, help="Транзакций на писателя")
+    parser.add_argument("--readers", type=int, default=10, help="Параллельных читателей")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    temp_directory = configure()
+    asyncio.run(run(arguments, temp_directory))
+    print(f"{'Все проверки пройдены' if not failures else f'Провалено проверок: {len(failures)}'}")
+    sys.exit(1 if failures else 0)
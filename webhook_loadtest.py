@@ -0,0 +1,88 @@
+"""Локальный нагрузочный тест webhook-режима.
+
+Поднимает WebhookHandler на 127.0.0.1 с отдельным Dispatcher (хендлер имитирует
+работу через sleep, запросов к Bot API и БД нет), шлет синтетические апдейты
+и печатает пропускную способность и перцентили задержки.
+
+    python webhook_loadtest.py --updates 5000 --connections 40 --work-ms 5
+"""
+import argparse
+import asyncio
+import time
+from aiohttp import ClientSession, web
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from app.utils.webhook import SECRET_HEADER, WebhookHandler, create_webhook_app
+
+SECRET = "loadtest"
+
+def make_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": "ping",
+        },
+    }
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+async def run(args) -> None:
+    router = Router()
+
+    @router.message()
+    async def simulated_handler(message: Message):
+        await asyncio.sleep(args.work_ms / 1000)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot(token="123456:LOADTEST")
+    handler = WebhookHandler(dp, bot, secret_token=SECRET, concurrency=args.concurrency,
+                             latency_window=args.updates)
+    runner = web.AppRunner(create_webhook_app(handler, "/webhook"))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    url = f"http://127.0.0.1:{args.port}/webhook"
+    connections = asyncio.Semaphore(args.connections)
+    ack_latencies = []
+
+    async with ClientSession(headers={SECRET_HEADER: SECRET}) as session:
+        async def post(update_id: int) -> None:
+            async with connections:
+                sent = time.monotonic()
+                async with session.post(url, json=make_update(update_id, 1 + update_id % args.users)) as response:
+                    response.raise_for_status()
+                ack_latencies.append(time.monotonic() - sent)
+
+        started = time.monotonic()
+        await asyncio.gather(*(post(update_id) for update_id in range(1, args.updates + 1)))
+        await handler.drain(timeout=None)
+        elapsed = time.monotonic() - started
+
+    await runner.cleanup()
+    await bot.session.close()
+
+    print(f"Апдейтов: {handler.processed} за {elapsed:.2f} сек — {handler.processed / elapsed:.0f} апдейтов/с")
+    print(f"Ответ вебхука: p50 {percentile(ack_latencies, 0.5) * 1000:.1f} мс, "
+          f"p99 {percentile(ack_latencies, 0.99) * 1000:.1f} мс")
+    print(f"Обработка:     p50 {handler.percentile(0.5) * 1000:.1f} мс, "
+          f"p99 {handler.percentile(0.99) * 1000:.1f} мс")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест webhook-режима")
+    parser.add_argument("--updates", type=int, default=5000, help="Сколько апдейтов отправить")
+    parser.add_argument("--connections", type=int, default=40, help="Одновременных запросов (как max_connections у Telegram)")
+    parser.add_argument("--concurrency", type=int, default=100, help="Лимит апдейтов в обработке на сервере")
+    parser.add_argument("--users", type=int, default=1000, help="Разных отправителей")
+    parser.add_argument("--work-ms", type=float, default=5, help="Имитируемое время работы хендлера, мс")
+    parser.add_argument("--port", type=int, default=8081)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))